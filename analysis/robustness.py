@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class RobustnessAnalyzer:
+    """蒙特卡洛 / 自助法（bootstrap）稳健性分析
+
+    对策略的逐日权益收益率做分块自助重采样（保留短期自相关），或对逐笔交易收益率
+    做乱序 / 有放回重采样，得到成千上万条模拟路径，再统计期末收益率、最大回撤与
+    夏普比率的分布及置信区间。全部路径以 (样本数, 路径长度) 的二维数组一次生成、
+    一次计算，超大样本数时按批处理以控制内存。
+    """
+
+    METRICS = ('final_return', 'max_drawdown', 'sharpe')
+
+    @staticmethod
+    def equity_returns(equity):
+        """逐日权益收益率（忽略权益为0或缺失的K线）"""
+        equity = np.asarray(equity, dtype=np.float64)
+        equity = equity[np.isfinite(equity) & (equity > 0)]
+        return equity[1:] / equity[:-1] - 1 if len(equity) > 1 else np.zeros(0)
+
+    @staticmethod
+    def block_bootstrap_index(n, n_samples, block_size=20, rng=None):
+        """
+        分块自助法的采样下标：随机选取块起点，块内连续（超出末尾时循环回到开头）
+
+        Returns:
+            np.ndarray: (n_samples, n) 的下标矩阵
+        """
+        rng = np.random.default_rng(rng)
+        block_size = max(1, min(block_size, n))
+        n_blocks = -(-n // block_size)
+        starts = rng.integers(0, n, size=(n_samples, n_blocks))
+        index = (starts[:, :, None] + np.arange(block_size)) % n
+        return index.reshape(n_samples, -1)[:, :n]
+
+    @staticmethod
+    def shuffle_index(n, n_samples, replace=False, rng=None):
+        """
+        逐笔交易重采样的下标：replace为False时每行是一个随机排列（只改变交易顺序），
+        为True时有放回抽样
+
+        Returns:
+            np.ndarray: (n_samples, n) 的下标矩阵
+        """
+        rng = np.random.default_rng(rng)
+        if replace:
+            return rng.integers(0, n, size=(n_samples, n))
+        return np.argsort(rng.random((n_samples, n)), axis=1)
+
+    @staticmethod
+    def path_metrics(returns, periods_per_year=252):
+        """
+        按行计算每条收益率路径的期末收益率、最大回撤与年化夏普比率
+
+        Args:
+            returns (np.ndarray): (样本数, 路径长度) 的收益率矩阵
+            periods_per_year (int): 年化周期数（逐笔交易时年化无意义，可传1）
+
+        Returns:
+            dict: final_return、max_drawdown（正数，比例）、sharpe，各为 (样本数,) 数组
+        """
+        returns = np.atleast_2d(returns)
+        equity = np.cumprod(1 + returns, axis=1)
+        peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+        max_drawdown = np.max(1 - equity / peak, axis=1, initial=0.0)
+        std = returns.std(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sharpe = np.where(std > 0, returns.mean(axis=1) / std * np.sqrt(periods_per_year), 0.0)
+        final_return = equity[:, -1] - 1 if returns.shape[1] else np.zeros(len(returns))
+        return {
+            'final_return': final_return,
+            'max_drawdown': max_drawdown,
+            'sharpe': sharpe,
+        }
+
+    @staticmethod
+    def resample(returns, n_samples=10000, method='block', block_size=20, periods_per_year=252,
+                 seed=None, batch_size=2000):
+        """
+        重采样并计算各指标的分布
+
+        Args:
+            returns (np.ndarray): 原始收益率序列（逐日或逐笔）
+            n_samples (int): 重采样次数
+            method (str): 'block' 分块自助法；'shuffle' 打乱顺序；'bootstrap' 有放回抽样
+            block_size (int): 分块自助法的块长度
+            periods_per_year (int): 夏普比率的年化周期数
+            seed (int): 随机种子
+            batch_size (int): 每批生成的路径数
+
+        Returns:
+            dict: 各指标的 (n_samples,) 数组
+        """
+        returns = np.asarray(returns, dtype=np.float64)
+        n = len(returns)
+        rng = np.random.default_rng(seed)
+        results = {name: np.zeros(n_samples) for name in RobustnessAnalyzer.METRICS}
+        if n == 0:
+            return results
+        for start in range(0, n_samples, batch_size):
+            size = min(batch_size, n_samples - start)
+            if method == 'block':
+                index = RobustnessAnalyzer.block_bootstrap_index(n, size, block_size, rng)
+            elif method in ('shuffle', 'bootstrap'):
+                index = RobustnessAnalyzer.shuffle_index(n, size, method == 'bootstrap', rng)
+            else:
+                raise ValueError(f"未知的重采样方法: {method}")
+            metrics = RobustnessAnalyzer.path_metrics(returns[index], periods_per_year)
+            for name in RobustnessAnalyzer.METRICS:
+                results[name][start:start + size] = metrics[name]
+        return results
+
+    @staticmethod
+    def analyze(strategy, n_samples=10000, method='block', block_size=20, confidence=0.9, seed=None,
+                start_date=None):
+        """
+        对已完成回测的策略做稳健性分析
+
+        method为'block'时对逐日权益收益率分块重采样；为'shuffle'或'bootstrap'时
+        对逐笔交易收益率（相对账户权益）重采样。逐日权益只取首个评估K线起的区间
+        （与run_strategy一致），预热期的平坦权益不参与重采样。
+
+        Args:
+            strategy: 已运行回测的策略实例
+            n_samples (int): 重采样次数
+            method (str): 'block' / 'shuffle' / 'bootstrap'
+            block_size (int): 分块长度（交易日）
+            confidence (float): 置信区间的置信水平
+            seed (int): 随机种子
+            start_date (str): 回测开始日期（与run_strategy相同），用于确定首个评估K线
+
+        Returns:
+            dict: 指标名 -> {observed（实际值）, mean, median, lower, upper}，
+                  收益率与回撤为百分比；另含 method、n_samples、confidence
+        """
+        if method == 'block':
+            equity = strategy.equity_curve if strategy.equity_curve is not None else []
+            if len(equity):
+                # 以首个评估K线前一根的权益为基准，之前的预热K线权益恒为初始资金
+                first_bar = strategy.evaluation_start(strategy.trades.dates, start_date)
+                equity = equity[first_bar - 1:]
+            returns = RobustnessAnalyzer.equity_returns(equity)
+            periods_per_year = 252
+        else:
+            returns = strategy.trade_returns()
+            periods_per_year = 1
+        distribution = RobustnessAnalyzer.resample(returns, n_samples, method, block_size,
+                                                   periods_per_year, seed)
+        observed = RobustnessAnalyzer.path_metrics(returns[None, :], periods_per_year)
+
+        tail = (1 - confidence) / 2 * 100
+        report = {'method': method, 'n_samples': n_samples, 'confidence': confidence}
+        for name in RobustnessAnalyzer.METRICS:
+            values = distribution[name]
+            scale = 1.0 if name == 'sharpe' else 100.0
+            lower, median, upper = np.percentile(values, [tail, 50, 100 - tail]) * scale
+            report[name] = {
+                'observed': float(observed[name][0]) * scale,
+                'mean': float(values.mean()) * scale,
+                'median': float(median),
+                'lower': float(lower),
+                'upper': float(upper),
+            }
+        return report
+
+    @staticmethod
+    def print_report(name, report):
+        """打印稳健性分析报告"""
+        labels = {'final_return': '收益率', 'max_drawdown': '最大回撤', 'sharpe': '夏普比率'}
+        method = {'block': '逐日收益分块自助法', 'shuffle': '交易顺序打乱', 'bootstrap': '交易有放回抽样'}
+        print(f"\n{name} 稳健性分析（{method.get(report['method'], report['method'])}，"
+              f"{report['n_samples']}次重采样，{report['confidence']:.0%}置信区间）:")
+        for key in RobustnessAnalyzer.METRICS:
+            item = report[key]
+            unit = '' if key == 'sharpe' else '%'
+            print(f"{labels[key]}: 实际 {item['observed']:.2f}{unit}  中位数 {item['median']:.2f}{unit}  "
+                  f"区间 [{item['lower']:.2f}{unit}, {item['upper']:.2f}{unit}]")
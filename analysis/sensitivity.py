@@ -0,0 +1,265 @@
+import contextlib
+import io
+import tempfile
+import numpy as np
+import pandas as pd
+import talib
+from strategies.base_strategy import BaseStrategy
+from optimization.param_sweep import ParameterSweep
+from indicators.indicator_family import IndicatorFamily
+from utils.feature_cache import FeatureCache
+
+
+class _RecordingCache(FeatureCache):
+    """记录每次指标调用（函数、位置参数、关键字参数）的特征缓存"""
+
+    def __init__(self, cache_dir, max_bytes):
+        super().__init__(cache_dir, max_bytes)
+        self.calls = []
+
+    def get_or_compute(self, func, *inputs, **params):
+        self.calls.append((func, inputs, params))
+        return super().get_or_compute(func, *inputs, **params)
+
+
+class SensitivitySurface:
+    """双参数敏感性曲面
+
+    对策略的任意两个参数（如 BollingerStrategy 的 period × std_dev）在网格上逐点回测，
+    得到收益率、最大回撤、交易次数等指标的二维曲面，其余参数固定为默认值或指定值。
+    稳健的参数区域在曲面上表现为平缓的高原，过拟合的参数则是四周明显更差的“孤岛”，
+    因此同时给出每个格点与其相邻格点的均值。
+
+    逐点回测复用ParameterSweep的进程池。开始前先回测一个基准格点并记录其指标调用，
+    周期参数取基准格点坐标值的SMA、EMA、STDDEV、MACD调用再由IndicatorFamily
+    对整条坐标轴的取值一次算出并写入共享的指标缓存，网格内各点直接读取；
+    其余指标仍由各格点按需计算。
+    """
+
+    METRICS = ('profit_rate', 'max_drawdown', 'total_trades', 'win_rate')
+
+    # 可按指标族预先计算的talib函数及其周期参数名（按位置参数顺序）
+    FAMILY_PERIODS = {
+        talib.SMA: ('timeperiod',),
+        talib.EMA: ('timeperiod',),
+        talib.STDDEV: ('timeperiod',),
+        talib.MACD: ('fastperiod', 'slowperiod', 'signalperiod'),
+    }
+
+    def __init__(self, strategy_cls, data, initial_capital=1000000, commission_rate=0.0003,
+                 start_date=None, runner=None, cache_dir=None, cache_size=512 * 1024 * 1024):
+        """
+        Args:
+            strategy_cls: 策略类
+            data (pd.DataFrame): 行情数据（含预热K线）
+            initial_capital (float): 初始资金
+            commission_rate (float): 手续费率
+            start_date (str): 信号评估的开始日期
+            runner: 回测函数，默认使用 main.run_strategy
+            cache_dir (str): 指标缓存目录，默认沿用已启用的缓存，否则使用临时目录
+            cache_size (int): 指标缓存容量上限（字节）
+        """
+        self.strategy_cls = strategy_cls
+        self.data = data
+        self.initial_capital = initial_capital
+        self.commission_rate = commission_rate
+        self.start_date = start_date
+        self.runner = runner
+        if cache_dir is None and BaseStrategy.feature_cache is not None:
+            cache_dir = BaseStrategy.feature_cache.cache_dir
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+
+    def _axis_values(self, name, values):
+        if values is not None:
+            return list(values)
+        space = self.strategy_cls.search_space or {}
+        if name not in space:
+            raise ValueError(f"{self.strategy_cls.__name__} 的搜索空间中没有参数 {name}，请指定取值")
+        return list(space[name])
+
+    @staticmethod
+    def _is_period(value):
+        return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+    @staticmethod
+    def _period_slots(func, inputs, params):
+        """指标调用中各周期参数的位置：('arg', 下标) 或 ('kw', 参数名)；其余参数不受支持时返回None"""
+        names = SensitivitySurface.FAMILY_PERIODS.get(func)
+        if names is None or len(inputs) > 1 + len(names) or set(params) - set(names):
+            return None
+        values = np.asarray(inputs[0], dtype=np.float64)
+        if values.ndim != 1 or np.isnan(values).any():
+            return None
+        slots = [('arg', 1 + i) if len(inputs) > 1 + i else ('kw', name) for i, name in enumerate(names)]
+        if any(kind == 'kw' and key not in params for kind, key in slots):
+            return None
+        return slots
+
+    @staticmethod
+    def _with_periods(inputs, params, slots, periods):
+        """把调用中的周期参数替换为periods，返回新的 (inputs, params)"""
+        inputs, params = list(inputs), dict(params)
+        for (kind, key), period in zip(slots, periods):
+            if kind == 'arg':
+                inputs[key] = period
+            else:
+                params[key] = period
+        return tuple(inputs), params
+
+    @staticmethod
+    def _family(func, values, periods):
+        """
+        按指标族一次计算多组周期
+
+        Args:
+            periods (list): 每个周期参数的候选值列表
+
+        Returns:
+            list: [(各周期参数取值, 结果)]
+        """
+        if func is talib.MACD:
+            combos, macd, signal, hist = IndicatorFamily.macd_family(values, *periods)
+            return [(combo, (macd[:, k], signal[:, k], hist[:, k])) for k, combo in enumerate(combos)]
+        family = {talib.SMA: IndicatorFamily.sma_family, talib.EMA: IndicatorFamily.ema_family,
+                  talib.STDDEV: IndicatorFamily.std_family}[func]
+        columns = family(values, periods[0])
+        return [((period,), columns[:, j]) for j, period in enumerate(periods[0])]
+
+    def _seed(self, cache_dir, runner, search_space, constraint, x_name, xs, y_name, ys):
+        """
+        回测基准格点并记录指标调用，再按指标族算出坐标轴其余取值的指标写入共享缓存
+
+        Returns:
+            int: 写入的缓存条目数
+        """
+        grid = ParameterSweep.grid(search_space, constraint)
+        if not grid:
+            return 0
+        base = grid[0]
+        cache = _RecordingCache(cache_dir, self.cache_size)
+        previous = BaseStrategy.feature_cache
+        BaseStrategy.feature_cache = cache
+        try:
+            strategy = self.strategy_cls(self.initial_capital, self.commission_rate, **base)
+            strategy.verbose = False
+            with contextlib.redirect_stdout(io.StringIO()):
+                runner(strategy, self.start_date, None, None, self.data.copy())
+        finally:
+            BaseStrategy.feature_cache = previous
+
+        seeded = 0
+        for func, inputs, params in cache.calls:
+            slots = self._period_slots(func, inputs, params)
+            if slots is None:
+                continue
+            values = np.asarray(inputs[0], dtype=np.float64)
+            current = [inputs[key] if kind == 'arg' else params[key] for kind, key in slots]
+            for axis_base, axis_values in ((base[x_name], xs), (base[y_name], ys)):
+                if not all(SensitivitySurface._is_period(value) for value in axis_values):
+                    continue
+                for i, period in enumerate(current):
+                    if not SensitivitySurface._is_period(period) or period != axis_base:
+                        continue
+                    periods = [[value] for value in current]
+                    periods[i] = [type(period)(value) for value in axis_values]
+                    for combo, result in self._family(func, values, periods):
+                        call_inputs, call_params = self._with_periods(inputs, params, slots, combo)
+                        seeded += cache.seed(func, call_inputs, call_params, result)
+        return seeded
+
+    def run(self, x_name, y_name, x_values=None, y_values=None, fixed=None, constraint=None, n_jobs=None):
+        """
+        计算敏感性曲面
+
+        Args:
+            x_name, y_name (str): 两个参数名（曲面的行、列）
+            x_values, y_values (list): 参数取值，默认取策略搜索空间中的候选值
+            fixed (dict): 其余参数的取值，未指定的使用策略默认配置
+            constraint: 参数组合过滤函数，默认为策略类的search_constraint
+            n_jobs (int): 进程数，None为CPU核数，1为在当前进程顺序运行
+
+        Returns:
+            dict: x、y（坐标轴取值）、各指标名 -> (len(x), len(y)) 曲面数组、
+                  profit_rate_neighbors（各格点与相邻格点收益率的均值）、
+                  table（逐点结果，DataFrame）；不满足策略参数约束的格点为NaN
+        """
+        xs = self._axis_values(x_name, x_values)
+        ys = self._axis_values(y_name, y_values)
+        fixed = dict(fixed or {})
+        if constraint is None:
+            constraint = self.strategy_cls.search_constraint
+        search_space = {x_name: xs, y_name: ys, **{name: [value] for name, value in fixed.items()}}
+
+        with tempfile.TemporaryDirectory(prefix='surface_cache_') as tmp_dir:
+            cache_dir = self.cache_dir or tmp_dir
+            sweep = ParameterSweep(self.strategy_cls, self.data, self.initial_capital, self.commission_rate,
+                                   self.start_date, self.runner, cache_dir, self.cache_size)
+            self._seed(cache_dir, sweep.runner, search_space, constraint, x_name, xs, y_name, ys)
+            table = sweep.run(search_space, constraint, n_jobs=n_jobs)
+
+        result = {'x_name': x_name, 'y_name': y_name, 'x': np.asarray(xs), 'y': np.asarray(ys), 'table': table}
+        for metric in self.METRICS:
+            surface = table.pivot_table(index=x_name, columns=y_name, values=metric, aggfunc='first', dropna=False)
+            result[metric] = surface.reindex(index=xs, columns=ys).to_numpy(dtype=np.float64)
+        result['profit_rate_neighbors'] = self.neighbor_mean(result['profit_rate'])
+        return result
+
+    @staticmethod
+    def neighbor_mean(surface):
+        """各格点与其上下左右及对角相邻格点（3×3邻域）的均值，忽略NaN"""
+        surface = np.asarray(surface, dtype=np.float64)
+        padded = np.pad(surface, 1, constant_values=np.nan)
+        rows, cols = surface.shape
+        stack = np.stack([padded[i:i + rows, j:j + cols] for i in range(3) for j in range(3)])
+        valid = ~np.isnan(stack)
+        counts = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, np.where(valid, stack, 0).sum(axis=0) / counts, np.nan)
+
+    @staticmethod
+    def export(result, filename):
+        """
+        导出曲面：.npz 保存坐标轴与各指标数组；.xlsx 每个指标一张热力图工作表
+
+        Args:
+            result (dict): run的返回值
+            filename (str): 输出文件名（按扩展名选择格式）
+        """
+        names = list(SensitivitySurface.METRICS) + ['profit_rate_neighbors']
+        if filename.endswith('.npz'):
+            np.savez(filename, x=result['x'], y=result['y'], x_name=result['x_name'], y_name=result['y_name'],
+                     **{name: result[name] for name in names})
+            print(f"\n敏感性曲面已导出到: {filename}")
+            return
+
+        labels = {
+            'profit_rate': '收益率(%)',
+            'max_drawdown': '最大回撤(%)',
+            'total_trades': '交易次数',
+            'win_rate': '胜率(%)',
+            'profit_rate_neighbors': '邻域平均收益率(%)',
+        }
+        # 回撤越小越好，色阶与其他指标相反
+        reverse = {'max_drawdown'}
+        with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
+            workbook = writer.book
+            number_format = workbook.add_format({'num_format': '0.00'})
+            for name in names:
+                frame = pd.DataFrame(result[name], index=pd.Index(result['x'], name=result['x_name']),
+                                     columns=result['y'])
+                sheet_name = labels[name].replace('(%)', '')
+                frame.to_excel(writer, sheet_name=sheet_name, startrow=1)
+                worksheet = writer.sheets[sheet_name]
+                worksheet.write(0, 0, f"{labels[name]}：行为 {result['x_name']}，列为 {result['y_name']}")
+                rows, cols = frame.shape
+                worksheet.set_column(1, cols, 10, number_format)
+                low, high = ('#63BE7B', '#F8696B') if name in reverse else ('#F8696B', '#63BE7B')
+                worksheet.conditional_format(2, 1, rows + 1, cols, {
+                    'type': '3_color_scale',
+                    'min_color': low,
+                    'mid_color': '#FFEB84',
+                    'max_color': high,
+                })
+                worksheet.freeze_panes(2, 1)
+        print(f"\n敏感性曲面已导出到: {filename}")
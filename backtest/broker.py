@@ -0,0 +1,186 @@
+import numpy as np
+from backtest.ledger import BUY, SELL, SIDE_LABELS
+from utils.utils import TradeLogger
+
+
+class Broker:
+    """成交与记账核心
+
+    所有策略的下单都经由Broker完成：检查资金与成交量上限、扣除手续费、
+    更新账户的资金/持仓/成本价并记录成交。账户对象需具备 capital、position、
+    entry_price、trades（TradeLedger）、commission_rate、name 属性（即策略本身）。
+
+    支持按股数下单（buy / sell）和按目标仓位比例下单（order_target_percent），
+    以及面向多账户、多资产的向量化批量成交（execute_batch）。
+    """
+
+    def __init__(self, account, volume_limit=None, verbose=True):
+        """
+        Args:
+            account: 账户对象（策略实例）
+            volume_limit (float): 单笔买入不超过当根K线成交量的比例，None表示不限制
+            verbose (bool): 是否打印成交信息
+        """
+        self.account = account
+        self.volume_limit = volume_limit
+        self.verbose = verbose
+
+    def _record(self, date, side, price, shares, amount, commission, requested=None):
+        account = self.account
+        account.trades.record(date, side, price, shares, amount, commission, account.capital, requested)
+        if self.verbose:
+            trade = {
+                'date': date,
+                'type': SIDE_LABELS[side],
+                'price': price,
+                'shares': shares,
+                'amount': amount,
+                'commission': commission,
+                'capital': account.capital
+            }
+            TradeLogger.print_trade(trade, account.name, account.position)
+
+    def buy(self, date, price, shares, volume=None):
+        """
+        按股数买入，持仓成本按加权平均更新
+
+        Args:
+            date: 成交日期
+            price (float): 成交价
+            shares (int): 计划买入股数
+            volume (float): 当根K线成交量，设置了volume_limit时用于限制买入股数
+
+        Returns:
+            int: 实际成交股数，资金不足或股数为0时返回0；成交记录同时保存计划股数
+        """
+        account = self.account
+        shares = requested = int(shares)
+        if volume is not None and self.volume_limit is not None:
+            shares = min(shares, int(volume * self.volume_limit))
+        if shares <= 0:
+            return 0
+
+        cost = shares * price
+        commission = cost * account.commission_rate
+        if cost + commission > account.capital:
+            if self.verbose:
+                print(f"资金不足：需要{cost + commission:.2f}，当前资金{account.capital:.2f}")
+            return 0
+
+        held = account.position
+        account.capital -= (cost + commission)
+        account.position = held + shares
+        if held == 0:
+            account.entry_price = price
+        else:
+            account.entry_price = (account.entry_price * held + price * shares) / account.position
+
+        self._record(date, BUY, price, shares, cost, commission, requested)
+        return shares
+
+    def sell(self, date, price, shares=None):
+        """
+        按股数卖出（默认全部持仓），清仓后成本价归零
+
+        Returns:
+            int: 实际成交股数
+        """
+        account = self.account
+        shares = account.position if shares is None else min(int(shares), account.position)
+        if shares <= 0:
+            return 0
+
+        revenue = shares * price
+        commission = revenue * account.commission_rate
+        account.capital += (revenue - commission)
+        account.position -= shares
+        if account.position == 0:
+            account.entry_price = 0
+
+        self._record(date, SELL, price, shares, revenue, commission)
+        return shares
+
+    def order_target_percent(self, date, price, target_pct, volume=None):
+        """
+        调整持仓至总权益的目标比例（买入时预留手续费）
+
+        Returns:
+            int: 成交股数，买入为正、卖出为负
+        """
+        account = self.account
+        equity = account.capital + account.position * price
+        target_shares = int(equity * target_pct / (price * (1 + account.commission_rate)))
+        delta = target_shares - account.position
+        if delta > 0:
+            return self.buy(date, price, delta, volume)
+        if delta < 0:
+            return -self.sell(date, price, -delta)
+        return 0
+
+    @staticmethod
+    def _expand(values, shape, single):
+        """将价格/成交量扩展为与持仓同形（单资产模式下按账户排列）"""
+        values = np.asarray(values, dtype=np.float64)
+        if single:
+            values = values.reshape(-1, 1)
+        return np.broadcast_to(values, shape)
+
+    @staticmethod
+    def execute_batch(cash, positions, prices, orders, commission_rate, volumes=None, volume_limit=None):
+        """
+        向量化批量成交：同一根K线上多个账户、多个资产的订单一次处理
+
+        先成交卖单回笼资金，再成交买单；某账户的资金不足以成交全部买单时，
+        该账户各笔买单按同一比例缩减（向下取整），结果与资产的排列顺序无关。
+
+        Args:
+            cash (np.ndarray): 各账户现金，形如 (A,)
+            positions (np.ndarray): 持仓股数，形如 (A, N)；一维 (A,) 视为每个账户单一资产
+            prices (np.ndarray): 成交价，形如 (N,) 或与positions同形
+            orders (np.ndarray): 订单股数，与positions同形，买入为正、卖出为负
+            commission_rate (float): 手续费率，也可为 (A,) 数组（各账户费率不同）
+            volumes (np.ndarray): 成交量，与prices同形，配合volume_limit限制买入股数
+            volume_limit (float): 单笔买入不超过成交量的比例
+
+        Returns:
+            tuple: (新现金, 新持仓, 成交股数, 手续费)，成交股数买入为正、卖出为负
+        """
+        single = np.ndim(positions) == 1
+        cash = np.array(cash, dtype=np.float64)
+        positions = np.atleast_1d(np.asarray(positions, dtype=np.int64))
+        orders = np.asarray(orders, dtype=np.float64)
+        if single:
+            positions, orders = positions[:, None], orders[:, None]
+        prices = Broker._expand(prices, positions.shape, single)
+        orders = np.trunc(orders).astype(np.int64)
+        commission_rate = np.asarray(commission_rate, dtype=np.float64)
+        if commission_rate.ndim == 1:
+            commission_rate = commission_rate[:, None]
+
+        # 卖单：不超过现有持仓
+        sells = np.minimum(np.maximum(-orders, 0), positions)
+        revenue = sells * prices
+        sell_commission = revenue * commission_rate
+        cash = cash + (revenue - sell_commission).sum(axis=1)
+
+        # 买单：成交量上限，资金不足时各笔按比例缩减
+        buys = np.maximum(orders, 0)
+        if volumes is not None and volume_limit is not None:
+            volumes = Broker._expand(volumes, positions.shape, single)
+            buys = np.minimum(buys, np.trunc(volumes * volume_limit).astype(np.int64))
+        need = (buys * prices * (1 + commission_rate)).sum(axis=1)
+        short = need > cash
+        if short.any():
+            # 比例略向下取，避免浮点误差使缩减后的金额仍超出资金
+            ratio = np.where(short, np.maximum(cash, 0) / np.where(short, need, 1) * (1 - 1e-12), 1.0)
+            buys = np.where(short[:, None], np.floor(buys * ratio[:, None]), buys).astype(np.int64)
+        cost = buys * prices
+        buy_commission = cost * commission_rate
+        cash = cash - (cost + buy_commission).sum(axis=1)
+
+        filled = buys - sells
+        new_positions = positions + filled
+        commission = sell_commission + buy_commission
+        if single:
+            return cash, new_positions[:, 0], filled[:, 0], commission[:, 0]
+        return cash, new_positions, filled, commission
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+# 成交方向编码
+BUY = 1
+SELL = -1
+
+SIDE_LABELS = {BUY: '买入', SELL: '卖出'}
+
+
+class TradeLedger:
+    """列式成交记录（struct-of-arrays）
+
+    每个字段保存为一个预分配的numpy数组，容量不足时按倍数扩容：
+    日期以int32索引指向日期表 dates（设置了交易日历时即为K线序号），方向为int8，
+    价格、金额、手续费、剩余资金为float64，股数为int64。requested为下单时计划的股数
+    （成交量上限截断前），用于按下单规模而非成交结果换算其他资金规模下的订单。
+
+    为兼容原有的 list[dict] 用法，迭代、下标访问和append仍按字典进行，
+    字段与原交易字典一致（date/type/price/shares/amount/commission/capital）；
+    批量统计应直接使用列数组（columns）或 to_frame。
+    """
+
+    FIELDS = (
+        ('date_index', np.int32),
+        ('side', np.int8),
+        ('price', np.float64),
+        ('shares', np.int64),
+        ('amount', np.float64),
+        ('commission', np.float64),
+        ('cash', np.float64),
+        ('requested', np.int64),
+    )
+
+    def __init__(self, calendar=None, capacity=64):
+        self._size = 0
+        self._data = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.FIELDS}
+        self.dates = []
+        self._date_ids = {}
+        if calendar is not None:
+            self.set_calendar(calendar)
+
+    def set_calendar(self, calendar):
+        """设置交易日历，之后记录的日期索引即为其在日历中的位置（须在记录成交前调用）"""
+        if self._size:
+            raise ValueError("已有成交记录时不能更换交易日历")
+        self.dates = list(calendar)
+        self._date_ids = {date: i for i, date in enumerate(self.dates)}
+
+    @classmethod
+    def from_columns(cls, columns, dates):
+        """
+        由列数组与日期表重建成交记录（如从缓存恢复）
+
+        Args:
+            columns (dict): 字段名 -> 数组，字段同FIELDS；缺少requested时按成交股数补齐
+            dates: 日期表，date_index指向其中的位置
+        """
+        size = len(columns['side'])
+        ledger = cls(calendar=dates, capacity=max(size, 1))
+        for name, dtype in cls.FIELDS:
+            values = columns.get(name, columns['shares']) if name == 'requested' else columns[name]
+            ledger._data[name][:size] = np.asarray(values, dtype=dtype)
+        ledger._size = size
+        return ledger
+
+    def _date_index(self, date):
+        index = self._date_ids.get(date)
+        if index is None:
+            index = len(self.dates)
+            self.dates.append(date)
+            self._date_ids[date] = index
+        return index
+
+    def _reserve(self, n):
+        capacity = len(self._data['side'])
+        if n <= capacity:
+            return
+        capacity = max(n, capacity * 2)
+        for name, values in self._data.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._data[name] = grown
+
+    def record(self, date, side, price, shares, amount, commission, cash, requested=None):
+        """追加一笔成交，side为BUY或SELL；requested为计划股数，默认与成交股数相同"""
+        self._reserve(self._size + 1)
+        i = self._size
+        data = self._data
+        data['date_index'][i] = self._date_index(date)
+        data['side'][i] = side
+        data['price'][i] = price
+        data['shares'][i] = shares
+        data['amount'][i] = amount
+        data['commission'][i] = commission
+        data['cash'][i] = cash
+        data['requested'][i] = shares if requested is None else requested
+        self._size += 1
+
+    def append(self, trade):
+        """按原交易字典格式追加一笔成交"""
+        side = BUY if trade['type'] == SIDE_LABELS[BUY] else SELL
+        self.record(trade['date'], side, trade['price'], trade['shares'],
+                    trade['amount'], trade['commission'], trade['capital'])
+
+    def column(self, name):
+        """字段数组视图（不复制）"""
+        return self._data[name][:self._size]
+
+    @property
+    def columns(self):
+        """全部字段数组视图 {字段名: 数组}"""
+        return {name: self.column(name) for name, _ in self.FIELDS}
+
+    def date_labels(self):
+        """各笔成交的日期"""
+        return np.asarray(self.dates, dtype=object)[self.column('date_index')] if self._size else \
+            np.empty(0, dtype=object)
+
+    def to_frame(self):
+        """
+        转换为DataFrame，列与原交易字典一致
+
+        Returns:
+            pd.DataFrame: date/type/price/shares/amount/commission/capital
+        """
+        side = self.column('side')
+        return pd.DataFrame({
+            'date': self.date_labels(),
+            'type': np.where(side == BUY, SIDE_LABELS[BUY], SIDE_LABELS[SELL]),
+            'price': self.column('price'),
+            'shares': self.column('shares'),
+            'amount': self.column('amount'),
+            'commission': self.column('commission'),
+            'capital': self.column('cash'),
+        })
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("成交记录下标越界")
+        data = self._data
+        return {
+            'date': self.dates[data['date_index'][i]],
+            'type': SIDE_LABELS[int(data['side'][i])],
+            'price': float(data['price'][i]),
+            'shares': int(data['shares'][i]),
+            'amount': float(data['amount'][i]),
+            'commission': float(data['commission'][i]),
+            'capital': float(data['cash'][i]),
+        }
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
@@ -0,0 +1,91 @@
+import numpy as np
+from backtest.broker import Broker
+
+
+class PortfolioBacktester:
+    """多股票组合的定期调仓回测
+
+    每个调仓日由回调给出各股票的目标权重，按收盘价换算为目标股数，
+    差额订单经 Broker.execute_batch 一次成交；两次调仓之间持股不变，
+    逐日权益按矩阵乘法整段计算，停牌日按最近收盘价估值且不参与交易。
+
+    目标权重相对可调配资金：现金加上可交易持仓扣除卖出手续费后的市值，
+    停牌股票的持仓无法卖出，不计入。买入所需资金超出卖出后的现金时按比例缩减。
+    """
+
+    @staticmethod
+    def mark_prices(close):
+        """停牌（NaN）处以最近有效收盘价填充，从未有行情处为0"""
+        close = np.asarray(close, dtype=np.float64)
+        n_days, n_codes = close.shape
+        valid = ~np.isnan(close)
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(n_days)[:, None], 0), axis=0)
+        return np.nan_to_num(close[last_valid, np.arange(n_codes)])
+
+    @staticmethod
+    def run(close, rebalance_index, target_weights, initial_capital, commission_rate,
+            volume=None, volume_limit=None):
+        """
+        Args:
+            close (np.ndarray): 收盘价 (T, N)
+            rebalance_index (np.ndarray): 调仓日位置（升序）
+            target_weights: 回调 target_weights(k, t, positions) -> (N,) 目标权重（相对可调配资金），
+                            k为第几次调仓，t为调仓日位置，positions为调仓前持股数
+            initial_capital (float): 初始资金
+            commission_rate (float): 手续费率
+            volume (np.ndarray): 成交量 (T, N)，配合volume_limit限制买入股数
+            volume_limit (float): 单笔买入不超过当日成交量的比例
+
+        Returns:
+            dict: equity（逐日权益）、positions（各调仓日后的持股数，(R, N)）、
+                  weights（各调仓日的目标权重，(R, N)）、turnover（各调仓日成交额/权益）、
+                  commission（手续费合计）、cash（期末现金）
+        """
+        close = np.asarray(close, dtype=np.float64)
+        n_days, n_codes = close.shape
+        marked = PortfolioBacktester.mark_prices(close)
+        valid = ~np.isnan(close)
+
+        cash = float(initial_capital)
+        positions = np.zeros(n_codes, dtype=np.int64)
+        equity = np.full(n_days, cash)
+        position_history = np.zeros((len(rebalance_index), n_codes), dtype=np.int64)
+        weight_history = np.zeros((len(rebalance_index), n_codes))
+        turnover = np.zeros(len(rebalance_index))
+        total_commission = 0.0
+
+        for k, t in enumerate(rebalance_index):
+            tradable = valid[t]
+            weights = np.asarray(target_weights(k, t, positions), dtype=np.float64)
+            weight_history[k] = weights
+
+            prices = np.where(tradable, close[t], 0.0)
+            value = cash + marked[t] @ positions
+            investable = cash + prices @ positions * (1 - commission_rate)
+            target = np.zeros(n_codes, dtype=np.int64)
+            buyable = tradable & (weights > 0)
+            target[buyable] = (investable * weights[buyable] /
+                               (prices[buyable] * (1 + commission_rate))).astype(np.int64)
+            orders = np.where(tradable, target - positions, 0)
+
+            new_cash, new_positions, filled, commission = Broker.execute_batch(
+                [cash], positions[None, :], prices, orders[None, :], commission_rate,
+                None if volume is None else np.nan_to_num(volume[t]), volume_limit)
+            cash, positions = float(new_cash[0]), new_positions[0]
+
+            position_history[k] = positions
+            turnover[k] = np.abs(filled[0]) @ prices / value if value > 0 else 0.0
+            total_commission += float(commission.sum())
+
+            # 本次调仓至下次调仓前的逐日权益
+            end = rebalance_index[k + 1] if k + 1 < len(rebalance_index) else n_days
+            equity[t:end] = cash + marked[t:end] @ positions
+
+        return {
+            'equity': equity,
+            'positions': position_history,
+            'weights': weight_history,
+            'turnover': turnover,
+            'commission': total_commission,
+            'cash': cash,
+        }
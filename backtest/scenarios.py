@@ -0,0 +1,175 @@
+import itertools
+import numpy as np
+import pandas as pd
+from backtest.broker import Broker
+from backtest.ledger import BUY
+
+
+class ScenarioBacktester:
+    """手续费率、滑点与初始资金的情景分析
+
+    不同手续费率和初始资金下的买卖信号相同，无需逐一完整回测：先按基准设置回测一次，
+    得到成交序列；再把全部情景作为多个账户，只在成交的K线上经 Broker.execute_batch
+    一次处理所有情景的订单，资金、持仓、每轮成本等路径相关的记账沿情景维度向量化。
+
+    各情景的下单规模按基准下单的比例换算：买入按基准计划买入（成交量上限截断前）的支出
+    （含手续费）占买入前资金的比例，用该情景的资金、成交价和费率换算股数，再按该情景
+    自身的资金与成交量上限成交；卖出按基准卖出占持仓的比例。滑点按比例加在成交价上
+    （买入价上浮、卖出价下调），权益仍按收盘价估值。
+
+    各情景沿用基准的成交时点：依赖入场价、持仓或资金的判断（风控离场、加减仓）不随情景
+    重新计算，与逐一完整回测的差异随情景偏离基准的程度增大，适合比较成本与资金规模的影响。
+    """
+
+    @staticmethod
+    def grid(commission_rates, slippages=(0.0,), capitals=(1000000,)):
+        """
+        展开情景网格
+
+        Returns:
+            pd.DataFrame: 每行一个情景，列为 commission_rate、slippage、initial_capital
+        """
+        rows = list(itertools.product(commission_rates, slippages, capitals))
+        return pd.DataFrame(rows, columns=['commission_rate', 'slippage', 'initial_capital'], dtype=np.float64)
+
+    @staticmethod
+    def order_fractions(columns):
+        """
+        由基准成交记录得到各笔成交的下单比例
+
+        买入按计划股数（requested）计：基准受成交量上限截断时，比例仍反映策略原本的
+        下单规模，截断由各情景按自身规模重新判断。
+
+        Returns:
+            tuple: (计划买入支出（含手续费） / 买入前资金, 卖出股数 / 卖出前持仓)，非对应方向处为0
+        """
+        is_buy = columns['side'] == BUY
+        shares = columns['shares']
+        signed = np.where(is_buy, shares, -shares)
+        held_before = np.cumsum(signed) - signed
+        cash_before = columns['cash'] + np.where(is_buy, columns['amount'] + columns['commission'], 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            spent = (columns['amount'] + columns['commission']) * columns['requested'] / shares
+            buy_fraction = np.where(is_buy, spent / cash_before, 0.0)
+            sell_fraction = np.where(is_buy, 0.0, shares / np.maximum(held_before, 1))
+        return buy_fraction, sell_fraction
+
+    @staticmethod
+    def replay(close, trade_index, is_buy, buy_fraction, sell_fraction, scenarios,
+               volume=None, volume_limit=None):
+        """
+        在全部情景上重放成交序列
+
+        Args:
+            close (np.ndarray): 收盘价 (T,)
+            trade_index (np.ndarray): 各笔成交所在K线位置（升序）
+            is_buy (np.ndarray): 各笔成交是否为买入
+            buy_fraction, sell_fraction (np.ndarray): order_fractions的结果
+            scenarios (pd.DataFrame): grid的结果
+            volume (np.ndarray): 成交量 (T,)，配合volume_limit限制买入股数
+            volume_limit (float): 单笔买入不超过当根K线成交量的比例
+
+        Returns:
+            dict: summary（各情景的期末资金与权益、收益率、最大回撤、交易次数、胜率、手续费、换手率，DataFrame）、
+                  equity（逐日权益 (T, 情景数)）
+        """
+        close = np.asarray(close, dtype=np.float64)
+        rates = scenarios['commission_rate'].to_numpy(dtype=np.float64)
+        slippage = scenarios['slippage'].to_numpy(dtype=np.float64)
+        capital = scenarios['initial_capital'].to_numpy(dtype=np.float64)
+        n_scenarios = len(scenarios)
+
+        cash = capital.copy()
+        positions = np.zeros(n_scenarios, dtype=np.int64)
+        # 每轮（从空仓到清仓）买入的总成本与股数，用于计算各笔卖出盈亏
+        round_cost = np.zeros(n_scenarios)
+        round_shares = np.zeros(n_scenarios, dtype=np.int64)
+        trades = np.zeros(n_scenarios, dtype=np.int64)
+        wins = np.zeros(n_scenarios, dtype=np.int64)
+        total_commission = np.zeros(n_scenarios)
+        traded = np.zeros(n_scenarios)
+        peak = capital.copy()
+        max_drawdown = np.zeros(n_scenarios)
+
+        cash_after = np.empty((len(trade_index) + 1, n_scenarios))
+        positions_after = np.empty((len(trade_index) + 1, n_scenarios), dtype=np.int64)
+        cash_after[0], positions_after[0] = cash, positions
+
+        for k, t in enumerate(trade_index):
+            if is_buy[k]:
+                prices = close[t] * (1 + slippage)
+                # 比例换算的股数加微小容差，避免浮点误差使基准情景少买一股
+                orders = np.floor(buy_fraction[k] * cash / (prices * (1 + rates)) + 1e-9)
+            else:
+                prices = close[t] * (1 - slippage)
+                orders = -np.floor(sell_fraction[k] * positions + 1e-9)
+            held = positions
+            cash, positions, filled, commission = Broker.execute_batch(
+                cash, positions, prices, orders, rates,
+                None if volume is None else np.full(n_scenarios, volume[t]), volume_limit)
+            amount = np.abs(filled) * prices
+            total_commission += commission
+            traded += amount
+
+            if is_buy[k]:
+                new_round = (held == 0) & (filled > 0)
+                round_cost = np.where(new_round, 0.0, round_cost) + amount + commission
+                round_shares = np.where(new_round, 0, round_shares) + filled
+            else:
+                sold = filled < 0
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    pnl = amount - commission + filled * round_cost / round_shares
+                trades += sold
+                wins += sold & (pnl > 0)
+                # 与calculate_performance一致：回撤按每笔卖出后的资金计算
+                drawdown = np.where(sold, (peak - cash) / peak * 100, 0.0)
+                max_drawdown = np.maximum(max_drawdown, drawdown)
+                peak = np.where(sold, np.maximum(peak, cash), peak)
+            cash_after[k + 1], positions_after[k + 1] = cash, positions
+
+        # 逐日权益：各K线取此前最近一笔成交后的资金与持仓，按收盘价估值
+        last = np.searchsorted(trade_index, np.arange(len(close)), side='right')
+        equity = cash_after[last] + positions_after[last] * close[:, None]
+
+        summary = scenarios.copy()
+        # 与calculate_performance一致：收益率按期末资金计算，未平仓部分另见期末权益
+        summary['final_capital'] = cash
+        summary['final_equity'] = equity[-1] if len(close) else capital
+        summary['profit_rate'] = (cash / capital - 1) * 100
+        summary['max_drawdown'] = max_drawdown
+        summary['total_trades'] = trades
+        summary['win_rate'] = np.where(trades > 0, wins / np.maximum(trades, 1) * 100, 0.0)
+        summary['commission'] = total_commission
+        summary['turnover'] = traded / capital
+        return {'summary': summary, 'equity': equity}
+
+    @staticmethod
+    def run(strategy, data, commission_rates=None, slippages=(0.0,), capitals=None):
+        """
+        以已完成回测的策略为基准，一次计算全部情景
+
+        Args:
+            strategy: 已运行回测的策略实例（基准情景）
+            data (pd.DataFrame): 回测所用行情（含date、close、volume列）
+            commission_rates (list): 手续费率，默认为基准费率
+            slippages (list): 滑点比例
+            capitals (list): 初始资金，默认为基准资金
+
+        Returns:
+            dict: 同replay
+        """
+        calendar = strategy.trades.dates
+        if not calendar:
+            raise ValueError(f"{strategy.name} 尚未回测")
+        frame = data.set_index('date').reindex(calendar)
+        close = frame['close'].to_numpy(dtype=np.float64)
+        volume = frame['volume'].to_numpy(dtype=np.float64)
+
+        scenarios = ScenarioBacktester.grid(
+            commission_rates if commission_rates is not None else [strategy.commission_rate],
+            slippages,
+            capitals if capitals is not None else [strategy.initial_capital])
+        columns = strategy.trades.columns
+        buy_fraction, sell_fraction = ScenarioBacktester.order_fractions(columns)
+        return ScenarioBacktester.replay(close, columns['date_index'], columns['side'] == BUY,
+                                         buy_fraction, sell_fraction, scenarios, volume, strategy.volume_limit)
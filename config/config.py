@@ -1,139 +1,368 @@
 """
 策略参数配置文件
 包含所有交易策略的参数设置
+
+每个策略的 *_CONFIG 字典即其默认参数，键与策略属性同名，
+构造策略时可按关键字参数覆盖（如 MACDStrategy(capital, commission, fast=8)）；
+*_SEARCH_SPACE 字典给出参数寻优时各参数的候选取值，
+*_SEARCH_CONSTRAINT 过滤其中无效的参数组合（如快线周期不小于慢线周期）。
 """
 
+
+class SearchConstraint:
+    """参数组合约束，参数寻优时默认使用策略声明的约束过滤网格
+
+    组合中未出现的参数按默认配置取值（如只搜索快线周期时与默认慢线周期比较）。
+    """
+
+    def __init__(self, defaults, ordered=(), depends=None):
+        """
+        Args:
+            defaults (dict): 策略的默认配置
+            ordered (list): 须严格递增的参数名序列，如 [('fast', 'slow')]
+            depends (dict): 参数名 -> (条件参数名, 取值列表)，条件参数不在取值列表中时该参数不起作用，
+                            只保留其取默认值的组合，避免重复回测
+        """
+        self.defaults = defaults
+        self.ordered = [tuple(names) for names in ordered]
+        self.depends = dict(depends or {})
+
+    def __call__(self, params):
+        values = {**self.defaults, **params}
+        for names in self.ordered:
+            sequence = [values[name] for name in names]
+            if any(a >= b for a, b in zip(sequence, sequence[1:])):
+                return False
+        for name, (condition, allowed) in self.depends.items():
+            if values[condition] not in allowed and values[name] != self.defaults[name]:
+                return False
+        return True
+
 # 双均线量策略参数
 DUAL_MA_VOLUME_CONFIG = {
-    'fast_period': 5,
-    'slow_period': 20,
-    'volume_ma_period': 20,
-    'volume_threshold': 1.5,
+    'fast_period': 3,
+    'slow_period': 10,
+    'volume_period': 7,
     'stop_loss': 0.02,
-    'profit_target': 0.04
+    'profit_target': 0.03,
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
 }
 
+DUAL_MA_VOLUME_SEARCH_SPACE = {
+    'fast_period': [3, 5, 8],
+    'slow_period': [10, 15, 20, 30],
+    'volume_period': [5, 7, 10],
+    'stop_loss': [0.015, 0.02, 0.03],
+    'profit_target': [0.03, 0.05],
+}
+
+DUAL_MA_VOLUME_SEARCH_CONSTRAINT = SearchConstraint(DUAL_MA_VOLUME_CONFIG, [('fast_period', 'slow_period')])
+
 # 均值回归策略参数
 MEAN_REVERSION_CONFIG = {
-    'ma_period': 20,
-    'std_dev_period': 20,
-    'std_dev_multiplier': 2,
-    'rsi_period': 14,
-    'rsi_oversold': 30,
-    'rsi_overbought': 70,
-    'stop_loss': 0.02,
-    'profit_target': 0.04
+    # 缩短均值回归周期
+    'ma_short': 3,  # 原为5
+    'ma_medium': 8,  # 原为10
+    'ma_long': 15,  # 原为20
+    # 调整偏离阈值
+    'std_dev_period': 15,  # 原为20
+    'entry_std_dev': 1.5,  # 原为2.0
+    'exit_std_dev': 0.5,  # 原为1.0
+    # 调整RSI参数
+    'rsi_period': 10,  # 原为14
+    'rsi_upper': 75,  # 原为70
+    'rsi_lower': 25,  # 原为30
+    # 风控参数
+    'stop_loss': 0.03,  # 3%止损
+    'profit_target': 0.05,  # 5%止盈
+    'trailing_stop': 0.02,  # 2%追踪止损
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
+    'volume_period': 5,
+}
+
+MEAN_REVERSION_SEARCH_SPACE = {
+    'ma_long': [10, 15, 20],
+    'std_dev_period': [10, 15, 20],
+    'entry_std_dev': [1.0, 1.5, 2.0],
+    'exit_std_dev': [0.25, 0.5, 1.0],
+    'stop_loss': [0.02, 0.03],
+    'trailing_stop': [0.015, 0.02, 0.03],
 }
 
+MEAN_REVERSION_SEARCH_CONSTRAINT = SearchConstraint(
+    MEAN_REVERSION_CONFIG, [('ma_short', 'ma_medium', 'ma_long'), ('exit_std_dev', 'entry_std_dev')])
+
 # 趋势跟踪策略参数
 TREND_FOLLOWING_CONFIG = {
-    'short_period': 20,
-    'medium_period': 60,
-    'long_period': 120,
+    'short_period': 10,
+    'long_period': 30,
     'atr_period': 14,
-    'atr_multiplier': 1.5,
-    'adx_period': 14,
-    'adx_threshold': 25,
-    'stop_loss': 0.02
+    'stop_multiple': 2.5,
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
+}
+
+TREND_FOLLOWING_SEARCH_SPACE = {
+    'short_period': [5, 10, 20],
+    'long_period': [20, 30, 60],
+    'atr_period': [10, 14, 20],
+    'stop_multiple': [1.5, 2.0, 2.5, 3.0],
 }
 
+TREND_FOLLOWING_SEARCH_CONSTRAINT = SearchConstraint(TREND_FOLLOWING_CONFIG, [('short_period', 'long_period')])
+
 # 量价分析策略参数
 VOLUME_BASED_CONFIG = {
-    'volume_ma_period': 20,
-    'price_ma_period': 20,
-    'volume_threshold': 2.0,
-    'price_change_threshold': 0.02,
-    'obv_ma_period': 20,
-    'mfi_period': 14,
-    'mfi_oversold': 20,
-    'mfi_overbought': 80,
-    'stop_loss': 0.03,
-    'profit_target': 0.05
+    'volume_ma_period': 10,
+    'price_ma_period': 5,
+    'volume_threshold': 1.3,
+    'stop_loss': 0.02,
+    'profit_target': 0.04,
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
+}
+
+VOLUME_BASED_SEARCH_SPACE = {
+    'volume_ma_period': [5, 10, 20],
+    'price_ma_period': [3, 5, 10],
+    'volume_threshold': [1.2, 1.3, 1.5, 2.0],
+    'stop_loss': [0.015, 0.02, 0.03],
+    'profit_target': [0.03, 0.04, 0.05],
 }
 
 # 统计套利策略参数
 STATISTICAL_ARBITRAGE_CONFIG = {
-    'lookback_period': 60,
-    'zscore_threshold': 2.0,
+    # 参数设置
+    'lookback_period': 60,  # 回看期
+    'zscore_threshold': 2.0,  # z-score阈值
     'ma_period': 20,
     'std_period': 20,
     'correlation_period': 60,
+    'volatility_baseline_window': None,  # 基准波动率窗口，None为扩展均值
     'stop_loss': 0.03,
-    'profit_target': 0.05
+    'profit_target': 0.05,
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
+    # 配对交易参数（screen_pairs / run_pairs使用）
+    'pair_min_corr': 0.7,  # 预筛选的收益率相关系数下限
+    'pair_max_candidates': 2000,  # 预筛选后进入协整检验的最多配对数
+    'pair_adf_lags': 1,  # ADF检验滞后阶数
+    'pair_adf_critical': -3.34,  # Engle-Granger检验5%临界值（两变量）
+    'pair_half_life_range': (2, 60),  # 可接受的半衰期范围（交易日）
+    'pair_max_selected': 20,  # 最多交易的配对数
+    'pair_formation_period': 250,  # 形成期长度：在此之前的数据用于筛选配对
+    'pair_zscore_window': 20,  # 价差z-score的滚动窗口
+    'pair_zscore_min_fraction': 0.75,  # 窗口内有效价差不少于该比例时计算z-score（停牌日不计入）
+    'pair_entry_z': 2.0,  # 价差偏离超过该值时开仓
+    'pair_exit_z': 0.5,  # 价差回归至该值以内时平仓
+    'pair_stop_z': 4.0,  # 价差继续偏离超过该值时止损
+    'pair_n_jobs': None,  # 协整检验进程数，None为CPU核数
+}
+
+STATISTICAL_ARBITRAGE_SEARCH_SPACE = {
+    'lookback_period': [40, 60, 120],
+    'zscore_threshold': [1.5, 2.0, 2.5],
+    'ma_period': [10, 20, 30],
+    'std_period': [10, 20, 30],
+    'stop_loss': [0.02, 0.03, 0.05],
 }
 
 # 事件驱动策略参数
 EVENT_DRIVEN_CONFIG = {
-    'volume_surge_threshold': 3.0,
-    'price_change_threshold': 0.05,
+    # 参数设置
+    'volume_surge_threshold': 3.0,  # 成交量突增阈值
+    'price_change_threshold': 0.05,  # 价格变动阈值
     'ma_period': 20,
     'volatility_period': 20,
+    'volatility_baseline_window': None,  # 基准波动率窗口，None为扩展均值
     'rsi_period': 14,
     'rsi_oversold': 30,
     'rsi_overbought': 70,
     'stop_loss': 0.03,
-    'profit_target': 0.05
+    'profit_target': 0.05,
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
+}
+
+EVENT_DRIVEN_SEARCH_SPACE = {
+    'volume_surge_threshold': [2.0, 2.5, 3.0],
+    'price_change_threshold': [0.03, 0.05, 0.07],
+    'ma_period': [10, 20, 30],
+    'rsi_period': [10, 14],
+    'stop_loss': [0.02, 0.03],
+    'profit_target': [0.05, 0.08],
 }
 
 # 布林带策略参数
 BOLLINGER_CONFIG = {
-    'period': 20,
-    'std_dev': 2,
-    'stop_loss': 0.03,
-    'profit_target': 0.05
+    'period': 10,
+    'std_dev': 1.5,
+    'stop_loss': 0.015,
+    'profit_target': 0.025,
+    'trend_period': 20,
+    'volume_ma_period': 5,
+}
+
+BOLLINGER_SEARCH_SPACE = {
+    'period': [10, 15, 20],
+    'std_dev': [1.5, 2.0, 2.5],
+    'trend_period': [10, 20, 30],
+    'stop_loss': [0.015, 0.02, 0.03],
+    'profit_target': [0.025, 0.04],
 }
 
 # MACD策略参数
 MACD_CONFIG = {
-    'fast_period': 12,
-    'slow_period': 26,
-    'signal_period': 9,
-    'stop_loss': 0.03,
-    'profit_target': 0.05
+    'fast': 6,
+    'slow': 13,
+    'signal': 5,
+    'stop_loss': 0.015,
+    'profit_target': 0.025,
+    'volume_ma_period': 5,
 }
 
+MACD_SEARCH_SPACE = {
+    'fast': [6, 8, 12],
+    'slow': [13, 17, 26],
+    'signal': [5, 7, 9],
+    'stop_loss': [0.015, 0.02, 0.03],
+    'profit_target': [0.025, 0.04, 0.05],
+}
+
+MACD_SEARCH_CONSTRAINT = SearchConstraint(MACD_CONFIG, [('fast', 'slow')])
+
 # KDJ策略参数
 KDJ_CONFIG = {
-    'fastk_period': 9,
-    'slowk_period': 3,
-    'slowd_period': 3,
-    'stop_loss': 0.03,
-    'profit_target': 0.05
+    'k_period': 5,
+    'stop_loss': 0.015,
+    'profit_target': 0.025,
+    'volume_ma_period': 5,
+    'trend_period': 10,
+}
+
+KDJ_SEARCH_SPACE = {
+    'k_period': [5, 9, 14],
+    'trend_period': [10, 20],
+    'volume_ma_period': [5, 10],
+    'stop_loss': [0.015, 0.02, 0.03],
+    'profit_target': [0.025, 0.04],
 }
 
 # 增强混合策略参数
 ENHANCED_HYBRID_CONFIG = {
-    'ma_short': 5,
-    'ma_long': 20,
-    'rsi_period': 14,
-    'rsi_oversold': 30,
-    'rsi_overbought': 70,
-    'volume_ma_period': 20,
-    'volume_threshold': 2.0,
-    'stop_loss': 0.03,
-    'profit_target': 0.05
+    # 降低MACD参数以提高灵敏度
+    'fast_period': 8,  # 原为12
+    'slow_period': 17,  # 原为26
+    'signal_period': 7,  # 原为9
+    # 调整RSI参数
+    'rsi_period': 10,  # 原为14
+    'rsi_upper': 75,  # 原为70
+    'rsi_lower': 25,  # 原为30
+    # 调整均线参数
+    'ma_short': 5,  # 原为10
+    'ma_long': 15,  # 原为20
+    # 调整布林带参数
+    'bb_period': 15,  # 原为20
+    'bb_std': 1.8,  # 原为2.0
+    # 风控参数
+    'stop_loss': 0.03,  # 3%止损
+    'profit_target': 0.05,  # 5%止盈
+    'trailing_stop': 0.02,  # 2%追踪止损
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
+    # 参数设置 - 缩短周期以增加交易频率
+    'short_period': 3,
+    'medium_period': 7,
+    'volume_ma_period': 10,
+    'atr_period': 10,
+    'min_holding_days': 2,
+    # 动态止损参数 - 调整止损设置
+    'initial_stop_loss': 0.015,
+    # 仓位管理参数 - 更积极的仓位管理
+    'max_position_size': 0.9,
+    'min_position_size': 0.3,
+    'position_step': 0.15,
+    # 投票规则：满足buy_votes个买入条件（且成交量确认）时买入，满足sell_votes个卖出条件时卖出
+    'buy_conditions': ('macd', 'rsi', 'ma', 'bb'),
+    'sell_conditions': ('macd', 'rsi', 'ma', 'bb'),
+    'buy_votes': 2,  # 原为3
+    'sell_votes': 2,  # 原为3
+    'bb_buy_band': 1.02,  # 价格低于下轨*1.02视为布林带支撑
+    'bb_sell_band': 0.98,  # 价格高于上轨*0.98视为布林带压力
+    'volume_confirm_ratio': 0.8,  # 成交量确认的量比下限，None表示不要求
+}
+
+ENHANCED_HYBRID_SEARCH_SPACE = {
+    'fast_period': [8, 12],
+    'slow_period': [17, 26],
+    'rsi_period': [10, 14],
+    'ma_short': [5, 10],
+    'ma_long': [15, 20],
+    'stop_loss': [0.02, 0.03],
+    'trailing_stop': [0.015, 0.02, 0.03],
+}
+
+ENHANCED_HYBRID_SEARCH_CONSTRAINT = SearchConstraint(
+    ENHANCED_HYBRID_CONFIG, [('fast_period', 'slow_period'), ('ma_short', 'ma_long')])
+
+# 投票规则的遗传搜索空间（GeneticRuleSearch使用）：条件的启用与票数由搜索本身决定，
+# 这里给出各条件阈值与风控参数的候选取值
+ENHANCED_HYBRID_RULE_SPACE = {
+    'rsi_lower': [20, 25, 30, 35],
+    'rsi_upper': [65, 70, 75, 80],
+    'bb_buy_band': [1.0, 1.01, 1.02, 1.03],
+    'bb_sell_band': [0.97, 0.98, 0.99, 1.0],
+    'volume_confirm_ratio': [None, 0.6, 0.8, 1.0, 1.2],
+    'stop_loss': [0.02, 0.03, 0.05],
+    'profit_target': [0.05, 0.08, 0.12],
+    'trailing_stop': [0.015, 0.02, 0.03],
 }
 
 # 质量轮动策略参数
 QUALITY_ROTATION_CONFIG = {
+    # 参数设置
     'ma_period': 20,
     'momentum_period': 60,
     'volatility_period': 20,
-    'quality_threshold': 0.7,
-    'momentum_threshold': 0.02,
+    'quality_threshold': 0.7,  # 质量分数阈值
+    'momentum_threshold': 0.02,  # 动量阈值
     'stop_loss': 0.03,
-    'profit_target': 0.05
+    'profit_target': 0.05,
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
+    # 横截面轮动参数（run_rotation使用）
+    'top_n': 20,  # 持有得分最高的股票数
+    'rebalance_period': 20,  # 调仓间隔（交易日）
+    'max_turnover': 0.5,  # 每次调仓最多替换的持仓比例（相对top_n），None表示不限制
+}
+
+QUALITY_ROTATION_SEARCH_SPACE = {
+    'ma_period': [10, 20, 30],
+    'momentum_period': [20, 60, 120],
+    'volatility_period': [10, 20],
+    'quality_threshold': [0.6, 0.7, 0.8],
+    'stop_loss': [0.03, 0.05],
 }
 
 # 风险平价策略参数
 RISK_PARITY_CONFIG = {
-    'volatility_period': 60,
+    # 参数设置
+    'volatility_period': 20,
     'ma_period': 20,
-    'risk_target': 0.15,
-    'max_leverage': 2.0,
-    'min_position': 0.1,
+    'risk_target': 0.15,  # 目标年化波动率
+    'max_leverage': 2.0,  # 最大杠杆倍数
+    'min_position': 0.1,  # 最小仓位比例
     'stop_loss': 0.03,
-    'profit_target': 0.05
+    'profit_target': 0.05,
+    'volume_limit': 0.1,  # 单笔买入不超过当日成交量的10%
+    # 多资产风险平价参数（run_portfolio使用）
+    'portfolio_rebalance_period': 5,  # 调仓间隔（交易日，5即每周）
+    'cov_method': 'ewma',  # 协方差估计：'ewma' 或 'rolling'
+    'ewma_lambda': 0.94,  # EWMA衰减系数
+    'cov_window': 60,  # 滑动窗口长度，也是首次调仓前的预热长度
+    'shrinkage': 0.1,  # 向对角阵收缩的强度，0表示不收缩
+}
+
+RISK_PARITY_SEARCH_SPACE = {
+    'volatility_period': [10, 20, 60],
+    'ma_period': [10, 20, 30],
+    'risk_target': [0.1, 0.15, 0.2],
+    'min_position': [0.1, 0.2],
+    'stop_loss': [0.03, 0.05],
 }
 
 # 突破策略参数
@@ -171,4 +400,75 @@ BREAKOUT_CONFIG = {
     # 仓位管理
     'max_position_pct': 0.3,  # 最大仓位比例（30%）
     'max_volume_pct': 0.1,  # 最大成交量使用比例（10%）
-} 
\ No newline at end of file
+}
+
+BREAKOUT_SEARCH_SPACE = {
+    'price_period': [5, 10, 20],
+    'volume_period': [3, 5, 10],
+    'breakout_threshold': [1.005, 1.008, 1.01],
+    'volume_threshold': [1.2, 1.5],
+    'stop_loss': [0.015, 0.02, 0.03],
+    'trailing_stop': [0.01, 0.015, 0.02],
+}
+
+# 波段策略参数
+SWING_CONFIG = {
+    # 技术指标参数
+    'fast_period': 5,
+    'slow_period': 10,
+    'signal_period': 9,
+    'rsi_period': 14,
+    'bb_period': 20,
+    'atr_period': 14,
+    # 波段交易参数
+    'oversold_threshold': 30,
+    'overbought_threshold': 70,
+    'bb_dev': 2.0,
+    'volume_ma_period': 20,
+    # 止损止盈参数
+    'stop_loss': 0.03,
+    'profit_target': 0.05,
+    'trailing_stop': 0.02,
+}
+
+SWING_SEARCH_SPACE = {
+    'fast_period': [5, 8],
+    'slow_period': [10, 17],
+    'rsi_period': [10, 14],
+    'bb_period': [15, 20],
+    'oversold_threshold': [25, 30, 35],
+    'stop_loss': [0.02, 0.03],
+    'trailing_stop': [0.015, 0.02, 0.03],
+}
+
+SWING_SEARCH_CONSTRAINT = SearchConstraint(SWING_CONFIG, [('fast_period', 'slow_period')])
+
+# 定投策略参数
+DCA_CONFIG = {
+    # 定投参数
+    'schedule': 'interval',  # 定投日历：interval / weekly / monthly / nth_trading_day
+    'investment_period': 5,  # interval：每5个交易日定投一次（从首个可交易K线起算）
+    'schedule_weekday': 0,  # weekly：每周该星期几（0为周一）或之后的首个交易日
+    'schedule_day': 1,  # monthly：每月该日或之后的首个交易日
+    'schedule_nth': 1,  # nth_trading_day：每月第N个交易日，负数表示倒数
+    'base_position': 0.1,  # 基础仓位比例（10%）
+    'max_position': 0.8,  # 最大仓位比例（80%）
+    # 技术指标参数
+    'ma_short': 5,
+    'ma_long': 20,
+    'rsi_period': 14,
+    'volume_period': 10,
+    # 止损参数
+    'stop_loss': 0.1,  # 总体止损线（10%）
+    'position_stop': 0.05,  # 单次加仓止损线（5%）
+}
+
+DCA_SEARCH_SPACE = {
+    'schedule': ['interval', 'weekly', 'monthly'],
+    'investment_period': [5, 10, 20],
+    'base_position': [0.05, 0.1, 0.2],
+    'stop_loss': [0.08, 0.1, 0.15],
+}
+
+# investment_period只对interval日历起作用
+DCA_SEARCH_CONSTRAINT = SearchConstraint(DCA_CONFIG, depends={'investment_period': ('schedule', ['interval'])})
@@ -1,9 +1,12 @@
 import baostock as bs
+from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
+from data.panel import StockPanel
 
 class DataProvider:
     @staticmethod
-    def get_stock_data(stock_code, start_date, end_date):
+    def get_stock_data(stock_code, start_date, end_date, warmup_bars=0):
         """
         从baostock获取股票数据
         
@@ -11,6 +14,7 @@ class DataProvider:
             stock_code (str): 股票代码（如：sh.600000）
             start_date (str): 开始日期（YYYY-MM-DD）
             end_date (str): 结束日期（YYYY-MM-DD）
+            warmup_bars (int): 在开始日期之前额外保留的K线数，用于指标预热
             
         Returns:
             pd.DataFrame: 包含股票数据的DataFrame
@@ -22,11 +26,18 @@ class DataProvider:
             return None
             
         try:
+            # 按自然日多取一段历史以覆盖预热所需的交易日（含节假日余量）
+            query_start = start_date
+            if warmup_bars > 0:
+                calendar_days = int(warmup_bars * 1.5) + 15
+                query_start = (datetime.strptime(start_date, '%Y-%m-%d')
+                               - timedelta(days=calendar_days)).strftime('%Y-%m-%d')
+            
             # 获取股票数据
             rs = bs.query_history_k_data_plus(
                 stock_code,
                 "date,code,open,high,low,close,volume,amount",
-                start_date=start_date,
+                start_date=query_start,
                 end_date=end_date,
                 frequency="d"
             )
@@ -41,6 +52,11 @@ class DataProvider:
             # 转换数据类型
             for col in ['open', 'high', 'low', 'close', 'volume']:
                 data[col] = data[col].astype(float)
+            
+            # 开始日期之前只保留预热所需的K线
+            if warmup_bars > 0:
+                start_idx = int((data['date'] < start_date).sum())
+                data = data.iloc[max(start_idx - warmup_bars, 0):].reset_index(drop=True)
                 
             return data
             
@@ -65,4 +81,50 @@ class DataProvider:
                 return rs.get_row_data()[1]
             return "未知"
         finally:
-            bs.logout() 
\ No newline at end of file
+            bs.logout()
+
+    @staticmethod
+    def get_panel_data(stock_codes, start_date, end_date, dtype=np.float64):
+        """
+        批量获取多只股票数据并对齐为面板
+        
+        Args:
+            stock_codes (list): 股票代码列表
+            start_date (str): 开始日期（YYYY-MM-DD）
+            end_date (str): 结束日期（YYYY-MM-DD）
+            dtype: 面板数值精度（np.float64 或 np.float32）
+            
+        Returns:
+            StockPanel: 日期 × 股票的行情面板
+        """
+        lg = bs.login()
+        if lg.error_code != '0':
+            print('登录失败')
+            return None
+            
+        try:
+            frames = {}
+            for stock_code in stock_codes:
+                rs = bs.query_history_k_data_plus(
+                    stock_code,
+                    "date,open,high,low,close,volume,amount",
+                    start_date=start_date,
+                    end_date=end_date,
+                    frequency="d"
+                )
+                
+                data_list = []
+                while (rs.error_code == '0') & rs.next():
+                    data_list.append(rs.get_row_data())
+                if not data_list:
+                    continue
+                
+                data = pd.DataFrame(data_list, columns=rs.fields)
+                for col in ['open', 'high', 'low', 'close', 'volume', 'amount']:
+                    data[col] = pd.to_numeric(data[col], errors='coerce')
+                frames[stock_code] = data
+                
+            return StockPanel.from_frames(frames, dtype)
+            
+        finally:
+            bs.logout()
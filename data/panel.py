@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+class StockPanel:
+    """多股票行情面板（日期 × 股票）
+
+    每个字段保存为形如 (T, N) 的二维数组，行对应交易日，列对应股票代码；
+    某只股票在某日无行情（未上市、停牌）时该位置为 NaN。
+    全市场面板可用 dtype=np.float32 以单精度保存，内存占用减半。
+    """
+
+    FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+    def __init__(self, dates, codes, fields, dtype=np.float64):
+        self.dates = np.asarray(dates)
+        self.codes = list(codes)
+        self.dtype = np.dtype(dtype)
+        self.fields = {name: np.asarray(values, dtype=self.dtype) for name, values in fields.items()}
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+
+    @classmethod
+    def from_frames(cls, frames, dtype=np.float64):
+        """
+        由多只股票的日线DataFrame构建面板
+
+        Args:
+            frames (dict): 股票代码 -> 包含date及行情列的DataFrame
+            dtype: 面板数值精度（np.float64 或 np.float32）
+
+        Returns:
+            StockPanel: 按日期并集对齐后的面板
+        """
+        parts = []
+        for code, df in frames.items():
+            if df is None or df.empty:
+                continue
+            part = df.copy()
+            part['code'] = code
+            parts.append(part)
+        if not parts:
+            return cls([], [], {}, dtype)
+
+        long_df = pd.concat(parts, ignore_index=True)
+        codes = [code for code in frames if code in set(long_df['code'])]
+        fields = {}
+        dates = None
+        for field in cls.FIELDS:
+            if field not in long_df.columns:
+                continue
+            wide = long_df.pivot_table(index='date', columns='code', values=field, aggfunc='last')
+            wide = wide.sort_index().reindex(columns=codes)
+            dates = wide.index.values
+            fields[field] = wide.to_numpy(dtype=dtype)
+        return cls(dates, codes, fields, dtype)
+
+    @property
+    def shape(self):
+        """面板形状 (交易日数, 股票数)"""
+        return len(self.dates), len(self.codes)
+
+    def astype(self, dtype):
+        """返回指定精度的面板副本"""
+        return StockPanel(self.dates, self.codes, self.fields, dtype)
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def __contains__(self, field):
+        return field in self.fields
+
+    def symbol_frame(self, code):
+        """取出单只股票的行情DataFrame（去除无行情的日期）"""
+        col = self._code_index[code]
+        df = pd.DataFrame({'date': self.dates})
+        for field, values in self.fields.items():
+            df[field] = values[:, col]
+        return df.dropna(subset=['close']).reset_index(drop=True)
@@ -0,0 +1,109 @@
+import numpy as np
+
+
+class EWMACovariance:
+    """指数加权协方差矩阵，逐根K线增量更新
+
+    每次 update 只做一次秩一修正：cov = lam * cov + (1 - lam) * (r - mean)(r - mean)'，
+    均值同样按指数加权更新，单步开销为 O(N^2)，无需回看历史窗口。
+
+    收益率为 NaN（未上市、停牌）的资产在该K线上的偏差记为0（相当于按均值填充），
+    均值不更新；同时记录各资产有效K线的权重，按其把方差换算回有效样本上的水平，
+    协方差矩阵因此保持半正定，停牌也不会压低方差。counts 为各资产的有效收益率个数。
+    """
+
+    def __init__(self, n_assets, lam=0.94):
+        self.lam = lam
+        self.mean = np.zeros(n_assets)
+        self.cov = np.zeros((n_assets, n_assets))
+        # 各资产有效K线的指数加权权重与全部K线的权重
+        self.weight = np.zeros(n_assets)
+        self.total_weight = 0.0
+        self.counts = np.zeros(n_assets, dtype=np.int64)
+        self.count = 0
+
+    def update(self, returns):
+        """加入一根K线的收益率向量"""
+        r = np.asarray(returns, dtype=np.float64)
+        valid = ~np.isnan(r)
+        # 各资产的首个有效收益率只用于初始化均值
+        first = valid & (self.counts == 0)
+        self.mean[first] = r[first]
+        seen = valid & ~first
+        d = np.where(seen, r - self.mean, 0.0)
+        if self.count > 0:
+            self.mean += (1 - self.lam) * d
+            # 就地更新，避免每步分配新矩阵
+            self.cov *= self.lam
+            self.cov += (self.lam * (1 - self.lam)) * np.outer(d, d)
+            self.weight = self.lam * self.weight + (1 - self.lam) * seen
+            self.total_weight = self.lam * self.total_weight + (1 - self.lam)
+        self.counts += valid
+        self.count += 1
+
+    def covariance(self):
+        """当前协方差矩阵（副本），无有效样本的资产所在行列为0"""
+        scale = np.zeros_like(self.weight)
+        observed = self.weight > 0
+        scale[observed] = np.sqrt(self.total_weight / self.weight[observed])
+        return self.cov * np.outer(scale, scale)
+
+
+class RollingCovariance:
+    """滑动窗口样本协方差矩阵，逐根K线增量更新
+
+    维护窗口内各资产对共同有效K线的个数、一阶和与二阶和，新K线进入、最旧K线移出时
+    各做一次秩一修正，单步开销为 O(N^2)。
+
+    收益率为 NaN（未上市、停牌）的资产在该K线上按其窗口内均值填充，协方差再按各资产
+    自身的有效样本数换算（无偏估计），矩阵保持半正定，停牌也不会压低方差。
+    counts 为各资产累计的有效收益率个数。
+    """
+
+    def __init__(self, n_assets, window=60):
+        self.window = window
+        self.buffer = np.full((window, n_assets), np.nan)
+        self.pair_count = np.zeros((n_assets, n_assets))
+        # sum[i, j]：资产i在i、j都有效的K线上的收益率之和
+        self.sum = np.zeros((n_assets, n_assets))
+        self.sum_sq = np.zeros((n_assets, n_assets))
+        self.counts = np.zeros(n_assets, dtype=np.int64)
+        self.count = 0
+
+    def _accumulate(self, r, sign):
+        valid = ~np.isnan(r)
+        r = np.where(valid, r, 0.0)
+        mask = valid.astype(np.float64)
+        self.pair_count += sign * np.outer(mask, mask)
+        self.sum += sign * np.outer(r, mask)
+        self.sum_sq += sign * np.outer(r, r)
+
+    def update(self, returns):
+        """加入一根K线的收益率向量（窗口已满时移出最旧的一根）"""
+        r = np.asarray(returns, dtype=np.float64)
+        slot = self.count % self.window
+        if self.count >= self.window:
+            self._accumulate(self.buffer[slot], -1)
+        self.buffer[slot] = r
+        self._accumulate(r, 1)
+        self.counts += ~np.isnan(r)
+        self.count += 1
+
+    def covariance(self):
+        """当前窗口的样本协方差矩阵，窗口内有效K线不足2根的资产所在行列为0"""
+        n = np.round(np.diag(self.pair_count))
+        enough = n >= 2
+        mean = np.where(enough, np.diag(self.sum) / np.maximum(n, 1), 0.0)
+        # 均值填充后的离差积之和：Σ (r_i - m_i)(r_j - m_j)，只在两者都有效的K线上非零
+        centered = (self.sum_sq - self.sum * mean[None, :] - self.sum.T * mean[:, None]
+                    + np.round(self.pair_count) * np.outer(mean, mean))
+        scale = np.where(enough, 1 / np.sqrt(np.maximum(n - 1, 1)), 0.0)
+        return centered * np.outer(scale, scale)
+
+
+def shrink_covariance(cov, shrinkage):
+    """向对角阵收缩：(1 - shrinkage) * cov + shrinkage * diag(cov)"""
+    if not shrinkage:
+        return cov
+    target = np.diag(np.diag(cov))
+    return (1 - shrinkage) * cov + shrinkage * target
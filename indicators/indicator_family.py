@@ -0,0 +1,196 @@
+import numpy as np
+from indicators.panel_indicators import PanelIndicators
+
+
+class IndicatorFamily:
+    """多参数指标族一次计算
+
+    参数寻优时同一基础指标需要按许多周期重复计算。这里对单只股票的序列
+    一次性算出整组参数的结果，返回形如 (T, P) 的二维数组，第 j 列对应
+    第 j 个参数。SMA 族共用一次前缀和，滚动最值族共用一张稀疏表，
+    EMA 族与 MACD 族沿时间轴只递推一遍。
+    """
+
+    @staticmethod
+    def _as_series(values):
+        return np.asarray(values, dtype=float).reshape(-1)
+
+    @staticmethod
+    def _prefix_sums(x):
+        """返回 (值前缀和, 有效值计数前缀和)，首元素为0"""
+        valid = ~np.isnan(x)
+        csum = np.concatenate(([0.0], np.cumsum(np.where(valid, x, 0.0))))
+        ccnt = np.concatenate(([0], np.cumsum(valid)))
+        return csum, ccnt
+
+    @staticmethod
+    def _window_sums(csum, ccnt, periods, length):
+        """由前缀和求各周期的滑动窗口和，窗口不完整或含 NaN 时为 NaN"""
+        out = np.full((length, len(periods)), np.nan)
+        for j, period in enumerate(periods):
+            if period > length:
+                continue
+            window_sum = csum[period:] - csum[:-period]
+            window_cnt = ccnt[period:] - ccnt[:-period]
+            out[period - 1:, j] = np.where(window_cnt == period, window_sum, np.nan)
+        return out
+
+    @staticmethod
+    def sma_family(values, periods):
+        """
+        一组周期的简单移动平均
+
+        Args:
+            values: 价格序列
+            periods (list): 周期列表
+
+        Returns:
+            np.ndarray: 形如 (T, len(periods)) 的数组
+        """
+        x = IndicatorFamily._as_series(values)
+        periods = list(periods)
+        csum, ccnt = IndicatorFamily._prefix_sums(x)
+        sums = IndicatorFamily._window_sums(csum, ccnt, periods, len(x))
+        return sums / np.asarray(periods, dtype=float)
+
+    @staticmethod
+    def std_family(values, periods):
+        """一组周期的滑动总体标准差（与 talib.STDDEV 一致）"""
+        x = IndicatorFamily._as_series(values)
+        periods = list(periods)
+        center = np.nanmean(x) if np.any(~np.isnan(x)) else 0.0
+        xc = x - center
+        p = np.asarray(periods, dtype=float)
+
+        csum, ccnt = IndicatorFamily._prefix_sums(xc)
+        mean = IndicatorFamily._window_sums(csum, ccnt, periods, len(x)) / p
+        csum_sq, _ = IndicatorFamily._prefix_sums(xc * xc)
+        mean_sq = IndicatorFamily._window_sums(csum_sq, ccnt, periods, len(x)) / p
+        return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+    @staticmethod
+    def ema_family(values, periods):
+        """一组周期的指数移动平均，各列以各自周期的SMA为种子（与 talib.EMA 一致）"""
+        x = IndicatorFamily._as_series(values)
+        periods = list(periods)
+        seed = IndicatorFamily.sma_family(x, periods)
+        alpha = 2.0 / (np.asarray(periods, dtype=float) + 1)
+        panel = np.broadcast_to(x[:, None], (len(x), len(periods)))
+        return PanelIndicators._smooth(panel, seed, alpha)
+
+    @staticmethod
+    def bollinger_family(values, period, multipliers):
+        """
+        同一周期、多组标准差倍数的布林带
+
+        Args:
+            values: 价格序列
+            period (int): 均线周期
+            multipliers (list): 标准差倍数列表
+
+        Returns:
+            tuple: (中轨 (T,), 上轨 (T, M), 下轨 (T, M))
+        """
+        x = IndicatorFamily._as_series(values)
+        middle = IndicatorFamily.sma_family(x, [period])[:, 0]
+        std = IndicatorFamily.std_family(x, [period])[:, 0]
+        k = np.asarray(list(multipliers), dtype=float)
+        upper = middle[:, None] + std[:, None] * k
+        lower = middle[:, None] - std[:, None] * k
+        return middle, upper, lower
+
+    @staticmethod
+    def _sparse_table(x, max_period, reducer):
+        """构建稀疏表：第k层第i个元素为 x[i : i + 2**k] 的最值"""
+        table = [x]
+        width = 1
+        while width * 2 <= max_period:
+            prev = table[-1]
+            table.append(reducer(prev[:len(prev) - width], prev[width:]))
+            width *= 2
+        return table
+
+    @staticmethod
+    def _rolling_extreme_family(values, periods, reducer):
+        x = IndicatorFamily._as_series(values)
+        periods = list(periods)
+        out = np.full((len(x), len(periods)), np.nan)
+        if not periods or len(x) == 0:
+            return out
+        table = IndicatorFamily._sparse_table(x, max(periods), reducer)
+        for j, period in enumerate(periods):
+            if period > len(x):
+                continue
+            # 窗口 [i-period+1, i] 由两个长度为2**k的区间覆盖
+            k = int(np.floor(np.log2(period)))
+            width = 1 << k
+            level = table[k]
+            n = len(x) - period + 1
+            out[period - 1:, j] = reducer(level[:n], level[period - width:period - width + n])
+        return out
+
+    @staticmethod
+    def rolling_max_family(values, periods):
+        """一组周期的滑动最大值，共用一张稀疏表"""
+        return IndicatorFamily._rolling_extreme_family(values, periods, np.maximum)
+
+    @staticmethod
+    def rolling_min_family(values, periods):
+        """一组周期的滑动最小值，共用一张稀疏表"""
+        return IndicatorFamily._rolling_extreme_family(values, periods, np.minimum)
+
+    @staticmethod
+    def macd_family(values, fast_periods, slow_periods, signal_periods):
+        """
+        多组参数的MACD（与 talib.MACD 的种子和预热期一致）
+
+        快线EMA与慢线EMA对齐在 slow-1 处起算，信号线以MACD前signal个值的
+        均值为种子。fast >= slow 的组合会被跳过。
+
+        Args:
+            values: 收盘价序列
+            fast_periods (list): 快线周期列表
+            slow_periods (list): 慢线周期列表
+            signal_periods (list): 信号线周期列表
+
+        Returns:
+            tuple: (参数组合列表[(fast, slow, signal)], macd (T, K), signal (T, K), hist (T, K))
+        """
+        x = IndicatorFamily._as_series(values)
+        length = len(x)
+        combos = [(f, s, g) for f in fast_periods for s in slow_periods for g in signal_periods if f < s]
+        if not combos:
+            empty = np.empty((length, 0))
+            return combos, empty, empty, empty
+
+        pairs = sorted({(f, s) for f, s, _ in combos})
+        pair_index = {pair: j for j, pair in enumerate(pairs)}
+        fasts = sorted({f for f, _ in pairs})
+        slows = sorted({s for _, s in pairs})
+
+        fast_sma = IndicatorFamily.sma_family(x, fasts)
+        slow_ema = IndicatorFamily.ema_family(x, slows)
+
+        # 快线在 slow-1 处以最近fast个值的均值为种子
+        seed = np.full((length, len(pairs)), np.nan)
+        for j, (f, s) in enumerate(pairs):
+            if s - 1 < length:
+                seed[s - 1, j] = fast_sma[s - 1, fasts.index(f)]
+        alpha = 2.0 / (np.asarray([f for f, _ in pairs], dtype=float) + 1)
+        panel = np.broadcast_to(x[:, None], (length, len(pairs)))
+        fast_ema = PanelIndicators._smooth(panel, seed, alpha)
+        pair_macd = fast_ema - slow_ema[:, [slows.index(s) for _, s in pairs]]
+
+        macd = pair_macd[:, [pair_index[(f, s)] for f, s, _ in combos]]
+        signal_seed = np.full(macd.shape, np.nan)
+        for g in sorted({g for _, _, g in combos}):
+            cols = [k for k, combo in enumerate(combos) if combo[2] == g]
+            signal_seed[:, cols] = PanelIndicators._rolling_sum(macd[:, cols], g) / g
+        signal_alpha = 2.0 / (np.asarray([g for _, _, g in combos], dtype=float) + 1)
+        signal = PanelIndicators._smooth(macd, signal_seed, signal_alpha)
+
+        # 与talib一致：三条线均从 slow + signal - 2 处开始输出
+        for k, (_, s, g) in enumerate(combos):
+            macd[:min(s + g - 2, length), k] = np.nan
+        hist = macd - signal
+        return combos, macd, signal, hist
@@ -0,0 +1,22 @@
+"""
+指标预热长度计算
+
+预热长度指指标输出前端为 NaN 的K线数量。链式计算的指标（如对动量再取均线）
+将各步的预热长度相加即可。
+"""
+import talib.abstract
+
+
+def talib_lookback(name, **params):
+    """talib指标的预热长度，如 talib_lookback('ADX', timeperiod=14) == 27"""
+    return talib.abstract.Function(name, **params).lookback
+
+
+def rolling_lookback(window):
+    """pandas rolling(window) 聚合的预热长度"""
+    return window - 1
+
+
+def change_lookback(periods=1):
+    """pct_change(periods) / diff(periods) 的预热长度"""
+    return periods
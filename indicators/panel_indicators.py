@@ -0,0 +1,153 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class PanelIndicators:
+    """面板（日期 × 股票）批量指标计算
+
+    输入为形如 (T, N) 的二维数组（也接受一维序列），沿时间轴向量化计算，
+    一次处理全部股票。输出与输入同形，预热期及缺失行情处为 NaN，
+    计算口径与 talib 的同名指标保持一致。
+
+    输入为 float32 时输出也为 float32，中间累加仍以 float64 进行。
+    """
+
+    @staticmethod
+    def _as_panel(values):
+        """转换为二维float64数组，返回 (数组, 还原信息)"""
+        arr = np.asarray(values)
+        out_dtype = np.float32 if arr.dtype == np.float32 else np.float64
+        arr = arr.astype(np.float64, copy=False)
+        if arr.ndim == 1:
+            return arr[:, None], (True, out_dtype)
+        return arr, (False, out_dtype)
+
+    @staticmethod
+    def _restore(arr, layout):
+        squeeze, out_dtype = layout
+        arr = arr.astype(out_dtype, copy=False)
+        return arr[:, 0] if squeeze else arr
+
+    @staticmethod
+    def _rolling_sum(x, period):
+        """滑动窗口求和，窗口内含 NaN 时结果为 NaN"""
+        valid = ~np.isnan(x)
+        csum = np.zeros((x.shape[0] + 1, x.shape[1]))
+        np.cumsum(np.where(valid, x, 0.0), axis=0, out=csum[1:])
+        ccnt = np.zeros((x.shape[0] + 1, x.shape[1]), dtype=np.int64)
+        np.cumsum(valid, axis=0, out=ccnt[1:])
+
+        out = np.full(x.shape, np.nan)
+        if period <= x.shape[0]:
+            window_sum = csum[period:] - csum[:-period]
+            window_cnt = ccnt[period:] - ccnt[:-period]
+            out[period - 1:] = np.where(window_cnt == period, window_sum, np.nan)
+        return out
+
+    @staticmethod
+    def _smooth(x, seed, alpha):
+        """递推平滑：以seed首个有效值为起点，prev += alpha * (x - prev)
+
+        沿时间轴逐行推进，每一步对全部股票做一次向量运算；
+        输入出现 NaN 时该股票的状态重置，待seed重新有效后再起算。
+        """
+        out = np.empty(x.shape)
+        prev = np.full(x.shape[1], np.nan)
+        step = np.empty(x.shape[1])
+        idle = np.empty(x.shape[1], dtype=bool)
+        for t in range(x.shape[0]):
+            np.subtract(x[t], prev, out=step)
+            step *= alpha
+            prev += step
+            np.isnan(prev, out=idle)
+            np.copyto(prev, seed[t], where=idle)
+            out[t] = prev
+        return out
+
+    @staticmethod
+    def sma(values, period):
+        """简单移动平均，对应 talib.SMA"""
+        x, layout = PanelIndicators._as_panel(values)
+        out = PanelIndicators._rolling_sum(x, period) / period
+        return PanelIndicators._restore(out, layout)
+
+    @staticmethod
+    def ema(values, period):
+        """指数移动平均，以前period个值的SMA为种子，对应 talib.EMA"""
+        x, layout = PanelIndicators._as_panel(values)
+        seed = PanelIndicators._rolling_sum(x, period) / period
+        out = PanelIndicators._smooth(x, seed, 2.0 / (period + 1))
+        return PanelIndicators._restore(out, layout)
+
+    @staticmethod
+    def rolling_std(values, period):
+        """滑动总体标准差，对应 talib.STDDEV(nbdev=1)"""
+        x, layout = PanelIndicators._as_panel(values)
+        # 先按列去均值，降低平方和相减带来的精度损失
+        with np.errstate(invalid='ignore'):
+            center = np.nanmean(x, axis=0) if x.size else np.zeros(x.shape[1])
+        center = np.where(np.isnan(center), 0.0, center)
+        xc = x - center
+        mean = PanelIndicators._rolling_sum(xc, period) / period
+        mean_sq = PanelIndicators._rolling_sum(xc * xc, period) / period
+        out = np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+        return PanelIndicators._restore(out, layout)
+
+    @staticmethod
+    def rsi(values, period=14):
+        """相对强弱指标（Wilder平滑），对应 talib.RSI"""
+        x, layout = PanelIndicators._as_panel(values)
+        diff = np.full(x.shape, np.nan)
+        diff[1:] = x[1:] - x[:-1]
+        gain = np.where(diff > 0, diff, np.where(np.isnan(diff), np.nan, 0.0))
+        loss = np.where(diff < 0, -diff, np.where(np.isnan(diff), np.nan, 0.0))
+
+        alpha = 1.0 / period
+        avg_gain = PanelIndicators._smooth(gain, PanelIndicators._rolling_sum(gain, period) / period, alpha)
+        avg_loss = PanelIndicators._smooth(loss, PanelIndicators._rolling_sum(loss, period) / period, alpha)
+
+        total = avg_gain + avg_loss
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = np.where(total > 0, 100.0 * avg_gain / total, np.where(np.isnan(total), np.nan, 0.0))
+        return PanelIndicators._restore(out, layout)
+
+    @staticmethod
+    def true_range(high, low, close):
+        """真实波幅，首行无前收盘价为 NaN"""
+        h, layout = PanelIndicators._as_panel(high)
+        l, _ = PanelIndicators._as_panel(low)
+        c, _ = PanelIndicators._as_panel(close)
+        tr = np.full(h.shape, np.nan)
+        prev_close = c[:-1]
+        tr[1:] = np.maximum.reduce([
+            h[1:] - l[1:],
+            np.abs(h[1:] - prev_close),
+            np.abs(l[1:] - prev_close),
+        ])
+        return PanelIndicators._restore(tr, layout)
+
+    @staticmethod
+    def atr(high, low, close, period=14):
+        """平均真实波幅（Wilder平滑），对应 talib.ATR"""
+        tr, layout = PanelIndicators._as_panel(PanelIndicators.true_range(high, low, close))
+        seed = PanelIndicators._rolling_sum(tr, period) / period
+        out = PanelIndicators._smooth(tr, seed, 1.0 / period)
+        return PanelIndicators._restore(out, layout)
+
+    @staticmethod
+    def rolling_max(values, period):
+        """滑动窗口最大值，窗口内含 NaN 时为 NaN"""
+        x, layout = PanelIndicators._as_panel(values)
+        out = np.full(x.shape, np.nan)
+        if period <= x.shape[0]:
+            out[period - 1:] = sliding_window_view(x, period, axis=0).max(axis=-1)
+        return PanelIndicators._restore(out, layout)
+
+    @staticmethod
+    def rolling_min(values, period):
+        """滑动窗口最小值，窗口内含 NaN 时为 NaN"""
+        x, layout = PanelIndicators._as_panel(values)
+        out = np.full(x.shape, np.nan)
+        if period <= x.shape[0]:
+            out[period - 1:] = sliding_window_view(x, period, axis=0).min(axis=-1)
+        return PanelIndicators._restore(out, layout)
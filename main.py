@@ -1,59 +1,115 @@
 import argparse
+import os
+import numpy as np
+import pandas as pd
 from data.data_provider import DataProvider
 from utils.utils import ExcelExporter
-from strategies.macd_strategy import MACDStrategy
-from strategies.enhanced_hybrid_strategy import EnhancedHybridStrategy
-from strategies.kdj_strategy import KDJStrategy
-from strategies.bollinger_strategy import BollingerStrategy
-from strategies.dual_ma_volume_strategy import DualMAVolumeStrategy
-from strategies.mean_reversion_strategy import MeanReversionStrategy
-from strategies.trend_following_strategy import TrendFollowingStrategy
-from strategies.volume_based_strategy import VolumeBasedStrategy
-from strategies.statistical_arbitrage_strategy import StatisticalArbitrageStrategy
-from strategies.event_driven_strategy import EventDrivenStrategy
-from strategies.quality_rotation_strategy import QualityRotationStrategy
-from strategies.risk_parity_strategy import RiskParityStrategy
-from strategies.dca_strategy import DCAStrategy
-from strategies.swing_strategy import SwingStrategy
-from strategies.breakout_strategy import BreakoutStrategy
+from utils.feature_cache import FeatureCache
+from utils.result_cache import ResultCache
+from analysis.robustness import RobustnessAnalyzer
+from analysis.sensitivity import SensitivitySurface
+from backtest.scenarios import ScenarioBacktester
+from optimization.param_sweep import ParameterSweep
+from optimization.walk_forward import WalkForwardAnalysis
+from optimization.successive_halving import SuccessiveHalving
+from optimization.rule_search import GeneticRuleSearch
+from optimization.pareto import ParetoOptimizer
+from utils.precision import cast_frame, compare_precision, print_precision_report
+from strategies.base_strategy import BaseStrategy, SIGNAL_CODES
+from strategies import registry
 
 
-def run_strategy(strategy, start_date, end_date, stock_code, data=None):
-    """运行单个策略"""
-    if data is None:
-        data = DataProvider.get_stock_data(stock_code, start_date, end_date)
-        if data is None:
-            return
+def run_bars(strategy, df, first_bar, end_bar=None, dtype=np.float64):
+    """在已计算好指标的数据上逐K线回测 [first_bar, end_bar) 区间
+
+    区间最后一根K线仍有持仓时强制平仓。指标只依赖历史数据，
+    因此同一份全历史指标可供多个回测区间（如滚动窗口）重复使用。
+    """
+    if end_bar is None:
+        end_bar = len(df)
     
-    # 确保数值列为float类型
-    for col in ['open', 'high', 'low', 'close', 'volume', 'amount']:
-        if col in data.columns:
-            data[col] = data[col].astype(float)
+    # 逐日权益与信号记录
+    strategy.equity_curve = np.full(len(df), strategy.capital, dtype=dtype)
+    strategy.signal_history = np.zeros(len(df), dtype=np.int8)
     
-    df = strategy.calculate_signals(data.copy())
+    dates = df['date'].to_numpy()
+    strategy.trades.set_calendar(dates)
+    closes = df['close'].to_numpy(dtype=float)
+    volumes = df['volume'].to_numpy(dtype=float)
+    
+    strategy.prepare_run(df, first_bar)
+    
+    # 支持向量化的策略：空仓时信号只取决于当前行和前一行，预先整列算好
+    raw_labels = strategy.raw_signal_labels(df)
     
-    for i in range(1, len(df)):
-        date = df['date'].iloc[i]
-        price = float(df['close'].iloc[i])
-        volume = float(df['volume'].iloc[i])
+    for i in range(first_bar, end_bar):
+        date = dates[i]
+        price = float(closes[i])
+        volume = float(volumes[i])
         
         # 判断是否是最后一个交易日
-        is_last_day = (i == len(df) - 1)
+        is_last_day = (i == end_bar - 1)
         
-        # 设置当前行数据（用于增强混合策略）
-        if hasattr(strategy, 'set_current_row'):
-            strategy.set_current_row(df.iloc[i])
-        
-        # 修改为传递当前行和前一行的数据
-        signal = strategy.generate_signal(df.iloc[i], df.iloc[i-1])
+        row = None
+        if raw_labels is not None and strategy.position == 0:
+            signal = raw_labels[i]
+        else:
+            row = df.iloc[i]
+            # 设置当前行数据（供下单时按当前K线的指标计算仓位）
+            strategy.set_current_row(row)
+            
+            # 修改为传递当前行和前一行的数据
+            signal = strategy.generate_signal(row, df.iloc[i - 1])
         
         # 如果是最后一个交易日且还有持仓，强制平仓
         if is_last_day and strategy.position > 0:
             signal = 'SELL'
-            print(f"\n{strategy.name} 回测结束，强制平仓")
+            if strategy.verbose:
+                print(f"\n{strategy.name} 回测结束，强制平仓")
         
+        strategy.signal_history[i] = SIGNAL_CODES.get(signal, 0)
         if signal != 'HOLD':
+            if row is None:
+                strategy.set_current_row(df.iloc[i])
             strategy.execute_trade(date, price, signal, volume)
+        strategy.equity_curve[i] = strategy.capital + strategy.position * price
+
+
+def run_strategy(strategy, start_date, end_date, stock_code, data=None, dtype=np.float64):
+    """运行单个策略
+
+    信号从第一个满足策略预热长度（warmup_period）且不早于start_date的交易日开始评估，
+    之前的K线只用于指标预热。
+    dtype为np.float32时行情、指标列和权益曲线以单精度保存，
+    资金、手续费等账务计算仍使用双精度。
+    """
+    if data is None:
+        data = DataProvider.get_stock_data(stock_code, start_date, end_date,
+                                           warmup_bars=strategy.warmup_period)
+        if data is None:
+            return
+    
+    # 确保数值列为浮点类型
+    for col in ['open', 'high', 'low', 'close', 'volume', 'amount']:
+        if col in data.columns:
+            data[col] = data[col].astype(dtype)
+    
+    # 相同输入、参数与代码的回测结果直接从缓存恢复
+    result_key = None
+    if strategy.result_cache is not None:
+        result_key = strategy.result_cache.make_result_key(data, strategy, start_date, dtype,
+                                                           (run_strategy, run_bars))
+        if strategy.result_cache.restore(result_key, strategy):
+            return
+    
+    df = strategy.calculate_signals(data.copy())
+    if dtype != np.float64:
+        df = cast_frame(df, dtype)
+    
+    # 评估起点：预热完成且已到回测开始日期
+    first_bar = strategy.evaluation_start(df['date'], start_date)
+    
+    run_bars(strategy, df, first_bar, dtype=dtype)
     
     # 确保回撤计算正确 - 在回测结束后验证回撤日期顺序
     if hasattr(strategy, 'drawdown_start') and hasattr(strategy, 'drawdown_end'):
@@ -69,16 +125,84 @@ def run_strategy(strategy, start_date, end_date, stock_code, data=None):
             except:
                 # 如果日期解析失败，保持原状
                 pass
+    
+    if result_key is not None:
+        strategy.result_cache.store_result(result_key, strategy)
+
 
 def main():
     parser = argparse.ArgumentParser(description='股票策略回测系统')
     parser.add_argument('stock_code', type=str, help='股票代码（例：sh.600000）')
     parser.add_argument('start_date', type=str, help='开始日期（YYYY-MM-DD）')
     parser.add_argument('end_date', type=str, help='结束日期（YYYY-MM-DD）')
+    parser.add_argument('--strategies', type=str, default=None,
+                        help='只运行指定的策略，逗号分隔（如 macd,kdj），默认全部')
+    parser.add_argument('--exclude', type=str, default=None, help='排除指定的策略，逗号分隔')
     parser.add_argument('--capital', type=float, default=1000000, help='初始资金（默认100万）')
     parser.add_argument('--commission', type=float, default=0.0003, help='手续费率（默认0.03%）')
+    parser.add_argument('--cache-dir', type=str, default=None, help='指标缓存目录（不指定则不缓存）')
+    parser.add_argument('--cache-size', type=int, default=512, help='指标缓存容量上限，单位MB（默认512）')
+    parser.add_argument('--float32', action='store_true', help='以单精度保存行情、指标和权益（资金账务仍为双精度）')
+    parser.add_argument('--precision-check', action='store_true', help='比较单精度与双精度回测结果并输出偏差报告')
+    parser.add_argument('--robustness', type=int, default=0,
+                        help='稳健性分析的重采样次数（如10000），0为不分析')
+    parser.add_argument('--robustness-method', choices=['block', 'shuffle', 'bootstrap'], default='block',
+                        help='重采样方法：block逐日收益分块自助法，shuffle打乱交易顺序，bootstrap交易有放回抽样')
+    parser.add_argument('--sweep', type=str, default=None,
+                        help='对指定策略（名称或类名，如 macd）按config中的搜索空间做参数寻优')
+    parser.add_argument('--jobs', type=int, default=None, help='参数寻优的进程数（默认CPU核数）')
+    parser.add_argument('--search', choices=['grid', 'halving', 'genetic'], default='grid',
+                        help='配合--sweep：grid为网格搜索，halving为随机抽样+逐轮减半，'
+                             'genetic为投票规则的遗传搜索（仅enhanced_hybrid），默认grid')
+    parser.add_argument('--candidates', type=int, default=81, help='逐轮减半的候选参数组合数（默认81）')
+    parser.add_argument('--seed', type=int, default=None, help='逐轮减半与遗传搜索的随机种子，指定后结果可复现')
+    parser.add_argument('--population', type=int, default=2000, help='遗传搜索每代的候选规则数（默认2000）')
+    parser.add_argument('--generations', type=int, default=20, help='遗传搜索的代数（默认20）')
+    parser.add_argument('--surface', type=str, default=None,
+                        help='配合--sweep：两个参数名，逗号分隔（如 period,std_dev），输出双参数敏感性曲面')
+    parser.add_argument('--surface-file', type=str, default=None,
+                        help='敏感性曲面的导出文件，.xlsx为热力图工作表，.npz为数组文件')
+    parser.add_argument('--pareto', action='store_true',
+                        help='配合--sweep：输出收益率、最大回撤、换手率、交易次数的帕累托前沿')
+    parser.add_argument('--pareto-store', type=str, default=None,
+                        help='帕累托寻优的候选文件（.npz），已回测的参数组合不再重复回测')
+    parser.add_argument('--max-drawdown', type=float, default=None,
+                        help='帕累托前沿的最大回撤上限（%%），超出的候选不参与筛选')
+    parser.add_argument('--scenario-commissions', type=str, default=None,
+                        help='情景分析的手续费率，逗号分隔（如 0.0001,0.0003,0.001）')
+    parser.add_argument('--scenario-slippages', type=str, default=None,
+                        help='情景分析的滑点比例，逗号分隔（如 0,0.001）')
+    parser.add_argument('--scenario-capitals', type=str, default=None,
+                        help='情景分析的初始资金，逗号分隔（如 100000,1000000）')
+    parser.add_argument('--walk-forward', action='store_true',
+                        help='配合--sweep：按滚动的样本内/样本外窗口寻优并检验')
+    parser.add_argument('--train-bars', type=int, default=250, help='滚动窗口的样本内长度（K线数，默认250）')
+    parser.add_argument('--test-bars', type=int, default=60, help='滚动窗口的样本外长度（K线数，默认60）')
     
     args = parser.parse_args()
+    
+    def split_names(value):
+        return [name.strip() for name in value.split(',') if name.strip()] if value else None
+    
+    def split_values(value):
+        return [float(name) for name in split_names(value)] if value else None
+    
+    try:
+        selected = registry.select(split_names(args.strategies), split_names(args.exclude))
+        if args.sweep:
+            selected = [registry.resolve(args.sweep)]
+    except ValueError as e:
+        print(str(e))
+        return
+    if not selected:
+        print("没有选中任何策略")
+        return
+
+    # 启用指标与回测结果磁盘缓存
+    if args.cache_dir:
+        BaseStrategy.feature_cache = FeatureCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        BaseStrategy.result_cache = ResultCache(os.path.join(args.cache_dir, 'results'),
+                                                args.cache_size * 1024 * 1024)
 
     # 获取股票名称
     stock_name = DataProvider.get_stock_name(args.stock_code)
@@ -92,33 +216,93 @@ def main():
     print("日期          |  策略名称  |  操作  |     价格    |    数量    |     金额      |     资金")
     print("-"*80)
     
-    # 获取数据
-    data = DataProvider.get_stock_data(args.stock_code, args.start_date, args.end_date)
+    # 初始化选中的策略（只导入用到的策略模块）
+    strategies = [registry.load(name)(initial_capital=args.capital, commission_rate=args.commission)
+                  for name in selected]
+    
+    # 获取数据（向前多取各策略所需的最长预热K线）
+    warmup_bars = max(strategy.warmup_period for strategy in strategies)
+    data = DataProvider.get_stock_data(args.stock_code, args.start_date, args.end_date,
+                                       warmup_bars=warmup_bars)
     if data is None:
         return
     
-    # 初始化策略列表
-    strategies = [
-        EnhancedHybridStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        MACDStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        KDJStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        BollingerStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        DualMAVolumeStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        MeanReversionStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        TrendFollowingStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        VolumeBasedStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        StatisticalArbitrageStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        EventDrivenStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        QualityRotationStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        RiskParityStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        DCAStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        SwingStrategy(initial_capital=args.capital, commission_rate=args.commission),
-        BreakoutStrategy(initial_capital=args.capital, commission_rate=args.commission)
-    ]
+    # 单精度校验模式：只输出偏差报告
+    if args.precision_check:
+        for strategy in strategies:
+            report = compare_precision(type(strategy), data, args.capital, args.commission, runner=run_strategy)
+            print_precision_report(report)
+        return
+    
+    # 参数寻优模式：只输出各参数组合的绩效排名
+    if args.sweep:
+        strategy_cls = registry.load(selected[0])
+        name = strategies[0].name
+        if args.surface:
+            axes = [name.strip() for name in args.surface.split(',')]
+            if len(axes) != 2:
+                print("--surface 需要两个参数名，如 period,std_dev")
+                return
+            surface = SensitivitySurface(strategy_cls, data, args.capital, args.commission,
+                                         start_date=args.start_date, runner=run_strategy, cache_dir=args.cache_dir)
+            try:
+                result = surface.run(*axes, n_jobs=args.jobs)
+            except ValueError as e:
+                print(str(e))
+                return
+            grid = pd.DataFrame(result['profit_rate'], index=pd.Index(result['x'], name=axes[0]), columns=result['y'])
+            print(f"\n{name} 敏感性曲面（收益率%，行为{axes[0]}，列为{axes[1]}）")
+            print(grid.round(2).to_string())
+            filename = args.surface_file or f"敏感性曲面_{args.stock_code.split('.')[-1]}_{strategy_cls.__name__}.xlsx"
+            SensitivitySurface.export(result, filename)
+            return
+        if args.pareto:
+            optimizer = ParetoOptimizer(strategy_cls, data, args.capital, args.commission,
+                                        start_date=args.start_date, runner=run_strategy,
+                                        cache_dir=args.cache_dir, store=args.pareto_store)
+            limits = {'max_drawdown': (None, args.max_drawdown)} if args.max_drawdown is not None else None
+            result = optimizer.run(limits=limits, n_jobs=args.jobs)
+            print(f"\n{name} 帕累托前沿（共{len(result['candidates'])}组候选，前沿{len(result['front'])}组）")
+            print(result['front'].to_string(index=False))
+            return
+        if args.walk_forward:
+            analysis = WalkForwardAnalysis(strategy_cls, data, args.capital, args.commission,
+                                           bar_runner=run_bars, cache_dir=args.cache_dir)
+            result = analysis.run(args.train_bars, args.test_bars, n_jobs=args.jobs)
+            equity = result['equity']
+            print(f"\n{name} 滚动窗口分析（样本内{args.train_bars}根、样本外{args.test_bars}根K线）")
+            print(result['windows'].to_string(index=False))
+            print(f"样本外拼接收益率: {(equity.iloc[-1] / args.capital - 1):.2%}")
+            return
+        if args.search == 'genetic':
+            if not hasattr(strategy_cls, 'condition_mask'):
+                print(f"{name} 不支持投票规则的遗传搜索")
+                return
+            search = GeneticRuleSearch(strategy_cls, data, args.commission)
+            result = search.run(args.population, args.generations, seed=args.seed, n_jobs=args.jobs)
+            print(f"\n{name} 遗传规则搜索（每代{args.population}个候选，{args.generations}代，"
+                  f"共评估{result['evaluations']}个规则）")
+            print(result['history'].to_string(index=False))
+            print(f"最优规则: {result['best']}  全仓复利收益率: {result['best_score']:.2f}%")
+            return
+        if args.search == 'halving':
+            search = SuccessiveHalving(strategy_cls, data, args.capital, args.commission,
+                                       bar_runner=run_bars, cache_dir=args.cache_dir, start_date=args.start_date)
+            result = search.run(args.candidates, seed=args.seed, n_jobs=args.jobs)
+            print(f"\n{name} 逐轮减半寻优（{args.candidates}个候选，共评估{result['evaluations']}次）")
+            print(f"最优参数: {result['best']}  收益率: {result['best_score']:.2f}%")
+            return
+        sweep = ParameterSweep(strategy_cls, data, args.capital, args.commission,
+                               start_date=args.start_date, runner=run_strategy, cache_dir=args.cache_dir)
+        results = sweep.run(n_jobs=args.jobs)
+        print(f"\n{name} 参数寻优结果（共{len(results)}组，按收益率排序）")
+        print(results.head(20).to_string(index=False))
+        return
     
     # 运行所有策略
+    dtype = np.float32 if args.float32 else np.float64
     for strategy in strategies:
-        run_strategy(strategy, args.start_date, args.end_date, args.stock_code, data)
+        run_strategy(strategy, args.start_date, args.end_date, args.stock_code, data, dtype=dtype)
     
     # 打印表现并导出
     print("\n" + "="*80)
@@ -127,6 +311,22 @@ def main():
     
     for strategy in strategies:
         strategy.print_performance()
+        if args.robustness > 0:
+            report = RobustnessAnalyzer.analyze(strategy, args.robustness, args.robustness_method,
+                                                start_date=args.start_date)
+            RobustnessAnalyzer.print_report(strategy.name, report)
+    
+    if args.scenario_commissions or args.scenario_slippages or args.scenario_capitals:
+        columns = ['commission_rate', 'slippage', 'initial_capital', 'final_capital', 'profit_rate',
+                   'max_drawdown', 'total_trades', 'win_rate', 'commission']
+        for strategy in strategies:
+            if not strategy.trades.dates:
+                continue
+            result = ScenarioBacktester.run(strategy, data, split_values(args.scenario_commissions),
+                                            split_values(args.scenario_slippages) or [0.0],
+                                            split_values(args.scenario_capitals))
+            print(f"\n{strategy.name} 情景分析（沿用基准回测的成交时点，共{len(result['summary'])}个情景）")
+            print(result['summary'][columns].to_string(index=False, float_format=lambda x: f"{x:,.4f}"))
 
     ExcelExporter.export_results(strategies, args.stock_code, stock_name, 
                                args.start_date, args.end_date, data)
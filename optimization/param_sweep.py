@@ -0,0 +1,140 @@
+import contextlib
+import io
+import itertools
+import os
+import tempfile
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from strategies.base_strategy import BaseStrategy
+from utils.feature_cache import FeatureCache
+
+# 子进程内共享的回测状态：行情数据与回测函数在进程启动时传入一次，各参数组合复用
+_worker_state = {}
+
+
+def _init_worker(data, runner, cache_dir, cache_bytes):
+    """进程池初始化：保存行情数据并启用共享的指标磁盘缓存"""
+    _worker_state['data'] = data
+    _worker_state['runner'] = runner
+    if cache_dir:
+        BaseStrategy.feature_cache = FeatureCache(cache_dir, cache_bytes)
+
+
+def _run_point(strategy_cls, params, initial_capital, commission_rate, start_date):
+    """回测单个参数组合，返回参数与绩效指标"""
+    strategy = strategy_cls(initial_capital, commission_rate, **params)
+    strategy.verbose = False
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_state['runner'](strategy, start_date, None, None, _worker_state['data'].copy())
+    performance = strategy.calculate_performance()
+    return {
+        **params,
+        'total_trades': performance['total_trades'],
+        'win_rate': performance['win_rate'],
+        'profit_rate': performance['profit_rate'],
+        'max_drawdown': performance['max_drawdown'],
+        # 换手率：累计成交金额（买入与卖出）相对初始资金的倍数
+        'turnover': float(strategy.trades.columns['amount'].sum()) / initial_capital,
+        'final_capital': strategy.capital,
+    }
+
+
+class ParameterSweep:
+    """参数网格寻优
+
+    参数组合由策略的搜索空间（config/config.py中的 *_SEARCH_SPACE）展开，
+    每个组合以关键字参数覆盖策略默认配置后完整回测一次。
+    多进程运行时行情数据在进程启动时只传递一次；各组合通过同一个指标磁盘缓存
+    共享相同参数的指标（如只改变止损比例时均线、MACD等无需重算）。
+    """
+
+    def __init__(self, strategy_cls, data, initial_capital=1000000, commission_rate=0.0003,
+                 start_date=None, runner=None, cache_dir=None, cache_size=512 * 1024 * 1024):
+        """
+        Args:
+            strategy_cls: 策略类
+            data (pd.DataFrame): 行情数据（含预热K线）
+            initial_capital (float): 初始资金
+            commission_rate (float): 手续费率
+            start_date (str): 信号评估的开始日期，之前的K线只用于预热
+            runner: 回测函数，默认使用 main.run_strategy
+            cache_dir (str): 指标缓存目录，默认沿用已启用的缓存，否则使用临时目录
+            cache_size (int): 指标缓存容量上限（字节）
+        """
+        if runner is None:
+            from main import run_strategy as runner
+        self.strategy_cls = strategy_cls
+        self.data = data
+        self.initial_capital = initial_capital
+        self.commission_rate = commission_rate
+        self.start_date = start_date
+        self.runner = runner
+        if cache_dir is None and BaseStrategy.feature_cache is not None:
+            cache_dir = BaseStrategy.feature_cache.cache_dir
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+
+    @staticmethod
+    def grid(search_space, constraint=None):
+        """
+        展开参数网格
+
+        Args:
+            search_space (dict): 参数名 -> 候选取值列表
+            constraint: 可选的过滤函数 constraint(params) -> bool，如排除快线周期不小于慢线周期的组合
+
+        Returns:
+            list: 参数组合字典列表
+        """
+        names = list(search_space)
+        points = [dict(zip(names, values)) for values in itertools.product(*search_space.values())]
+        if constraint is not None:
+            points = [params for params in points if constraint(params)]
+        return points
+
+    def run(self, search_space=None, constraint=None, n_jobs=None, sort_by='profit_rate'):
+        """
+        回测全部参数组合
+
+        Args:
+            search_space (dict): 搜索空间，默认为策略类的search_space
+            constraint: 参数组合过滤函数，默认为策略类的search_constraint
+            n_jobs (int): 进程数，None为CPU核数，1为在当前进程顺序运行
+            sort_by (str): 结果排序的指标（降序）
+
+        Returns:
+            pd.DataFrame: 每行一个参数组合，含各参数与 total_trades、win_rate、
+                          profit_rate、max_drawdown、turnover、final_capital
+        """
+        if search_space is None:
+            search_space = self.strategy_cls.search_space
+        if not search_space:
+            raise ValueError(f"{self.strategy_cls.__name__} 未定义参数搜索空间")
+        if constraint is None:
+            constraint = self.strategy_cls.search_constraint
+        points = self.grid(search_space, constraint)
+        if not points:
+            return pd.DataFrame(columns=list(search_space))
+
+        with tempfile.TemporaryDirectory(prefix='sweep_cache_') as tmp_dir:
+            cache_dir = self.cache_dir or tmp_dir
+            n_jobs = n_jobs or os.cpu_count() or 1
+            args = (self.initial_capital, self.commission_rate, self.start_date)
+            if n_jobs == 1:
+                previous = BaseStrategy.feature_cache
+                try:
+                    _init_worker(self.data, self.runner, cache_dir, self.cache_size)
+                    rows = [_run_point(self.strategy_cls, params, *args) for params in points]
+                finally:
+                    BaseStrategy.feature_cache = previous
+            else:
+                n_jobs = min(n_jobs, len(points))
+                chunksize = max(1, len(points) // (n_jobs * 4))
+                with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                         initargs=(self.data, self.runner, cache_dir, self.cache_size)) as pool:
+                    rows = list(pool.map(_run_point, itertools.repeat(self.strategy_cls), points,
+                                         *(itertools.repeat(value) for value in args),
+                                         chunksize=chunksize))
+
+        results = pd.DataFrame(rows)
+        return results.sort_values(sort_by, ascending=False, kind='stable').reset_index(drop=True)
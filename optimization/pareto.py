@@ -0,0 +1,317 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from optimization.param_sweep import ParameterSweep
+from utils.result_cache import ResultCache
+
+
+def _as_maximize(table, objectives):
+    """把目标列转换为“越大越好”的矩阵：min目标取负，缺失值视为最差"""
+    columns = []
+    for name, direction in objectives.items():
+        if direction not in ('max', 'min'):
+            raise ValueError(f"未知的优化方向: {direction}")
+        values = np.asarray(table[name], dtype=np.float64)
+        values = values if direction == 'max' else -values
+        columns.append(np.where(np.isnan(values), -np.inf, values))
+    return np.column_stack(columns) if columns else np.zeros((len(table), 0))
+
+
+def _dominated(ref, points, chunk_size=1024):
+    """points中被ref里任一点支配的点（a支配b：各目标均不差且至少一个更好）"""
+    dominated = np.zeros(len(points), dtype=bool)
+    for begin in range(0, len(ref), chunk_size):
+        chunk = ref[begin:begin + chunk_size]
+        # 逐目标累积二维比较结果，避免在很短的目标维上做归约
+        no_worse = np.ones((len(chunk), len(points)), dtype=bool)
+        better = np.zeros((len(chunk), len(points)), dtype=bool)
+        for j in range(points.shape[1]):
+            no_worse &= chunk[:, j, None] >= points[None, :, j]
+            better |= chunk[:, j, None] > points[None, :, j]
+        dominated |= (no_worse & better).any(axis=0)
+    return dominated
+
+
+def non_dominated(values, block_size=1024):
+    """
+    非支配筛选：返回不被任何其他点支配的点（各列越大越好）
+
+    先按各列字典序降序排列，支配者必然排在被支配者之前；再分块处理，每块先与已确认的
+    前沿做向量化比较（被支配点的支配者若也被支配，前沿中必有点同样支配它），
+    剩下的少数点再在块内两两比较。比较次数约为 点数 × 前沿大小，数十万候选也可快速筛选。
+
+    Args:
+        values (np.ndarray): (点数, 目标数) 的矩阵
+        block_size (int): 每块的点数
+
+    Returns:
+        np.ndarray: 布尔掩码，True为前沿上的点
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    mask = np.zeros(n, dtype=bool)
+    if n == 0:
+        return mask
+    order = np.lexsort([-values[:, j] for j in reversed(range(values.shape[1]))])
+    front = np.empty((0, values.shape[1]))
+    for begin in range(0, n, block_size):
+        index = order[begin:begin + block_size]
+        block = values[index]
+        alive = ~_dominated(front, block)
+        index, block = index[alive], block[alive]
+        alive = ~_dominated(block, block)
+        mask[index[alive]] = True
+        front = np.vstack([front, block[alive]])
+    return mask
+
+
+def pareto_ranks(values, max_rank=None):
+    """
+    非支配排序：第0层为前沿，去掉后剩余点的前沿为第1层，依此类推
+
+    Args:
+        values (np.ndarray): (点数, 目标数) 的矩阵（各列越大越好）
+        max_rank (int): 只排到第max_rank层，更后的点记为-1
+
+    Returns:
+        np.ndarray: 各点的层号
+    """
+    values = np.asarray(values, dtype=np.float64)
+    ranks = np.full(len(values), -1, dtype=np.int64)
+    remaining = np.arange(len(values))
+    rank = 0
+    while len(remaining) and (max_rank is None or rank <= max_rank):
+        mask = non_dominated(values[remaining])
+        ranks[remaining[mask]] = rank
+        remaining = remaining[~mask]
+        rank += 1
+    return ranks
+
+
+def crowding_distance(values):
+    """
+    同一层内各点的拥挤距离（NSGA-II）：各目标上相邻两点间距之和，两端点为inf，
+    距离越大说明该点所在区域越稀疏，可用于在前沿上均匀挑选
+
+    Args:
+        values (np.ndarray): (点数, 目标数) 的矩阵
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n, m = values.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        return np.full(n, np.inf)
+    finite = np.where(np.isfinite(values), values, np.nan)
+    for j in range(m):
+        order = np.argsort(finite[:, j], kind='stable')
+        column = finite[order, j]
+        span = np.nanmax(column) - np.nanmin(column)
+        gaps = np.zeros(n)
+        if span > 0:
+            gaps[1:-1] = (column[2:] - column[:-2]) / span
+        gaps[0] = gaps[-1] = np.inf
+        distance[order] += np.nan_to_num(gaps, nan=0.0, posinf=np.inf)
+    return distance
+
+
+class ParetoOptimizer:
+    """多目标参数寻优（帕累托前沿）
+
+    参数组合的回测沿用ParameterSweep（多进程、共享指标缓存），结果连同各参数保存到
+    候选文件中；再次运行时只回测文件中尚未出现的参数组合。候选文件同时记录行情、
+    初始资金、手续费率、开始日期与代码指纹组成的内容键，任一项改变后旧候选不再复用。
+    前沿由候选表直接计算，可按不同的目标与约束（如回撤上限）重新筛选，无需重新回测。
+    """
+
+    # 默认目标：收益率越高越好，最大回撤、换手率、交易次数越低越好
+    OBJECTIVES = {
+        'profit_rate': 'max',
+        'max_drawdown': 'min',
+        'turnover': 'min',
+        'total_trades': 'min',
+    }
+
+    def __init__(self, strategy_cls, data, initial_capital=1000000, commission_rate=0.0003,
+                 start_date=None, runner=None, cache_dir=None, cache_size=512 * 1024 * 1024,
+                 store=None):
+        """
+        Args:
+            strategy_cls: 策略类
+            data (pd.DataFrame): 行情数据（含预热K线）
+            initial_capital (float): 初始资金
+            commission_rate (float): 手续费率
+            start_date (str): 信号评估的开始日期
+            runner: 回测函数，默认使用 main.run_strategy
+            cache_dir (str): 指标缓存目录
+            cache_size (int): 指标缓存容量上限（字节）
+            store (str): 候选文件路径（.npz），None为不保存
+        """
+        self.strategy_cls = strategy_cls
+        self.sweep = ParameterSweep(strategy_cls, data, initial_capital, commission_rate,
+                                    start_date, runner, cache_dir, cache_size)
+        self.store = store
+
+    def store_key(self):
+        """候选文件的内容键：行情、策略、代码指纹、初始资金、手续费率与开始日期"""
+        sweep = self.sweep
+        spec = {
+            'data': ResultCache.fingerprint(sweep.data),
+            'columns': list(map(str, sweep.data.columns)),
+            'strategy': f"{self.strategy_cls.__module__}.{self.strategy_cls.__qualname__}",
+            'code': ResultCache.code_fingerprint(self.strategy_cls,
+                                                 ResultCache.runner_functions(sweep.runner)),
+            'initial_capital': repr(sweep.initial_capital),
+            'commission_rate': repr(sweep.commission_rate),
+            'start_date': str(sweep.start_date),
+        }
+        return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def save_candidates(table, path, key=None):
+        """
+        保存候选表：数值列按原类型保存，其他列（如None、元组参数）按JSON字符串保存；
+        key为候选的内容键（见store_key），随文件一并保存
+        """
+        arrays = {}
+        encoded = []
+        for name in table.columns:
+            column = table[name]
+            if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+                arrays[name] = column.to_numpy()
+            else:
+                arrays[name] = np.array([json.dumps(value) for value in column], dtype=str)
+                encoded.append(name)
+        arrays['__columns__'] = np.array(list(map(str, table.columns)), dtype=str)
+        arrays['__encoded__'] = np.array(encoded, dtype=str)
+        arrays['__key__'] = np.array('' if key is None else key)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, **arrays)
+
+    @staticmethod
+    def load_candidates(path):
+        """读取候选表，文件不存在时返回None"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as stored:
+            encoded = set(stored['__encoded__'].tolist())
+            data = {}
+            for name in stored['__columns__'].tolist():
+                values = stored[name]
+                if name in encoded:
+                    values = [json.loads(value) for value in values.tolist()]
+                    values = [tuple(value) if isinstance(value, list) else value for value in values]
+                data[name] = values
+        return pd.DataFrame(data)
+
+    @staticmethod
+    def load_store_key(path):
+        """读取候选文件保存的内容键，文件不存在或未记录时返回None"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as stored:
+            key = str(stored['__key__']) if '__key__' in stored.files else ''
+        return key or None
+
+    @staticmethod
+    def _point_key(params):
+        return json.dumps({name: repr(value) for name, value in params.items()}, sort_keys=True)
+
+    def evaluate(self, search_space=None, constraint=None, n_jobs=None):
+        """
+        回测搜索空间中尚未评估过的参数组合，并与已保存的候选合并；候选文件的内容键
+        与本次行情、资金、手续费率、开始日期或代码不一致时不复用，重新建立候选表
+
+        Returns:
+            pd.DataFrame: 全部候选（各参数与绩效指标）
+        """
+        if search_space is None:
+            search_space = self.strategy_cls.search_space
+        if not search_space:
+            raise ValueError(f"{self.strategy_cls.__name__} 未定义参数搜索空间")
+        if constraint is None:
+            constraint = self.strategy_cls.search_constraint
+        names = list(search_space)
+        key = self.store_key() if self.store else None
+        previous = None
+        if self.store and os.path.exists(self.store):
+            if self.load_store_key(self.store) == key:
+                previous = self.load_candidates(self.store)
+            else:
+                print(f"候选文件 {self.store} 与当前行情、资金、手续费率、开始日期或代码不一致，重新建立候选表")
+
+        done = set()
+        if previous is not None and set(names) <= set(previous.columns):
+            for row in previous[names].itertuples(index=False):
+                done.add(self._point_key(dict(zip(names, row))))
+
+        def pending(params):
+            if constraint is not None and not constraint(params):
+                return False
+            return self._point_key(params) not in done
+
+        fresh = self.sweep.run(search_space, pending, n_jobs=n_jobs)
+        if previous is not None and not fresh.empty:
+            candidates = pd.concat([previous, fresh], ignore_index=True)
+        elif previous is not None:
+            candidates = previous
+        else:
+            candidates = fresh
+        if self.store and not fresh.empty:
+            self.save_candidates(candidates, self.store, key)
+        return candidates
+
+    @classmethod
+    def front(cls, candidates, objectives=None, limits=None, max_rank=0):
+        """
+        由候选表计算帕累托前沿（可按不同目标与约束反复调用）
+
+        Args:
+            candidates (pd.DataFrame): 候选表
+            objectives (dict): 指标名 -> 'max' / 'min'，默认为OBJECTIVES
+            limits (dict): 指标名 -> (下限, 上限)，先剔除不满足的候选，如 {'max_drawdown': (None, 20)}
+            max_rank (int): 返回前几层（0为只返回前沿）
+
+        Returns:
+            pd.DataFrame: 入选候选，附 rank（层号）与 crowding（层内拥挤距离），
+                          按层号升序、拥挤距离降序排列
+        """
+        objectives = objectives or cls.OBJECTIVES
+        table = candidates
+        for name, (low, high) in (limits or {}).items():
+            values = table[name].to_numpy(dtype=np.float64)
+            keep = np.ones(len(table), dtype=bool)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            table = table[keep]
+
+        values = _as_maximize(table, objectives)
+        ranks = pareto_ranks(values, max_rank)
+        selected = ranks >= 0
+        result = table[selected].copy()
+        result['rank'] = ranks[selected]
+        crowding = np.zeros(len(result))
+        for rank in np.unique(result['rank']):
+            members = np.flatnonzero(ranks[selected] == rank)
+            crowding[members] = crowding_distance(values[selected][members])
+        result['crowding'] = crowding
+        return result.sort_values(['rank', 'crowding'], ascending=[True, False], kind='stable') \
+            .reset_index(drop=True)
+
+    def run(self, search_space=None, constraint=None, objectives=None, limits=None, max_rank=0, n_jobs=None):
+        """
+        回测（只补充未评估的组合）并返回帕累托前沿
+
+        Returns:
+            dict: front（前沿，DataFrame）、candidates（全部候选，DataFrame）
+        """
+        candidates = self.evaluate(search_space, constraint, n_jobs)
+        return {
+            'front': self.front(candidates, objectives, limits, max_rank),
+            'candidates': candidates,
+        }
@@ -0,0 +1,327 @@
+import contextlib
+import io
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from strategies.risk_overlay import RiskOverlay
+
+# 单字节取值 -> 置位数，用于统计压缩掩码中为True的K线数
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# 风控参数基因，按顺序排在规则基因之后
+RISK_PARAMS = ('stop_loss', 'profit_target', 'trailing_stop')
+
+# 子进程内共享的状态：收盘价等在进程启动时传入一次
+_worker_state = {}
+
+
+def _init_worker(close, start, commission_rate, min_trades):
+    """进程池初始化：保存收盘价与评估参数"""
+    _worker_state['close'] = close
+    _worker_state['start'] = start
+    _worker_state['commission_rate'] = commission_rate
+    _worker_state['min_trades'] = min_trades
+
+
+def _score_chunk(entries, exits, risks):
+    """
+    用RiskOverlay.scan_batch同时回测一批候选的买卖信号，返回复利收益率（%）
+
+    Args:
+        entries, exits (np.ndarray): (候选数, 字节数) 的压缩买入/卖出掩码
+        risks (np.ndarray): (候选数, 3) 的 stop_loss、profit_target、trailing_stop（NaN为不启用）
+    """
+    close = _worker_state['close']
+    n = len(close)
+    rate = _worker_state['commission_rate']
+    trades, growth = RiskOverlay().scan_batch(np.unpackbits(entries, axis=1, count=n).view(bool),
+                                              np.unpackbits(exits, axis=1, count=n).view(bool),
+                                              close, *risks.T, start=_worker_state['start'])
+    # 每笔交易买入、卖出各付一次手续费
+    scores = (growth * ((1 - rate) / (1 + rate)) ** trades - 1) * 100
+    return np.where(trades >= _worker_state['min_trades'], scores, -np.inf)
+
+
+class GeneticRuleSearch:
+    """投票规则的遗传搜索
+
+    基因依次为：各买入条件（0为不启用，否则为阈值候选的序号+1）、买入票数、
+    成交量确认阈值、各卖出条件、卖出票数，以及各风控参数的候选序号。
+
+    每个（条件, 阈值）只在开始时向量化计算一次，并用np.packbits压缩为位掩码。
+    评估一个候选时，k-of-m投票由按位与/或的计数器完成（at_least[j] 表示已有
+    至少j个条件成立），整代候选一起做位运算；随后用查表popcount统计买入K线数，
+    买入K线不足min_trades的候选不再回测（交易次数不可能多于买入K线数），
+    其余候选解压后交给RiskOverlay.scan_batch，逐K线循环一次即完成整批候选的
+    回测。相同基因的适应度只计算一次。
+
+    适应度为全仓复利收益率（计入双边手续费），不含动态仓位与成交量限制，
+    选出的规则应再用完整回测确认。
+    """
+
+    def __init__(self, strategy_cls, data, commission_rate=0.0003, rule_space=None, min_trades=5):
+        """
+        Args:
+            strategy_cls: 提供condition_mask / volume_mask的策略类（如EnhancedHybridStrategy）
+            data (pd.DataFrame): 行情数据
+            commission_rate (float): 手续费率
+            rule_space (dict): 阈值与风控参数的候选取值，默认为策略类的rule_space
+            min_trades (int): 适应度有效所需的最少交易次数
+        """
+        self.strategy_cls = strategy_cls
+        self.commission_rate = commission_rate
+        self.rule_space = rule_space if rule_space is not None else strategy_cls.rule_space
+        self.min_trades = min_trades
+
+        strategy = strategy_cls(1000000, commission_rate)
+        strategy.verbose = False
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = strategy.calculate_signals(data.copy())
+        self.close = df['close'].to_numpy(dtype=np.float64)
+        self.start = max(strategy.warmup_period, 1)
+        self._build_tables(df)
+
+    def _alleles(self, side, name):
+        """条件的阈值候选（无阈值的条件只有一个None）"""
+        param = self.strategy_cls.CONDITION_PARAMS.get((side, name))
+        return list(self.rule_space[param]) if param else [None]
+
+    def _pack(self, mask):
+        """预热期内置为False后压缩为位掩码"""
+        mask = np.asarray(mask, dtype=bool).copy()
+        mask[:self.start] = False
+        return np.packbits(mask)
+
+    def _build_tables(self, df):
+        """预计算全部（条件, 阈值）的位掩码；各侧第0行为全0，代表条件未启用"""
+        self.genes = []
+        self.tables = {}
+        for side, conditions in (('buy', self.strategy_cls.BUY_CONDITIONS),
+                                 ('sell', self.strategy_cls.SELL_CONDITIONS)):
+            rows = [self._pack(np.zeros(len(df), dtype=bool))]
+            offsets = []
+            for name in conditions:
+                offsets.append(len(rows) - 1)
+                alleles = self._alleles(side, name)
+                rows.extend(self._pack(self.strategy_cls.condition_mask(df, side, name, value))
+                            for value in alleles)
+                self.genes.append((side, name, len(alleles) + 1))
+            self.tables[side] = (np.vstack(rows), np.asarray(offsets))
+            self.genes.append((side, 'votes', len(conditions)))
+            if side == 'buy':
+                ratios = list(self.rule_space['volume_confirm_ratio'])
+                self.volume_table = np.vstack([self._pack(self.strategy_cls.volume_mask(df, ratio))
+                                               for ratio in ratios])
+                self.genes.append(('buy', 'volume', len(ratios)))
+        for name in RISK_PARAMS:
+            self.genes.append(('risk', name, len(self.rule_space[name])))
+        self.gene_sizes = np.array([size for _, _, size in self.genes])
+        self._index = {(side, name): i for i, (side, name, _) in enumerate(self.genes)}
+
+    def _votes(self, genomes, side):
+        """
+        整代候选的k-of-m投票结果（位掩码）
+
+        Returns:
+            np.ndarray: (候选数, 字节数)
+        """
+        table, offsets = self.tables[side]
+        cond = [self._index[(side, name)] for side_, name, _ in self.genes
+                if side_ == side and name not in ('votes', 'volume')]
+        genes = genomes[:, cond]
+        rows = np.where(genes > 0, offsets + genes, 0)
+        masks = table[rows]
+        m = len(cond)
+        # at_least[j]：至少j个条件成立
+        at_least = [np.full(masks.shape[::2], 0xFF, dtype=np.uint8)] + \
+            [np.zeros(masks.shape[::2], dtype=np.uint8) for _ in range(m)]
+        for i in range(m):
+            for j in range(i + 1, 0, -1):
+                at_least[j] |= at_least[j - 1] & masks[:, i]
+        votes = genomes[:, self._index[(side, 'votes')]] + 1
+        return np.stack(at_least[1:], axis=1)[np.arange(len(genomes)), votes - 1]
+
+    def signals(self, genomes):
+        """
+        整代候选的买入/卖出位掩码
+
+        Returns:
+            tuple: (entries, exits)，各为 (候选数, 字节数) 的uint8数组
+        """
+        genomes = np.atleast_2d(genomes)
+        entries = self._votes(genomes, 'buy') & self.volume_table[genomes[:, self._index[('buy', 'volume')]]]
+        return entries, self._votes(genomes, 'sell')
+
+    def decode(self, genome):
+        """把基因解码为策略参数（可直接传给策略构造函数）"""
+        params = {}
+        for side in ('buy', 'sell'):
+            conditions = []
+            for i, (side_, name, _) in enumerate(self.genes):
+                if side_ != side or name in ('votes', 'volume'):
+                    continue
+                if genome[i] > 0:
+                    conditions.append(name)
+                    param = self.strategy_cls.CONDITION_PARAMS.get((side, name))
+                    if param:
+                        params[param] = self._alleles(side, name)[genome[i] - 1]
+            params[f'{side}_conditions'] = tuple(conditions)
+            params[f'{side}_votes'] = int(genome[self._index[(side, 'votes')]]) + 1
+        params['volume_confirm_ratio'] = \
+            self.rule_space['volume_confirm_ratio'][genome[self._index[('buy', 'volume')]]]
+        for name in RISK_PARAMS:
+            params[name] = self.rule_space[name][genome[self._index[('risk', name)]]]
+        return params
+
+    def _risks(self, genomes):
+        """各候选的风控参数矩阵，None转为NaN"""
+        columns = [self._index[('risk', name)] for name in RISK_PARAMS]
+        values = [[np.nan if value is None else value for value in self.rule_space[name]] for name in RISK_PARAMS]
+        return np.column_stack([np.asarray(values[k], dtype=float)[genomes[:, c]]
+                                for k, c in enumerate(columns)])
+
+    def evaluate(self, genomes, pool=None, n_jobs=1):
+        """
+        计算一批候选的适应度（全仓复利收益率，%），交易不足min_trades的为-inf
+
+        Args:
+            genomes (np.ndarray): (候选数, 基因数) 的整数数组
+            pool: 进程池，None为在当前进程计算
+            n_jobs (int): 进程池的进程数（用于划分任务）
+        """
+        genomes = np.atleast_2d(genomes)
+        entries, exits = self.signals(genomes)
+        scores = np.full(len(genomes), -np.inf)
+        # 买入K线数是交易次数的上限，不足时无需回测
+        viable = np.flatnonzero(_POPCOUNT[entries].sum(axis=1, dtype=np.int64) >= self.min_trades)
+        if len(viable) == 0:
+            return scores
+        risks = self._risks(genomes[viable])
+        if pool is None:
+            scores[viable] = _score_chunk(entries[viable], exits[viable], risks)
+            return scores
+        chunks = np.array_split(np.arange(len(viable)), n_jobs * 4)
+        results = pool.map(_score_chunk, [entries[viable[c]] for c in chunks],
+                           [exits[viable[c]] for c in chunks], [risks[c] for c in chunks])
+        scores[viable] = np.concatenate(list(results))
+        return scores
+
+    def random_genomes(self, n, rng):
+        """随机生成n个基因"""
+        return (rng.random((n, len(self.gene_sizes))) * self.gene_sizes).astype(np.int64)
+
+    def default_genome(self):
+        """策略当前默认参数对应的基因（阈值不在候选中时取最接近的候选）"""
+        strategy = self.strategy_cls(1000000, self.commission_rate)
+        genome = np.zeros(len(self.genes), dtype=np.int64)
+
+        def nearest(values, value):
+            if value in values:
+                return values.index(value)
+            numeric = [(k, v) for k, v in enumerate(values) if v is not None]
+            if value is None or not numeric:
+                return 0
+            return min(numeric, key=lambda item: abs(item[1] - value))[0]
+
+        for i, (side, name, _) in enumerate(self.genes):
+            if side == 'risk':
+                genome[i] = nearest(list(self.rule_space[name]), getattr(strategy, name))
+            elif name == 'votes':
+                genome[i] = getattr(strategy, f'{side}_votes') - 1
+            elif name == 'volume':
+                genome[i] = nearest(list(self.rule_space['volume_confirm_ratio']), strategy.volume_confirm_ratio)
+            elif name in getattr(strategy, f'{side}_conditions'):
+                param = self.strategy_cls.CONDITION_PARAMS.get((side, name))
+                genome[i] = 1 + (nearest(self._alleles(side, name), getattr(strategy, param)) if param else 0)
+        return genome
+
+    def run(self, population=2000, generations=20, elite=0.05, tournament=3, crossover=0.9,
+            mutation=None, seed=None, n_jobs=None):
+        """
+        运行遗传搜索
+
+        Args:
+            population (int): 每代候选数
+            generations (int): 代数
+            elite (float): 直接保留到下一代的精英比例
+            tournament (int): 锦标赛选择的参赛数
+            crossover (float): 均匀交叉的概率
+            mutation (float): 每个基因的变异概率，默认 1/基因数
+            seed (int): 随机种子
+            n_jobs (int): 回测进程数，None为CPU核数，1为在当前进程计算
+
+        Returns:
+            dict: best（最优规则的策略参数）、best_score、
+                  history（每代的最优/平均适应度与新评估数，DataFrame）、evaluations（回测评估次数）
+        """
+        rng = np.random.default_rng(seed)
+        n_genes = len(self.gene_sizes)
+        mutation = 1.0 / n_genes if mutation is None else mutation
+        n_elite = max(int(population * elite), 1)
+        fitness = {}
+        history = []
+
+        genomes = self.random_genomes(population, rng)
+        genomes[0] = self.default_genome()
+
+        n_jobs = n_jobs or os.cpu_count() or 1
+        pool = None
+        try:
+            if n_jobs > 1:
+                pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                           initargs=(self.close, self.start, self.commission_rate, self.min_trades))
+            else:
+                _init_worker(self.close, self.start, self.commission_rate, self.min_trades)
+            for generation in range(generations):
+                # 只评估此前未出现过的基因
+                keys = [genome.tobytes() for genome in genomes]
+                unseen = {}
+                for i, key in enumerate(keys):
+                    if key not in fitness and key not in unseen:
+                        unseen[key] = i
+                new = list(unseen.values())
+                if new:
+                    for i, score in zip(new, self.evaluate(genomes[new], pool, n_jobs)):
+                        fitness[keys[i]] = score
+                scores = np.array([fitness[key] for key in keys])
+                finite = scores[np.isfinite(scores)]
+                history.append({
+                    'generation': generation,
+                    'best': scores.max(),
+                    'mean': finite.mean() if len(finite) else np.nan,
+                    'valid': len(finite),
+                    'evaluated': len(new),
+                })
+                if generation == generations - 1:
+                    break
+                genomes = self._next_generation(genomes, scores, n_elite, tournament, crossover, mutation, rng)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        best_key = max(fitness, key=fitness.get)
+        best = np.frombuffer(best_key, dtype=np.int64)
+        return {
+            'best': self.decode(best),
+            'best_score': float(fitness[best_key]),
+            'history': pd.DataFrame(history),
+            'evaluations': len(fitness),
+        }
+
+    def _next_generation(self, genomes, scores, n_elite, tournament, crossover, mutation, rng):
+        """精英保留 + 锦标赛选择 + 均匀交叉 + 逐基因变异"""
+        population, n_genes = genomes.shape
+        elite = genomes[np.argsort(-scores, kind='stable')[:n_elite]]
+        n_children = population - n_elite
+
+        contestants = rng.integers(0, population, size=(2, n_children, tournament))
+        winners = np.take_along_axis(contestants, np.argmax(scores[contestants], axis=2)[..., None], axis=2)[..., 0]
+        mothers, fathers = genomes[winners[0]], genomes[winners[1]]
+
+        mix = (rng.random((n_children, n_genes)) < 0.5) & (rng.random((n_children, 1)) < crossover)
+        children = np.where(mix, fathers, mothers)
+
+        mutate = rng.random((n_children, n_genes)) < mutation
+        children = np.where(mutate, self.random_genomes(n_children, rng), children)
+        return np.vstack([elite, children])
@@ -0,0 +1,270 @@
+import contextlib
+import io
+import itertools
+import math
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from strategies.base_strategy import BaseStrategy
+from optimization.walk_forward import window_metric
+from utils.feature_cache import FeatureCache
+
+# 子进程内共享的状态：各股票行情与逐K线回测函数在进程启动时传入一次
+_worker_state = {}
+
+
+def _init_worker(datasets, bar_runner, cache_dir, cache_bytes):
+    """进程池初始化：保存行情数据并启用共享的指标磁盘缓存"""
+    _worker_state['datasets'] = datasets
+    _worker_state['bar_runner'] = bar_runner
+    if cache_dir:
+        BaseStrategy.feature_cache = FeatureCache(cache_dir, cache_bytes)
+
+
+def _evaluate(strategy_cls, params, symbols, n_bars, initial_capital, commission_rate, metric, start_date):
+    """
+    在指定股票的最近n_bars根K线（不早于start_date）上评估一个参数组合
+
+    指标始终按完整历史计算，不同资源档位的输入相同，可直接命中指标缓存。
+
+    Returns:
+        tuple: (各股票评价指标的均值, 各股票另一指标的均值, 各股票成交笔数的均值)，
+               后两者用于评价指标相同时排序
+    """
+    run_bars = _worker_state['bar_runner']
+    secondary_metric = 'sharpe' if metric == 'profit_rate' else 'profit_rate'
+    scores, secondary, trades = [], [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for symbol in symbols:
+            data = _worker_state['datasets'][symbol]
+            strategy = strategy_cls(initial_capital, commission_rate, **params)
+            strategy.verbose = False
+            df = strategy.calculate_signals(data.copy())
+            start = max(strategy.evaluation_start(df['date'], start_date), len(df) - n_bars)
+            if start >= len(df):
+                continue
+            run_bars(strategy, df, start, len(df))
+            equity = strategy.equity_curve[start:]
+            scores.append(window_metric(equity, initial_capital, metric))
+            secondary.append(window_metric(equity, initial_capital, secondary_metric))
+            trades.append(len(strategy.trades))
+    if not scores:
+        return -np.inf, -np.inf, 0.0
+    return float(np.mean(scores)), float(np.mean(secondary)), float(np.mean(trades))
+
+
+def _rank(scores, secondary, trades):
+    """按评价指标降序排列；相同时依次按另一指标、成交笔数（证据更多者优先）降序"""
+    return np.lexsort((-np.asarray(trades), -np.asarray(secondary), -np.asarray(scores)))
+
+
+class SuccessiveHalving:
+    """随机搜索 + 逐轮减半（successive halving / Hyperband）参数寻优
+
+    参数空间较大时网格搜索组合数爆炸。这里从搜索空间中随机抽取候选参数组合，
+    先用少量资源（较短的最近历史或部分股票）评估全部候选，每轮只保留排名前
+    1/eta 的候选，并把资源扩大eta倍后再次评估，直到剩余候选用完整资源评估。
+    总计算量约为 轮数 × 全部候选用最少资源的开销，远小于对每个候选做完整回测。
+
+    Hyperband 在多个起始资源档位（bracket）上重复逐轮减半，兼顾
+    “多候选、少资源”与“少候选、多资源”两种取舍。
+
+    按K线数分配资源时只计开始日期之后的K线；最短的一轮也不少于候选中最长的预热长度
+    加min_bars根K线，避免历史太短、多数候选没有成交而得分相同。
+    """
+
+    def __init__(self, strategy_cls, data, initial_capital=1000000, commission_rate=0.0003,
+                 resource='bars', bar_runner=None, cache_dir=None, cache_size=512 * 1024 * 1024,
+                 start_date=None):
+        """
+        Args:
+            strategy_cls: 策略类
+            data: 单只股票的行情DataFrame，或 {股票代码: DataFrame} 多只股票
+            initial_capital (float): 初始资金
+            commission_rate (float): 手续费率
+            resource (str): 逐轮扩大的资源，'bars' 为最近历史长度，'symbols' 为参与评估的股票数
+            bar_runner: 逐K线回测函数，默认使用 main.run_bars
+            cache_dir (str): 指标缓存目录，默认沿用已启用的缓存，否则使用临时目录
+            cache_size (int): 指标缓存容量上限（字节）
+            start_date (str): 评估的开始日期，之前的K线只用于预热
+        """
+        if bar_runner is None:
+            from main import run_bars as bar_runner
+        if resource not in ('bars', 'symbols'):
+            raise ValueError(f"未知的资源类型: {resource}")
+        self.strategy_cls = strategy_cls
+        self.datasets = data if isinstance(data, dict) else {'data': data}
+        self.initial_capital = initial_capital
+        self.commission_rate = commission_rate
+        self.resource = resource
+        self.bar_runner = bar_runner
+        if cache_dir is None and BaseStrategy.feature_cache is not None:
+            cache_dir = BaseStrategy.feature_cache.cache_dir
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.start_date = start_date
+
+    @staticmethod
+    def sample(search_space, n, seed=None, constraint=None):
+        """
+        从搜索空间中随机抽取不重复的参数组合（按网格位置抽样，不展开整个网格）
+
+        Args:
+            search_space (dict): 参数名 -> 候选取值列表
+            n (int): 抽取数量（不足时返回全部满足约束的组合）
+            seed (int): 随机种子
+            constraint: 参数组合过滤函数
+
+        Returns:
+            list: 参数组合字典列表
+        """
+        rng = np.random.default_rng(seed)
+        names = list(search_space)
+        sizes = [len(search_space[name]) for name in names]
+        total = math.prod(sizes)
+        points = []
+        seen = set()
+        # 约束可能过滤掉部分组合，抽样次数设上限以免死循环
+        attempts = 0
+        while len(points) < n and len(seen) < total and attempts < 20 * n + 100:
+            attempts += 1
+            flat = int(rng.integers(total))
+            if flat in seen:
+                continue
+            seen.add(flat)
+            index = np.unravel_index(flat, sizes)
+            params = {name: search_space[name][i] for name, i in zip(names, index)}
+            if constraint is None or constraint(params):
+                points.append(params)
+        return points
+
+    def _evaluable_bars(self):
+        """各股票开始日期之后K线数的最大值（完整的K线资源）"""
+        start = '' if self.start_date is None else str(self.start_date)
+        return max(int((df['date'].astype(str) >= start).sum()) for df in self.datasets.values())
+
+    def _resource_levels(self, n_rungs, eta, min_fraction, min_level=1):
+        """各轮的资源：最后一轮为完整资源，之前每轮缩小eta倍（不低于min_fraction与min_level）"""
+        if self.resource == 'bars':
+            full = self._evaluable_bars()
+        else:
+            full = len(self.datasets)
+        min_level = min(max(min_level, 1), full)
+        levels = []
+        for k in range(n_rungs):
+            fraction = max(eta ** (k - n_rungs + 1), min_fraction)
+            levels.append(max(int(math.ceil(full * fraction)), min_level))
+        return levels
+
+    def _evaluate_all(self, pool, points, level, symbols_order, metric):
+        """用给定资源评估一批候选（pool为None时在当前进程顺序计算）"""
+        if self.resource == 'bars':
+            symbols, n_bars = list(self.datasets), level
+        else:
+            symbols, n_bars = symbols_order[:level], max(len(df) for df in self.datasets.values())
+        args = (symbols, n_bars, self.initial_capital, self.commission_rate, metric, self.start_date)
+        if pool is None:
+            return [_evaluate(self.strategy_cls, params, *args) for params in points]
+        return list(pool.map(_evaluate, itertools.repeat(self.strategy_cls), points,
+                             *(itertools.repeat(value) for value in args)))
+
+    def _bracket(self, pool, points, eta, min_fraction, min_bars, symbols_order, metric, bracket, offset):
+        """对一组候选执行一次逐轮减半，返回评估记录（candidate为候选在全部候选中的编号）"""
+        n_rungs = max(int(math.floor(math.log(len(points), eta) + 1e-9)) + 1, 1)
+        min_level = 1
+        if self.resource == 'bars':
+            warmup = max(self.strategy_cls(self.initial_capital, self.commission_rate, **params).warmup_period
+                         for params in points)
+            min_level = warmup + min_bars
+        levels = self._resource_levels(n_rungs, eta, min_fraction, min_level)
+        records = []
+        alive = list(range(len(points)))
+        cached = {}
+        for rung, level in enumerate(levels):
+            # 资源与上一轮相同（受最短长度限制）时直接沿用上一轮的结果
+            if rung and level == levels[rung - 1]:
+                results = [cached[i] for i in alive]
+            else:
+                results = self._evaluate_all(pool, [points[i] for i in alive], level, symbols_order, metric)
+            cached = dict(zip(alive, results))
+            for i, (score, secondary, trades) in zip(alive, results):
+                records.append({'bracket': bracket, 'rung': rung, 'resource': level,
+                                'candidate': offset + i, **points[i], 'score': score,
+                                'secondary': secondary, 'trades': trades})
+            if rung == len(levels) - 1:
+                break
+            keep = max(len(alive) // eta, 1)
+            order = _rank(*zip(*results))[:keep]
+            alive = [alive[j] for j in order]
+        return records
+
+    def run(self, n_candidates=81, eta=3, min_fraction=0.1, search_space=None, constraint=None,
+            brackets=1, metric='profit_rate', seed=None, n_jobs=None, min_bars=120):
+        """
+        运行寻优
+
+        Args:
+            n_candidates (int): 第一个bracket的候选数量
+            eta (int): 每轮保留 1/eta 的候选，资源扩大eta倍
+            min_fraction (float): 最少资源占完整资源的比例
+            search_space (dict): 搜索空间，默认为策略类的search_space
+            constraint: 参数组合过滤函数，默认为策略类的search_constraint
+            brackets (int): Hyperband的bracket数，1即单次逐轮减半；
+                            之后每个bracket候选数缩小eta倍、起始资源相应增大
+            metric (str): 评价指标（'profit_rate' 或 'sharpe'）
+            seed (int): 随机种子
+            n_jobs (int): 进程数，None为CPU核数，1为在当前进程顺序运行
+            min_bars (int): 按K线数分配资源时，最短一轮在最长预热长度之外至少包含的K线数
+
+        Returns:
+            dict: best（完整资源下得分最高的参数组合）、best_score、
+                  history（全部评估记录，DataFrame）、evaluations（评估次数）
+        """
+        if search_space is None:
+            search_space = self.strategy_cls.search_space
+        if not search_space:
+            raise ValueError(f"{self.strategy_cls.__name__} 未定义参数搜索空间")
+        if constraint is None:
+            constraint = self.strategy_cls.search_constraint
+        rng = np.random.default_rng(seed)
+        symbols_order = list(rng.permutation(list(self.datasets)))
+
+        with tempfile.TemporaryDirectory(prefix='halving_cache_') as tmp_dir:
+            cache_dir = self.cache_dir or tmp_dir
+            n_jobs = n_jobs or os.cpu_count() or 1
+            initargs = (self.datasets, self.bar_runner, cache_dir, self.cache_size)
+            previous = BaseStrategy.feature_cache
+            pool = None
+            try:
+                if n_jobs == 1:
+                    _init_worker(*initargs)
+                else:
+                    pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=initargs)
+                records = []
+                candidates = []
+                for bracket in range(brackets):
+                    n = max(int(n_candidates / eta ** bracket), 1)
+                    points = self.sample(search_space, n, int(rng.integers(2 ** 31)), constraint)
+                    if not points:
+                        break
+                    records.extend(self._bracket(pool, points, eta, min_fraction, min_bars, symbols_order,
+                                                 metric, bracket, len(candidates)))
+                    candidates.extend(points)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+                BaseStrategy.feature_cache = previous
+
+        history = pd.DataFrame(records)
+        if history.empty:
+            raise ValueError("参数搜索空间为空")
+        full = history[history['resource'] == history['resource'].max()]
+        best_row = full.iloc[_rank(full['score'], full['secondary'], full['trades'])[0]]
+        return {
+            'best': candidates[int(best_row['candidate'])],
+            'best_score': float(best_row['score']),
+            'history': history,
+            'evaluations': len(history),
+        }
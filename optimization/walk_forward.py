@@ -0,0 +1,226 @@
+import contextlib
+import io
+import itertools
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from strategies.base_strategy import BaseStrategy
+from optimization.param_sweep import ParameterSweep
+from utils.feature_cache import FeatureCache
+
+# 子进程内共享的状态：行情数据与逐K线回测函数在进程启动时传入一次
+_worker_state = {}
+
+
+def _init_worker(data, bar_runner, cache_dir, cache_bytes):
+    """进程池初始化：保存行情数据并启用共享的指标磁盘缓存"""
+    _worker_state['data'] = data
+    _worker_state['bar_runner'] = bar_runner
+    if cache_dir:
+        BaseStrategy.feature_cache = FeatureCache(cache_dir, cache_bytes)
+
+
+def window_metric(equity, initial_capital, metric='profit_rate'):
+    """
+    由区间权益曲线计算评价指标
+
+    Args:
+        equity (np.ndarray): 区间内逐日权益
+        initial_capital (float): 区间初始资金
+        metric (str): 'profit_rate'（收益率，%）或 'sharpe'（年化夏普比率）
+
+    Returns:
+        float: 指标值
+    """
+    if metric == 'profit_rate':
+        return (equity[-1] / initial_capital - 1) * 100 if len(equity) else 0.0
+    if metric == 'sharpe':
+        returns = np.diff(np.concatenate([[initial_capital], equity])) / \
+            np.concatenate([[initial_capital], equity[:-1]])
+        std = returns.std()
+        return float(returns.mean() / std * np.sqrt(252)) if std > 0 else 0.0
+    raise ValueError(f"未知的评价指标: {metric}")
+
+
+def _evaluate_point(strategy_cls, params, windows, initial_capital, commission_rate, metric):
+    """
+    单个参数组合在全部窗口上的表现：全历史指标只计算一次，
+    各样本内、样本外区间都在同一份指标上逐K线回测
+    """
+    data = _worker_state['data']
+    run_bars = _worker_state['bar_runner']
+
+    def make():
+        strategy = strategy_cls(initial_capital, commission_rate, **params)
+        strategy.verbose = False
+        return strategy
+
+    base = make()
+    df = base.calculate_signals(data.copy())
+    first_valid = max(base.warmup_period, 1)
+
+    train_scores = np.full(len(windows), np.nan)
+    test_equity = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for k, (train_start, train_end, test_end) in enumerate(windows):
+            start = max(train_start, first_valid)
+            if start < train_end:
+                strategy = make()
+                run_bars(strategy, df, start, train_end)
+                train_scores[k] = window_metric(strategy.equity_curve[start:train_end], initial_capital, metric)
+
+            strategy = make()
+            test_start = max(train_end, first_valid)
+            run_bars(strategy, df, test_start, test_end)
+            equity = np.asarray(strategy.equity_curve[train_end:test_end], dtype=np.float64)
+            test_equity.append(equity)
+    return train_scores, test_equity
+
+
+class WalkForwardAnalysis:
+    """滚动窗口的样本内寻优 + 样本外检验
+
+    历史数据被划分为若干 [样本内 | 样本外] 窗口：每个窗口在样本内区间上
+    选出评价指标最优的参数组合，再用该组合回测紧随其后的样本外区间，
+    各样本外区间的权益曲线按收益率首尾拼接为一条完整曲线。
+
+    每个参数组合的指标在全历史上只计算一次，所有窗口共用（指标只依赖历史数据，
+    不会引入未来信息）；参数组合分发到进程池并行运行。
+    """
+
+    def __init__(self, strategy_cls, data, initial_capital=1000000, commission_rate=0.0003,
+                 bar_runner=None, cache_dir=None, cache_size=512 * 1024 * 1024):
+        """
+        Args:
+            strategy_cls: 策略类
+            data (pd.DataFrame): 行情数据（全部历史）
+            initial_capital (float): 每个区间的初始资金
+            commission_rate (float): 手续费率
+            bar_runner: 逐K线回测函数，默认使用 main.run_bars
+            cache_dir (str): 指标缓存目录，默认沿用已启用的缓存，否则使用临时目录
+            cache_size (int): 指标缓存容量上限（字节）
+        """
+        if bar_runner is None:
+            from main import run_bars as bar_runner
+        self.strategy_cls = strategy_cls
+        self.data = data
+        self.initial_capital = initial_capital
+        self.commission_rate = commission_rate
+        self.bar_runner = bar_runner
+        if cache_dir is None and BaseStrategy.feature_cache is not None:
+            cache_dir = BaseStrategy.feature_cache.cache_dir
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+
+    @staticmethod
+    def windows(n_bars, train_bars, test_bars, start=0, step=None, anchored=False):
+        """
+        划分滚动窗口
+
+        Args:
+            n_bars (int): K线总数
+            train_bars (int): 样本内长度
+            test_bars (int): 样本外长度
+            start (int): 第一个样本内区间的起点
+            step (int): 窗口滑动步长，默认等于样本外长度（样本外区间首尾相接）
+            anchored (bool): 为True时样本内区间起点固定为start（逐步扩大）
+
+        Returns:
+            list: (样本内起点, 样本内终点即样本外起点, 样本外终点) 的列表，区间左闭右开
+        """
+        step = step or test_bars
+        result = []
+        train_start = start
+        while train_start + train_bars < n_bars:
+            train_end = train_start + train_bars
+            test_end = min(train_end + test_bars, n_bars)
+            result.append((start if anchored else train_start, train_end, test_end))
+            train_start += step
+        return result
+
+    def run(self, train_bars, test_bars, search_space=None, constraint=None, step=None,
+            anchored=False, metric='profit_rate', n_jobs=None):
+        """
+        运行滚动窗口分析
+
+        Args:
+            train_bars (int): 样本内长度（K线数）
+            test_bars (int): 样本外长度（K线数）
+            search_space (dict): 搜索空间，默认为策略类的search_space
+            constraint: 参数组合过滤函数，默认为策略类的search_constraint
+            step (int): 窗口滑动步长，默认等于样本外长度
+            anchored (bool): 是否固定样本内起点
+            metric (str): 样本内选优的评价指标（'profit_rate' 或 'sharpe'）
+            n_jobs (int): 进程数，None为CPU核数，1为在当前进程顺序运行
+
+        Returns:
+            dict: windows（各窗口的区间日期、最优参数、样本内/样本外指标，DataFrame）、
+                  equity（拼接后的样本外权益曲线，按日期索引的Series）
+        """
+        if step is not None and step < test_bars:
+            raise ValueError("窗口步长不能小于样本外长度，否则样本外区间重叠无法拼接")
+        if search_space is None:
+            search_space = self.strategy_cls.search_space
+        if constraint is None:
+            constraint = self.strategy_cls.search_constraint
+        points = ParameterSweep.grid(search_space, constraint)
+        if not points:
+            raise ValueError("参数搜索空间为空")
+
+        # 第一个窗口从全部参数组合中最长的预热完成处开始
+        start = max(max(self.strategy_cls(self.initial_capital, self.commission_rate, **params).warmup_period
+                        for params in points), 1)
+        windows = self.windows(len(self.data), train_bars, test_bars, start, step, anchored)
+        if not windows:
+            raise ValueError("数据长度不足以划分样本内/样本外窗口")
+
+        with tempfile.TemporaryDirectory(prefix='walk_forward_cache_') as tmp_dir:
+            cache_dir = self.cache_dir or tmp_dir
+            n_jobs = n_jobs or os.cpu_count() or 1
+            args = (windows, self.initial_capital, self.commission_rate, metric)
+            if n_jobs == 1:
+                previous = BaseStrategy.feature_cache
+                try:
+                    _init_worker(self.data, self.bar_runner, cache_dir, self.cache_size)
+                    results = [_evaluate_point(self.strategy_cls, params, *args) for params in points]
+                finally:
+                    BaseStrategy.feature_cache = previous
+            else:
+                n_jobs = min(n_jobs, len(points))
+                chunksize = max(1, len(points) // (n_jobs * 4))
+                with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                         initargs=(self.data, self.bar_runner, cache_dir, self.cache_size)) as pool:
+                    results = list(pool.map(_evaluate_point, itertools.repeat(self.strategy_cls), points,
+                                            *(itertools.repeat(value) for value in args),
+                                            chunksize=chunksize))
+
+        # (参数组合, 窗口) 的样本内得分矩阵，逐窗口取最优
+        train_scores = np.vstack([scores for scores, _ in results])
+        best = np.argmax(np.where(np.isnan(train_scores), -np.inf, train_scores), axis=0)
+
+        dates = np.asarray(self.data['date'])
+        rows = []
+        segments = []
+        capital = float(self.initial_capital)
+        for k, (train_start, train_end, test_end) in enumerate(windows):
+            equity = results[best[k]][1][k]
+            rows.append({
+                'train_start': dates[train_start],
+                'train_end': dates[train_end - 1],
+                'test_start': dates[train_end],
+                'test_end': dates[test_end - 1],
+                **points[best[k]],
+                'train_' + metric: train_scores[best[k], k],
+                'test_' + metric: window_metric(equity, self.initial_capital, metric),
+            })
+            # 样本外区间按收益率接续上一区间的期末资金
+            segments.append(equity / self.initial_capital * capital)
+            capital = segments[-1][-1]
+
+        oos_index = np.concatenate([np.arange(train_end, test_end) for _, train_end, test_end in windows])
+        return {
+            'windows': pd.DataFrame(rows),
+            'equity': pd.Series(np.concatenate(segments), index=dates[oos_index]),
+        }
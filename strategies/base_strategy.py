@@ -1,13 +1,33 @@
 import numpy as np
-from utils.utils import TradeLogger
+import pandas as pd
+from backtest.broker import Broker
+from backtest.ledger import TradeLedger, BUY
+
+# 信号编码，用于按数组记录逐日信号
+SIGNAL_CODES = {'HOLD': 0, 'BUY': 1, 'SELL': -1}
 
 class BaseStrategy:
+    # 指标磁盘缓存（FeatureCache），为None时直接计算
+    feature_cache = None
+    # 回测结果磁盘缓存（ResultCache），为None时不缓存
+    result_cache = None
+    # 单笔买入不超过当根成交量的比例，None表示不限制
+    volume_limit = None
+    # 持仓时是否允许继续买入（加仓）
+    pyramiding = False
+    # 是否打印成交信息
+    verbose = True
+    # 参数寻优的默认搜索空间（config/config.py中的 *_SEARCH_SPACE），子类声明
+    search_space = None
+    # 参数组合约束（config/config.py中的 *_SEARCH_CONSTRAINT），为None时不过滤
+    search_constraint = None
+
     def __init__(self, name, initial_capital, commission_rate):
         self.name = name
         self.initial_capital = initial_capital
         self.capital = initial_capital
         self.position = 0
-        self.trades = []
+        self.trades = TradeLedger()  # 成交记录（列式存储）
         self.position_size = 0.7  # 仓位比例
         self.commission_rate = commission_rate  # 手续费率
         self.entry_price = 0  # 入场价格
@@ -16,60 +36,115 @@ class BaseStrategy:
         self.drawdown_start = None
         self.drawdown_end = None
         self.current_drawdown_start = None
+        self.equity_curve = None  # 逐日权益（由回测引擎填充）
+        self.signal_history = None  # 逐日信号编码（由回测引擎填充）
+        self._current_row = None  # 当前K线数据（含预计算指标）
+        self._broker = None
+
+    @staticmethod
+    def resolve_config(defaults, params):
+        """
+        合并默认参数（config/config.py中的字典）与覆盖参数
+
+        Raises:
+            ValueError: 覆盖参数中出现默认参数里没有的参数名
+        """
+        unknown = sorted(set(params) - set(defaults))
+        if unknown:
+            raise ValueError(f"未知的策略参数: {', '.join(unknown)}")
+        return {**defaults, **params}
+
+    def set_current_row(self, row):
+        """设置当前行数据"""
+        self._current_row = row
+
+    def prepare_run(self, df, first_bar):
+        """回测开始前按评估起点调整依赖起点的预计算列（如定投日历），默认不做处理"""
+        pass
+
+    def risk_position_size(self, price, atr, risk_pct=0.02, atr_multiple=2.0, max_capital_pct=0.2):
+        """按ATR风险预算计算可买入股数
+
+        每股风险按atr_multiple倍ATR计，单笔最多亏损risk_pct比例的资金，
+        同时持仓市值不超过max_capital_pct比例的资金；ATR无效时只受资金比例限制。
+        """
+        max_shares = max_capital_pct * self.capital / price
+        if atr is None or not np.isfinite(atr) or atr <= 0:
+            return int(max_shares)
+        risk_shares = risk_pct * self.capital / (atr * atr_multiple)
+        return int(min(risk_shares, max_shares))
+
+    @property
+    def broker(self):
+        """下单与记账组件（首次使用时按volume_limit与verbose创建）"""
+        if self._broker is None:
+            self._broker = Broker(self, volume_limit=self.volume_limit, verbose=self.verbose)
+        return self._broker
+
+    def order_shares(self, price, volume):
+        """买入信号的计划股数，子类按各自的仓位规则覆盖"""
+        return int((self.capital * self.position_size) / price)
+
+    def sell_shares(self, price):
+        """卖出信号的计划股数，默认清仓"""
+        return self.position
 
     def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        commission = 0
-        available_capital = self.capital if self.position == 0 else self.capital + self.position * price
-        max_position = int((available_capital * self.position_size) / price)
-        
-        if signal == 'BUY' and self.position == 0 and max_position > 0:
-            shares = max_position
-            cost = shares * price
-            commission = cost * self.commission_rate
-            
-            if cost + commission <= self.capital:
-                self.capital -= (cost + commission)
-                self.position = shares
-                self.entry_price = price
-                
-                trade = {
-                    'date': date,
-                    'type': '买入',
-                    'price': price,
-                    'shares': shares,
-                    'amount': cost,
-                    'commission': commission,
-                    'capital': self.capital
-                }
-                self.trades.append(trade)
-                TradeLogger.print_trade(trade, self.name, self.position)
-            else:
-                print(f"资金不足：需要{cost + commission:.2f}，当前资金{self.capital:.2f}")
-        
+        """执行交易：股数由order_shares/sell_shares决定，成交与记账交给broker"""
+        if signal == 'BUY' and (self.position <= 0 or self.pyramiding):
+            self.broker.buy(date, price, self.order_shares(price, volume), volume)
         elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position)
+            self.broker.sell(date, price, self.sell_shares(price))
+
+    @staticmethod
+    def _sell_pnl(columns):
+        """
+        每笔卖出的盈亏：卖出净额 - 卖出股数 × 本轮持仓（从空仓到清仓）买入股份的平均成本（含手续费）
+
+        Returns:
+            tuple: (卖出成交的位置, 各笔卖出盈亏, 各笔卖出所在轮次的位置编号)
+        """
+        is_buy = columns['side'] == BUY
+        amount = columns['amount']
+        commission = columns['commission']
+        shares = columns['shares']
+
+        signed_shares = np.where(is_buy, shares, -shares)
+        held_before = np.cumsum(signed_shares) - signed_shares
+        round_start = is_buy & (held_before == 0)
+        round_id = np.cumsum(round_start)
+        buy_cost = np.cumsum(np.where(is_buy, amount + commission, 0.0))
+        buy_shares = np.cumsum(np.where(is_buy, shares, 0))
+        cost_offset = np.concatenate([[0.0], (buy_cost - np.where(is_buy, amount + commission, 0.0))[round_start]])
+        shares_offset = np.concatenate([[0], (buy_shares - np.where(is_buy, shares, 0))[round_start]])
+        round_cost = buy_cost - cost_offset[round_id]
+        round_shares = buy_shares - shares_offset[round_id]
+
+        sells = np.flatnonzero(~is_buy)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_cost = round_cost[sells] / round_shares[sells]
+        pnl = (amount[sells] - commission[sells]) - shares[sells] * avg_cost
+        return sells, pnl, np.flatnonzero(round_start)[round_id[sells] - 1]
+
+    def trade_returns(self):
+        """
+        每笔卖出的收益率：卖出盈亏 / 该轮首笔买入前的资金（即相对账户权益的贡献）
+
+        Returns:
+            np.ndarray: 按成交顺序排列的各笔卖出收益率
+        """
+        if not self.trades:
+            return np.zeros(0)
+        columns = self.trades.columns
+        is_buy = columns['side'] == BUY
+        cash_flow = np.where(is_buy, -(columns['amount'] + columns['commission']),
+                             columns['amount'] - columns['commission'])
+        capital_before = self.initial_capital + np.cumsum(cash_flow) - cash_flow
+        _, pnl, round_first = self._sell_pnl(columns)
+        return pnl / capital_before[round_first]
 
     def calculate_performance(self):
-        """计算策略表现"""
+        """计算策略表现（基于成交记录的列数组向量化计算）"""
         if not self.trades:
             return {
                 'total_trades': 0,
@@ -81,38 +156,32 @@ class BaseStrategy:
                 'drawdown_period': ''
             }
 
-        # 计算交易统计
-        profits = []
-        running_capital = self.initial_capital
-        running_max_capital = self.initial_capital
-        current_drawdown = 0
+        columns = self.trades.columns
+        is_buy = columns['side'] == BUY
+        amount = columns['amount']
+        commission = columns['commission']
+
+        # 逐笔成交后的资金
+        cash_flow = np.where(is_buy, -(amount + commission), amount - commission)
+        running_capital = self.initial_capital + np.cumsum(cash_flow)
+
+        sells, pnl, _ = self._sell_pnl(columns)
+        profits = pnl > 0
+
+        # 最大回撤：在每笔卖出后按资金计算，回撤区间为所在高点之后首次出现回撤至回撤最深处
+        capital = running_capital[sells]
+        prior_peak = np.maximum.accumulate(np.concatenate([[self.initial_capital], capital]))
+        peak = prior_peak[1:]
+        drawdown = (peak - capital) / peak * 100
         max_drawdown = 0
-        
-        for trade in self.trades:
-            if trade['type'] == '买入':
-                running_capital -= (trade['amount'] + trade['commission'])
-            else:  # 卖出
-                running_capital += (trade['amount'] - trade['commission'])
-                profit = trade['amount'] - trade['commission'] - \
-                        (self.trades[len(profits)]['amount'] + self.trades[len(profits)]['commission'])
-                profits.append(profit > 0)
-                
-                # 更新最大资金和回撤
-                if running_capital > running_max_capital:
-                    running_max_capital = running_capital
-                    current_drawdown = 0
-                    self.current_drawdown_start = None
-                else:
-                    drawdown = (running_max_capital - running_capital) / running_max_capital * 100
-                    if drawdown > current_drawdown:
-                        current_drawdown = drawdown
-                        if self.current_drawdown_start is None:
-                            self.current_drawdown_start = trade['date']
-                    
-                    if current_drawdown > max_drawdown:
-                        max_drawdown = current_drawdown
-                        self.drawdown_start = self.current_drawdown_start
-                        self.drawdown_end = trade['date']
+        if len(drawdown) and drawdown.max() > 0:
+            deepest = int(np.argmax(drawdown))
+            max_drawdown = float(drawdown[deepest])
+            segment = np.cumsum(capital > prior_peak[:-1])
+            first = np.flatnonzero((segment == segment[deepest]) & (drawdown > 0))[0]
+            sell_dates = self.trades.date_labels()[sells]
+            self.drawdown_start = sell_dates[first]
+            self.drawdown_end = sell_dates[deepest]
         
         # 确保回撤的开始时间总是在结束时间之前
         if self.drawdown_start and self.drawdown_end:
@@ -124,8 +193,8 @@ class BaseStrategy:
             if start_date > end_date:
                 self.drawdown_start, self.drawdown_end = self.drawdown_end, self.drawdown_start
 
-        win_rate = (sum(profits) / len(profits) * 100) if profits else 0
-        avg_profit = ((self.capital - self.initial_capital) / len(profits)) if profits else 0
+        win_rate = (profits.sum() / len(profits) * 100) if len(profits) else 0
+        avg_profit = ((self.capital - self.initial_capital) / len(profits)) if len(profits) else 0
 
         return {
             'total_trades': len(profits),
@@ -159,6 +228,104 @@ class BaseStrategy:
         print(f"最大回撤: {perf['max_drawdown']:.2f}%")
         print(f"最大回撤区间: {perf['drawdown_period']}")
 
+    def indicator(self, func, *inputs, **params):
+        """计算指标，设置了特征缓存时优先从缓存读取
+
+        talib只接受双精度输入：单精度行情会先升为float64计算，结果再转回float32。
+        """
+        single = any(isinstance(x, pd.Series) and x.dtype == np.float32 for x in inputs)
+        if single:
+            inputs = tuple(x.astype(np.float64) if isinstance(x, pd.Series) else x for x in inputs)
+
+        if self.feature_cache is None:
+            result = func(*inputs, **params)
+        else:
+            result = self.feature_cache.get_or_compute(func, *inputs, **params)
+
+        if single:
+            if isinstance(result, tuple):
+                return tuple(r.astype(np.float32) for r in result)
+            return result.astype(np.float32)
+        return result
+
+    @staticmethod
+    def baseline(series, window=None):
+        """序列的基准水平（无未来数据）：window为None时取扩展均值，否则取滚动均值"""
+        if window is None:
+            return series.expanding().mean()
+        return series.rolling(window, min_periods=1).mean()
+
+    def indicator_lookbacks(self):
+        """各指标的预热长度列表，子类按calculate_signals中实际计算的指标声明"""
+        return []
+
+    @property
+    def warmup_period(self):
+        """开始评估信号前所需的历史K线数：最长指标预热长度 + 1（信号还需引用前一根K线）"""
+        return max(self.indicator_lookbacks(), default=0) + 1
+
+    def evaluation_start(self, dates, start_date=None):
+        """
+        首个评估信号的K线位置：预热完成且不早于start_date
+
+        Args:
+            dates: 交易日序列（已排序）
+            start_date (str): 回测开始日期，None表示只受预热长度限制
+        """
+        first_bar = max(self.warmup_period, 1)
+        if start_date is not None:
+            first_bar = max(first_bar, int((pd.Series(dates).astype(str) < str(start_date)).sum()))
+        return first_bar
+
+    def compute_raw_signals(self, df):
+        """向量化计算与持仓无关的买卖条件
+
+        子类可用当前列与前移一行的列实现，返回 (entry, exit) 两个布尔数组，
+        且已按generate_signal中的优先级处理：同一根K线只会有一个为True。
+        返回None表示该策略不支持向量化信号。
+        """
+        return None
+
+    def raw_signal_labels(self, df):
+        """将向量化买卖条件转换为逐日信号（'BUY'/'SELL'/'HOLD'），不支持时返回None"""
+        raw = self.compute_raw_signals(df)
+        if raw is None:
+            return None
+        entry, exit_ = raw
+        return np.where(exit_, 'SELL', np.where(entry, 'BUY', 'HOLD'))
+
+    def check_raw_signals(self, df):
+        """
+        校验向量化信号与逐行generate_signal（空仓状态下）的结果一致
+
+        Args:
+            df (pd.DataFrame): calculate_signals的输出
+
+        Returns:
+            np.ndarray: 结果不一致的行号，空数组表示完全一致
+        """
+        labels = self.raw_signal_labels(df)
+        if labels is None:
+            return np.array([], dtype=int)
+        position, entry_price = self.position, self.entry_price
+        self.position, self.entry_price = 0, 0
+        try:
+            reference = ['HOLD'] + [self.generate_signal(df.iloc[i], df.iloc[i - 1])
+                                    for i in range(1, len(df))]
+        finally:
+            self.position, self.entry_price = position, entry_price
+        return np.flatnonzero(labels[1:] != np.asarray(reference[1:], dtype=labels.dtype)) + 1
+
+    @staticmethod
+    def shifted(values):
+        """将数组整体后移一行（首行为NaN），用于向量化引用前一根K线"""
+        values = np.asarray(values)
+        if values.dtype.kind != 'f':
+            values = values.astype(float)
+        out = np.full_like(values, np.nan)
+        out[1:] = values[:-1]
+        return out
+
     def calculate_signals(self, data):
         """计算整个数据集的信号"""
         df = data.copy()
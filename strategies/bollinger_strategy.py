@@ -1,37 +1,82 @@
 import talib
 from strategies.base_strategy import BaseStrategy
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback
+from config.config import BOLLINGER_CONFIG, BOLLINGER_SEARCH_SPACE
 
 class BollingerStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = BOLLINGER_SEARCH_SPACE
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("布林带策略", initial_capital, commission_rate)
-        self.period = 10
-        self.std_dev = 1.5
-        self.stop_loss = 0.015
-        self.profit_target = 0.025
-        self.trend_period = 20
-        self.volume_ma_period = 5
+        config = self.resolve_config(BOLLINGER_CONFIG, params)
+        self.period = config['period']
+        self.std_dev = config['std_dev']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target)
+        self.trend_period = config['trend_period']
+        self.volume_ma_period = config['volume_ma_period']
 
     def calculate_signals(self, data):
         # 计算布林带
-        data['middle'] = talib.SMA(data['close'], self.period)
-        std = talib.STDDEV(data['close'], self.period)
+        data['middle'] = self.indicator(talib.SMA, data['close'], self.period)
+        std = self.indicator(talib.STDDEV, data['close'], self.period)
         data['upper'] = data['middle'] + (std * self.std_dev)
         data['lower'] = data['middle'] - (std * self.std_dev)
         
         # 计算额外指标
-        data['rsi'] = talib.RSI(data['close'], timeperiod=10)
-        data['volume_ma'] = talib.SMA(data['volume'], self.volume_ma_period)
+        data['rsi'] = self.indicator(talib.RSI, data['close'], timeperiod=10)
+        data['volume_ma'] = self.indicator(talib.SMA, data['volume'], self.volume_ma_period)
         data['volume_ratio'] = data['volume'] / data['volume_ma']
-        data['trend_ma'] = talib.EMA(data['close'], self.trend_period)
-        data['macd'], data['macd_signal'], data['macd_hist'] = talib.MACD(
+        data['trend_ma'] = self.indicator(talib.EMA, data['close'], self.trend_period)
+        data['macd'], data['macd_signal'], data['macd_hist'] = self.indicator(talib.MACD,
             data['close'], fastperiod=12, slowperiod=26, signalperiod=9)
-        data['adx'] = talib.ADX(data['high'], data['low'], data['close'], timeperiod=10)
+        data['adx'] = self.indicator(talib.ADX, data['high'], data['low'], data['close'], timeperiod=10)
         
         # 计算布林带宽度和位置
         data['bb_width'] = (data['upper'] - data['lower']) / data['middle']
         data['bb_position'] = (data['close'] - data['lower']) / (data['upper'] - data['lower'])
         return data
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('SMA', timeperiod=self.period),
+            talib_lookback('STDDEV', timeperiod=self.period),
+            talib_lookback('RSI', timeperiod=10),
+            talib_lookback('SMA', timeperiod=self.volume_ma_period),
+            talib_lookback('EMA', timeperiod=self.trend_period),
+            talib_lookback('MACD', fastperiod=12, slowperiod=26, signalperiod=9),
+            talib_lookback('ADX', timeperiod=10),
+        ]
+
+    def compute_raw_signals(self, df):
+        """向量化买卖条件，与空仓时的generate_signal结果一致"""
+        close = df['close'].to_numpy()
+        rsi = df['rsi'].to_numpy()
+        volume_ratio = df['volume_ratio'].to_numpy()
+        hist = df['macd_hist'].to_numpy()
+        prev_hist = self.shifted(hist)
+        bb_width = df['bb_width'].to_numpy()
+        
+        buy = ((close <= df['lower'].to_numpy() * 1.02) &
+               (rsi < 40) &
+               (volume_ratio > 1.1) &
+               (hist > prev_hist) &
+               (df['adx'].to_numpy() > 15) &
+               (bb_width > 0.025))
+        
+        sell = ((close >= df['upper'].to_numpy() * 0.98) &
+                (rsi > 60) &
+                (volume_ratio > 1.1) &
+                (hist < prev_hist) &
+                (bb_width < self.shifted(bb_width)))
+        
+        # 买入优先（generate_signal中卖出为elif分支）
+        return buy, sell & ~buy
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -63,19 +108,8 @@ class BollingerStrategy(BaseStrategy):
               row['bb_width'] < prev_row['bb_width']):
             signal = 'SELL'
             
-        # 动态止损止盈
-        if self.position > 0:
-            current_profit = (row['close'] - self.entry_price) / self.entry_price
-            
-            # 根据盈利情况调整止损点
-            if current_profit > 0.02:
-                stop_loss = max(self.stop_loss, current_profit - 0.015)
-            else:
-                stop_loss = self.stop_loss
-                
-            if current_profit < -stop_loss:
-                signal = 'SELL'
-            elif current_profit > self.profit_target:
-                signal = 'SELL'
+        # 止损止盈
+        if self.position > 0 and self.risk.check(row['close'], self.entry_price):
+            signal = 'SELL'
                 
         return signal 
\ No newline at end of file
@@ -2,45 +2,52 @@ import talib
 import numpy as np
 import pandas as pd
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
-from config.config import BREAKOUT_CONFIG
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback, rolling_lookback, change_lookback
+from config.config import BREAKOUT_CONFIG, BREAKOUT_SEARCH_SPACE
 
 class BreakoutStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = BREAKOUT_SEARCH_SPACE
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("突破策略", initial_capital, commission_rate)
+        config = self.resolve_config(BREAKOUT_CONFIG, params)
         # 从配置文件加载参数
-        self.price_period = BREAKOUT_CONFIG['price_period']
-        self.volume_period = BREAKOUT_CONFIG['volume_period']
-        self.breakout_threshold = BREAKOUT_CONFIG['breakout_threshold']
-        self.volume_threshold = BREAKOUT_CONFIG['volume_threshold']
+        self.price_period = config['price_period']
+        self.volume_period = config['volume_period']
+        self.breakout_threshold = config['breakout_threshold']
+        self.volume_threshold = config['volume_threshold']
         
         # 趋势确认参数
-        self.ma_short = BREAKOUT_CONFIG['ma_short']
-        self.ma_long = BREAKOUT_CONFIG['ma_long']
-        self.rsi_period = BREAKOUT_CONFIG['rsi_period']
+        self.ma_short = config['ma_short']
+        self.ma_long = config['ma_long']
+        self.rsi_period = config['rsi_period']
         
         # MACD参数
-        self.macd_fast = BREAKOUT_CONFIG['macd_fast']
-        self.macd_slow = BREAKOUT_CONFIG['macd_slow']
-        self.macd_signal = BREAKOUT_CONFIG['macd_signal']
+        self.macd_fast = config['macd_fast']
+        self.macd_slow = config['macd_slow']
+        self.macd_signal = config['macd_signal']
         
         # 波动率参数
-        self.volatility_period = BREAKOUT_CONFIG['volatility_period']
-        self.min_volatility = BREAKOUT_CONFIG['min_volatility']
-        self.max_volatility = BREAKOUT_CONFIG['max_volatility']
-        self.atr_period = BREAKOUT_CONFIG['atr_period']
+        self.volatility_period = config['volatility_period']
+        self.min_volatility = config['min_volatility']
+        self.max_volatility = config['max_volatility']
+        self.atr_period = config['atr_period']
         
         # 动量参数
-        self.momentum_period = BREAKOUT_CONFIG['momentum_period']
+        self.momentum_period = config['momentum_period']
         
         # 风控参数
-        self.stop_loss = BREAKOUT_CONFIG['stop_loss']
-        self.profit_target = BREAKOUT_CONFIG['profit_target']
-        self.trailing_stop = BREAKOUT_CONFIG['trailing_stop']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.trailing_stop = config['trailing_stop']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target, self.trailing_stop, trail_from_entry=True)
         
         # 仓位管理参数
-        self.max_position_pct = BREAKOUT_CONFIG['max_position_pct']
-        self.max_volume_pct = BREAKOUT_CONFIG['max_volume_pct']
+        self.max_position_pct = config['max_position_pct']
+        self.max_volume_pct = config['max_volume_pct']
+        self.volume_limit = self.max_volume_pct  # 单笔买入不超过当日成交量的比例
 
     def calculate_signals(self, data):
         df = data.copy()
@@ -54,12 +61,12 @@ class BreakoutStrategy(BaseStrategy):
         df['volume_std'] = df['volume'].rolling(self.volume_period).std()
         
         # 计算趋势指标
-        df['ma_short'] = talib.EMA(df['close'], self.ma_short)
-        df['ma_long'] = talib.EMA(df['close'], self.ma_long)
-        df['rsi'] = talib.RSI(df['close'], timeperiod=self.rsi_period)
+        df['ma_short'] = self.indicator(talib.EMA, df['close'], self.ma_short)
+        df['ma_long'] = self.indicator(talib.EMA, df['close'], self.ma_long)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=self.rsi_period)
         
         # 计算动量指标
-        df['macd'], df['macd_signal'], df['macd_hist'] = talib.MACD(
+        df['macd'], df['macd_signal'], df['macd_hist'] = self.indicator(talib.MACD,
             df['close'], 
             fastperiod=self.macd_fast, 
             slowperiod=self.macd_slow, 
@@ -68,17 +75,33 @@ class BreakoutStrategy(BaseStrategy):
         
         # 计算波动率
         df['volatility'] = df['close'].pct_change().rolling(self.volatility_period).std()
-        df['atr'] = talib.ATR(df['high'], df['low'], df['close'], timeperiod=self.atr_period)
+        df['atr'] = self.indicator(talib.ATR, df['high'], df['low'], df['close'], timeperiod=self.atr_period)
         df['atr_ratio'] = df['atr'] / df['close']
         
         # 计算趋势强度
-        df['adx'] = talib.ADX(df['high'], df['low'], df['close'], timeperiod=10)
+        df['adx'] = self.indicator(talib.ADX, df['high'], df['low'], df['close'], timeperiod=10)
         
         # 计算价格动量
         df['momentum'] = df['close'].pct_change(self.momentum_period)
         
         return df
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            rolling_lookback(self.price_period),
+            rolling_lookback(self.volume_period),
+            talib_lookback('EMA', timeperiod=self.ma_short),
+            talib_lookback('EMA', timeperiod=self.ma_long),
+            talib_lookback('RSI', timeperiod=self.rsi_period),
+            talib_lookback('MACD', fastperiod=self.macd_fast, slowperiod=self.macd_slow,
+                           signalperiod=self.macd_signal),
+            change_lookback() + rolling_lookback(self.volatility_period),
+            talib_lookback('ATR', timeperiod=self.atr_period),
+            talib_lookback('ADX', timeperiod=10),
+            change_lookback(self.momentum_period),
+        ]
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -118,82 +141,19 @@ class BreakoutStrategy(BaseStrategy):
             # 买入条件：只需满足价格突破和任意一个确认条件
             if price_breakout_up and (volume_breakout or trend_confirm) and momentum_good:
                 signal = 'BUY'
-        else:
-            # 动态止损价格计算
-            if hasattr(self, 'highest_price'):
-                trailing_stop_price = self.highest_price * (1 - self.trailing_stop)
-            else:
-                trailing_stop_price = self.entry_price * (1 - self.stop_loss)
-            
-            # 更新最高价
-            if row['close'] > getattr(self, 'highest_price', 0):
-                self.highest_price = row['close']
-            
-            # 止损条件判断
-            stop_loss_triggered = (row['close'] < trailing_stop_price)
-            
-            # 止盈条件判断
-            take_profit = ((row['close'] - self.entry_price) / self.entry_price > self.profit_target)
+        elif self.position > 0:
+            # 止损、追踪止损与止盈判断
+            risk_exit = self.risk.check(row['close'], self.entry_price)
             
             # 趋势反转条件判断
             trend_reversal = price_breakout_down and trend_reverse
             
-            if stop_loss_triggered or take_profit or trend_reversal:
+            if risk_exit or trend_reversal:
                 signal = 'SELL'
-                if hasattr(self, 'highest_price'):
-                    delattr(self, 'highest_price')
+                self.risk.reset()
         
         return signal
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数
-            position_size = min(
-                self.max_position_pct * self.capital / price,  # 使用配置的最大仓位比例
-                volume * self.max_volume_pct  # 使用配置的最大成交量比例
-            )
-            
-            shares = int(position_size)
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    self.highest_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按配置的最大仓位比例计算买入股数"""
+        return int(self.max_position_pct * self.capital / price)
@@ -1,40 +1,51 @@
 import talib
 import numpy as np
+import pandas as pd
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from indicators.lookback import talib_lookback, rolling_lookback, change_lookback
+from config.config import DCA_CONFIG, DCA_SEARCH_SPACE, DCA_SEARCH_CONSTRAINT
 
 class DCAStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = DCA_SEARCH_SPACE
+    search_constraint = DCA_SEARCH_CONSTRAINT
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("定投策略", initial_capital, commission_rate)
+        config = self.resolve_config(DCA_CONFIG, params)
         # 定投参数
-        self.investment_period = 5  # 每5个交易日定投一次
-        self.base_position = 0.1  # 基础仓位比例（10%）
-        self.max_position = 0.8  # 最大仓位比例（80%）
-        self.days_count = 0  # 交易日计数器
+        self.schedule = config['schedule']
+        self.investment_period = config['investment_period']
+        self.schedule_weekday = config['schedule_weekday']
+        self.schedule_day = config['schedule_day']
+        self.schedule_nth = config['schedule_nth']
+        self.base_position = config['base_position']
+        self.max_position = config['max_position']
         
         # 技术指标参数
-        self.ma_short = 5
-        self.ma_long = 20
-        self.rsi_period = 14
-        self.volume_period = 10
+        self.ma_short = config['ma_short']
+        self.ma_long = config['ma_long']
+        self.rsi_period = config['rsi_period']
+        self.volume_period = config['volume_period']
         
         # 止损参数
-        self.stop_loss = 0.1  # 总体止损线（10%）
-        self.position_stop = 0.05  # 单次加仓止损线（5%）
+        self.stop_loss = config['stop_loss']
+        self.position_stop = config['position_stop']
         self._position_size = 0.0  # 用于存储当前交易的仓位大小
+        self.pyramiding = True  # 定投允许持仓时继续买入
 
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算均线
-        df['ma_short'] = talib.EMA(df['close'], self.ma_short)
-        df['ma_long'] = talib.EMA(df['close'], self.ma_long)
+        df['ma_short'] = self.indicator(talib.EMA, df['close'], self.ma_short)
+        df['ma_long'] = self.indicator(talib.EMA, df['close'], self.ma_long)
         
         # 计算RSI
-        df['rsi'] = talib.RSI(df['close'], timeperiod=self.rsi_period)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=self.rsi_period)
         
         # 计算成交量
-        df['volume_ma'] = talib.SMA(df['volume'], self.volume_period)
+        df['volume_ma'] = self.indicator(talib.SMA, df['volume'], self.volume_period)
         df['volume_ratio'] = df['volume'] / df['volume_ma']
         
         # 计算波动率
@@ -44,8 +55,137 @@ class DCAStrategy(BaseStrategy):
         # 计算市场强度
         df['market_strength'] = ((df['close'] - df['ma_long']) / df['ma_long']) * 100
         
+        # 按交易日历预先确定定投日（回测开始时由prepare_run按实际评估起点重新锚定）
+        df['dca_day'] = self.schedule_mask(
+            df['date'], self.schedule, self.investment_period, self.schedule_weekday,
+            self.schedule_day, self.schedule_nth, anchor=max(self.warmup_period, 1))
+        
         return df
 
+    def prepare_run(self, df, first_bar):
+        """定投日历从首个评估K线起算，与向前多取了多少预热数据无关"""
+        df['dca_day'] = self.schedule_mask(
+            df['date'], self.schedule, self.investment_period, self.schedule_weekday,
+            self.schedule_day, self.schedule_nth, anchor=first_bar)
+
+    @staticmethod
+    def schedule_mask(dates, schedule='interval', period=5, weekday=0, day=1, nth=1, anchor=0):
+        """
+        将定投日历解析为交易日上的布尔标记
+
+        Args:
+            dates: 交易日序列（已排序）
+            schedule (str): 'interval' 每period个交易日一次（自anchor位置起算，第period个交易日为首次）；
+                            'weekly' 每周weekday或之后的首个交易日；
+                            'monthly' 每月day日或之后的首个交易日；
+                            'nth_trading_day' 每月第nth个交易日，负数为倒数第|nth|个
+            period (int): interval模式的间隔交易日数
+            weekday (int): weekly模式的星期（0为周一）
+            day (int): monthly模式的日期
+            nth (int): nth_trading_day模式的序号
+            anchor (int): 从该位置起才可定投
+
+        Returns:
+            np.ndarray: 与dates等长的布尔数组
+        """
+        dates = pd.DatetimeIndex(pd.to_datetime(np.asarray(dates)))
+        position = np.arange(len(dates))
+        if schedule == 'interval':
+            mask = (position >= anchor) & ((position - anchor + 1) % period == 0)
+        elif schedule in ('weekly', 'monthly'):
+            if schedule == 'weekly':
+                group = dates.to_period('W').asi8
+                eligible = np.asarray(dates.weekday >= weekday)
+            else:
+                group = dates.to_period('M').asi8
+                eligible = np.asarray(dates.day >= day)
+            # 每组中第一个满足条件的交易日
+            first = pd.Series(eligible).groupby(group).cumsum().to_numpy() == 1
+            mask = eligible & first & (position >= anchor)
+        elif schedule == 'nth_trading_day':
+            month = pd.Series(dates.to_period('M').asi8)
+            if nth > 0:
+                rank = month.groupby(month).cumcount().to_numpy() + 1
+            else:
+                rank = -(month.groupby(month).cumcount(ascending=False).to_numpy() + 1)
+            mask = (rank == nth) & (position >= anchor)
+        else:
+            raise ValueError(f"未知的定投日历: {schedule}")
+        return mask
+
+    @staticmethod
+    def cost_basis(close, mask, amount, commission_rate=0.0):
+        """
+        固定金额定投的逐日累计投入、持有份额与平均成本（累加运算，无逐笔循环）
+
+        close与mask按最后一维（交易日）对齐并可广播，例如 close 为 (F, T) 多只基金、
+        mask 为 (V, 1, T) 多种定投日历时，结果形如 (V, F, T)。按份额计（不取整）。
+
+        Args:
+            close (np.ndarray): 收盘价，最后一维为交易日
+            mask (np.ndarray): 定投日标记，可与close广播
+            amount: 每期投入金额，可与close广播
+            commission_rate (float): 手续费率（从投入金额中扣除）
+
+        Returns:
+            dict: invested（累计投入）、shares（累计份额）、avg_cost（平均成本，未投入时为NaN）、
+                  value（持仓市值）
+        """
+        close = np.asarray(close, dtype=np.float64)
+        # 无行情（停牌）的定投日不投入
+        contribution = np.where(np.asarray(mask, dtype=bool) & (close > 0), amount, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bought = np.where(contribution > 0, contribution * (1 - commission_rate) / close, 0.0)
+        invested = np.cumsum(contribution, axis=-1)
+        shares = np.cumsum(bought, axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_cost = np.where(shares > 0, invested / shares, np.nan)
+        return {
+            'invested': invested,
+            'shares': shares,
+            'avg_cost': avg_cost,
+            'value': shares * close,
+        }
+
+    @staticmethod
+    def evaluate_variants(close, masks, amounts, commission_rate=0.0):
+        """
+        批量评估大量定投方案在多只基金上的期末结果
+
+        期末份额 = Σ_t 投入_t / 价格_t，对全部方案一次矩阵乘法求得，
+        不生成逐日中间数组，适合数千种方案 × 多只基金的横向比较。
+
+        Args:
+            close (np.ndarray): 收盘价 (T, F)
+            masks (np.ndarray): 各方案的定投日标记 (V, T)
+            amounts (np.ndarray): 各方案的每期投入金额 (V,) 或标量
+            commission_rate (float): 手续费率
+
+        Returns:
+            dict: invested（(V, F)累计投入，停牌的定投日不投入）、shares（(V, F)期末份额）、avg_cost（(V, F)平均成本）、
+                  value（(V, F)期末市值）、total_return（(V, F)总收益率）
+        """
+        close = np.asarray(close, dtype=np.float64)
+        masks = np.asarray(masks, dtype=bool)
+        contributions = masks * np.asarray(amounts, dtype=np.float64).reshape(-1, 1)
+        tradable = close > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse = np.where(tradable, 1.0 / close, 0.0)
+        shares = contributions @ inverse * (1 - commission_rate)
+        invested = contributions @ tradable.astype(np.float64)
+        last_price = pd.DataFrame(close).ffill().to_numpy()[-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_cost = np.where(shares > 0, invested / shares, np.nan)
+            value = shares * np.nan_to_num(last_price)
+            total_return = value / invested - 1
+        return {
+            'invested': invested,
+            'shares': shares,
+            'avg_cost': avg_cost,
+            'value': value,
+            'total_return': total_return,
+        }
+
     def calculate_position_size(self, row):
         """计算本次加仓的仓位大小"""
         # 基础定投金额
@@ -74,14 +214,21 @@ class DCAStrategy(BaseStrategy):
             
         return position_size
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('EMA', timeperiod=self.ma_short),
+            talib_lookback('EMA', timeperiod=self.ma_long),
+            talib_lookback('RSI', timeperiod=self.rsi_period),
+            talib_lookback('SMA', timeperiod=self.volume_period),
+            change_lookback() + rolling_lookback(20),
+        ]
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
-        self.days_count += 1
         
         # 检查是否需要定投
-        if self.days_count >= self.investment_period:
-            self.days_count = 0  # 重置计数器
-            
+        if row['dca_day']:
             # 市场条件检查
             market_conditions = (
                 row['volume_ratio'] > 0.8 and  # 成交量正常
@@ -111,57 +258,10 @@ class DCAStrategy(BaseStrategy):
         
         return signal
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY':
-            # 计算可以买入的股数
-            available_capital = self.capital * self._position_size
-            shares = int(available_capital / price)
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position += shares
-                    self.capital -= (cost + commission)
-                    # 更新平均成本
-                    self.entry_price = (self.entry_price * (self.position - shares) + price * shares) / self.position
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            # 确定卖出数量
-            shares = int(self.position * self._position_size)
-            if shares > 0:
-                revenue = shares * price
-                commission = revenue * self.commission_rate
-                
-                self.capital += (revenue - commission)
-                self.position -= shares
-                
-                # 如果全部卖出，重置入场价格
-                if self.position == 0:
-                    self.entry_price = 0
-                
-                trade = {
-                    'date': date,
-                    'type': '卖出',
-                    'price': price,
-                    'shares': shares,
-                    'amount': revenue,
-                    'commission': commission,
-                    'capital': self.capital
-                }
-                self.trades.append(trade)
-                TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按本次定投的资金比例计算买入股数"""
+        return int(self.capital * self._position_size / price)
+
+    def sell_shares(self, price):
+        """按本次止损的持仓比例计算卖出股数"""
+        return int(self.position * self._position_size)
@@ -1,40 +1,88 @@
 import talib
 import numpy as np
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback
 import pandas as pd
+from config.config import DUAL_MA_VOLUME_CONFIG, DUAL_MA_VOLUME_SEARCH_SPACE, DUAL_MA_VOLUME_SEARCH_CONSTRAINT
 
 class DualMAVolumeStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = DUAL_MA_VOLUME_SEARCH_SPACE
+    search_constraint = DUAL_MA_VOLUME_SEARCH_CONSTRAINT
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("双均线量策略", initial_capital, commission_rate)
-        self.fast_period = 3
-        self.slow_period = 10
-        self.volume_period = 7
-        self.stop_loss = 0.02
-        self.profit_target = 0.03
+        config = self.resolve_config(DUAL_MA_VOLUME_CONFIG, params)
+        self.fast_period = config['fast_period']
+        self.slow_period = config['slow_period']
+        self.volume_period = config['volume_period']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target)
+        self.volume_limit = config['volume_limit']
         self._current_row = None
 
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算快慢均线
-        df['fast_ma'] = talib.EMA(df['close'], self.fast_period)
-        df['slow_ma'] = talib.EMA(df['close'], self.slow_period)
+        df['fast_ma'] = self.indicator(talib.EMA, df['close'], self.fast_period)
+        df['slow_ma'] = self.indicator(talib.EMA, df['close'], self.slow_period)
         
         # 计算成交量指标
-        df['volume_ma'] = talib.SMA(df['volume'], self.volume_period)
+        df['volume_ma'] = self.indicator(talib.SMA, df['volume'], self.volume_period)
         df['volume_ratio'] = df['volume'] / df['volume_ma']
         
         # 计算趋势强度和动量
-        df['adx'] = talib.ADX(df['high'], df['low'], df['close'], timeperiod=14)
-        df['roc'] = talib.ROC(df['close'], timeperiod=10)
+        df['adx'] = self.indicator(talib.ADX, df['high'], df['low'], df['close'], timeperiod=14)
+        df['roc'] = self.indicator(talib.ROC, df['close'], timeperiod=10)
         
         # 计算额外的技术指标
-        df['rsi'] = talib.RSI(df['close'], timeperiod=14)
-        df['macd'], df['macd_signal'], df['macd_hist'] = talib.MACD(
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=14)
+        df['macd'], df['macd_signal'], df['macd_hist'] = self.indicator(talib.MACD,
             df['close'], fastperiod=12, slowperiod=26, signalperiod=9)
         return df
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('EMA', timeperiod=self.fast_period),
+            talib_lookback('EMA', timeperiod=self.slow_period),
+            talib_lookback('SMA', timeperiod=self.volume_period),
+            talib_lookback('ADX', timeperiod=14),
+            talib_lookback('ROC', timeperiod=10),
+            talib_lookback('RSI', timeperiod=14),
+            talib_lookback('MACD', fastperiod=12, slowperiod=26, signalperiod=9),
+        ]
+
+    def compute_raw_signals(self, df):
+        """向量化买卖条件，与空仓时的generate_signal结果一致"""
+        fast_ma = df['fast_ma'].to_numpy()
+        slow_ma = df['slow_ma'].to_numpy()
+        prev_fast, prev_slow = self.shifted(fast_ma), self.shifted(slow_ma)
+        volume_ratio = df['volume_ratio'].to_numpy()
+        adx = df['adx'].to_numpy()
+        rsi = df['rsi'].to_numpy()
+        hist = df['macd_hist'].to_numpy()
+        
+        buy = ((prev_fast <= prev_slow) &
+               (fast_ma > slow_ma) &
+               (volume_ratio > 1.1) &
+               (adx > 15) &
+               (df['roc'].to_numpy() > -1) &
+               (rsi < 70) &
+               (hist > self.shifted(hist)))
+        
+        sell = ((prev_fast >= prev_slow) &
+                (fast_ma < slow_ma) &
+                (volume_ratio > 1.1) &
+                (adx > 15) &
+                (rsi > 30))
+        
+        # 买入优先（generate_signal中卖出为elif分支）
+        return buy, sell & ~buy
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -67,60 +115,11 @@ class DualMAVolumeStrategy(BaseStrategy):
             signal = 'SELL'
             
         # 止损止盈
-        if self.position > 0:
-            if row['close'] < self.entry_price * (1 - self.stop_loss):
-                signal = 'SELL'
-            elif row['close'] > self.entry_price * (1 + self.profit_target):
-                signal = 'SELL'
+        if self.position > 0 and self.risk.check(row['close'], self.entry_price):
+            signal = 'SELL'
                 
         return signal
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数
-            available_capital = self.capital
-            max_shares = int(available_capital / (price * (1 + self.commission_rate)))
-            shares = min(max_shares, int(volume * 0.1))  # 限制单次交易量
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按全部可用资金（预留手续费）计算买入股数"""
+        return int(self.capital / (price * (1 + self.commission_rate)))
@@ -1,62 +1,90 @@
+import numpy as np
 import talib
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback
+from config.config import ENHANCED_HYBRID_CONFIG, ENHANCED_HYBRID_SEARCH_SPACE, ENHANCED_HYBRID_SEARCH_CONSTRAINT, ENHANCED_HYBRID_RULE_SPACE
 
 class EnhancedHybridStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = ENHANCED_HYBRID_SEARCH_SPACE
+    search_constraint = ENHANCED_HYBRID_SEARCH_CONSTRAINT
+    # 投票规则的遗传搜索空间
+    rule_space = ENHANCED_HYBRID_RULE_SPACE
+
+    # 可参与投票的买入/卖出条件
+    BUY_CONDITIONS = ('macd', 'rsi', 'ma', 'bb')
+    SELL_CONDITIONS = ('macd', 'rsi', 'ma', 'bb')
+    # 带阈值的条件及其阈值参数名
+    CONDITION_PARAMS = {
+        ('buy', 'rsi'): 'rsi_lower',
+        ('buy', 'bb'): 'bb_buy_band',
+        ('sell', 'rsi'): 'rsi_upper',
+        ('sell', 'bb'): 'bb_sell_band',
+    }
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("增强混合策略", initial_capital, commission_rate)
+        config = self.resolve_config(ENHANCED_HYBRID_CONFIG, params)
         # 降低MACD参数以提高灵敏度
-        self.fast_period = 8  # 原为12
-        self.slow_period = 17  # 原为26
-        self.signal_period = 7  # 原为9
+        self.fast_period = config['fast_period']
+        self.slow_period = config['slow_period']
+        self.signal_period = config['signal_period']
         
         # 调整RSI参数
-        self.rsi_period = 10  # 原为14
-        self.rsi_upper = 75  # 原为70
-        self.rsi_lower = 25  # 原为30
+        self.rsi_period = config['rsi_period']
+        self.rsi_upper = config['rsi_upper']
+        self.rsi_lower = config['rsi_lower']
         
         # 调整均线参数
-        self.ma_short = 5  # 原为10
-        self.ma_long = 15  # 原为20
+        self.ma_short = config['ma_short']
+        self.ma_long = config['ma_long']
         
         # 调整布林带参数
-        self.bb_period = 15  # 原为20
-        self.bb_std = 1.8  # 原为2.0
+        self.bb_period = config['bb_period']
+        self.bb_std = config['bb_std']
         
         # 风控参数
-        self.stop_loss = 0.03  # 3%止损
-        self.profit_target = 0.05  # 5%止盈
-        self.trailing_stop = 0.02  # 2%追踪止损
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.trailing_stop = config['trailing_stop']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target, self.trailing_stop)
+        self.volume_limit = config['volume_limit']
         
         # 参数设置 - 缩短周期以增加交易频率
-        self.short_period = 3
-        self.medium_period = 7
-        self.volume_ma_period = 10
-        self.atr_period = 10
-        self.min_holding_days = 2
+        self.short_period = config['short_period']
+        self.medium_period = config['medium_period']
+        self.volume_ma_period = config['volume_ma_period']
+        self.atr_period = config['atr_period']
+        self.min_holding_days = config['min_holding_days']
         self.last_signal_date = None
         
         # 动态止损参数 - 调整止损设置
-        self.initial_stop_loss = 0.015
+        self.initial_stop_loss = config['initial_stop_loss']
         self.max_profit = 0
         
         # 仓位管理参数 - 更积极的仓位管理
-        self.max_position_size = 0.9
-        self.min_position_size = 0.3
-        self.position_step = 0.15
+        self.max_position_size = config['max_position_size']
+        self.min_position_size = config['min_position_size']
+        self.position_step = config['position_step']
+        
+        # 投票规则
+        self.buy_conditions = tuple(config['buy_conditions'])
+        self.sell_conditions = tuple(config['sell_conditions'])
+        self.buy_votes = config['buy_votes']
+        self.sell_votes = config['sell_votes']
+        self.bb_buy_band = config['bb_buy_band']
+        self.bb_sell_band = config['bb_sell_band']
+        self.volume_confirm_ratio = config['volume_confirm_ratio']
         
         # 当前行数据
         self._current_row = None
 
-    def set_current_row(self, row):
-        """设置当前行数据"""
-        self._current_row = row
-
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算MACD
-        df['macd'], df['macd_signal'], df['macd_hist'] = talib.MACD(
+        df['macd'], df['macd_signal'], df['macd_hist'] = self.indicator(talib.MACD,
             df['close'], 
             fastperiod=self.fast_period, 
             slowperiod=self.slow_period, 
@@ -64,15 +92,15 @@ class EnhancedHybridStrategy(BaseStrategy):
         )
         
         # 计算RSI
-        df['rsi'] = talib.RSI(df['close'], timeperiod=self.rsi_period)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=self.rsi_period)
         
         # 计算均线
-        df['ma_short'] = talib.SMA(df['close'], timeperiod=self.ma_short)
-        df['ma_medium'] = talib.EMA(df['close'], self.medium_period)
-        df['ma_long'] = talib.SMA(df['close'], timeperiod=self.ma_long)
+        df['ma_short'] = self.indicator(talib.SMA, df['close'], timeperiod=self.ma_short)
+        df['ma_medium'] = self.indicator(talib.EMA, df['close'], self.medium_period)
+        df['ma_long'] = self.indicator(talib.SMA, df['close'], timeperiod=self.ma_long)
         
         # 计算布林带
-        df['bb_middle'], df['bb_upper'], df['bb_lower'] = talib.BBANDS(
+        df['bb_middle'], df['bb_upper'], df['bb_lower'] = self.indicator(talib.BBANDS,
             df['close'], 
             timeperiod=self.bb_period,
             nbdevup=self.bb_std,
@@ -80,18 +108,18 @@ class EnhancedHybridStrategy(BaseStrategy):
         )
         
         # 计算成交量指标
-        df['volume_ma'] = talib.SMA(df['volume'], timeperiod=20)
+        df['volume_ma'] = self.indicator(talib.SMA, df['volume'], timeperiod=20)
         df['volume_ratio'] = df['volume'] / df['volume_ma']
         
         # 5. ATR和波动率
-        df['atr'] = talib.ATR(df['high'], df['low'], df['close'], timeperiod=self.atr_period)
+        df['atr'] = self.indicator(talib.ATR, df['high'], df['low'], df['close'], timeperiod=self.atr_period)
         df['volatility'] = df['atr'] / df['close']
         
         # 6. 趋势强度
-        df['adx'] = talib.ADX(df['high'], df['low'], df['close'], timeperiod=14)
+        df['adx'] = self.indicator(talib.ADX, df['high'], df['low'], df['close'], timeperiod=14)
         
         # 7. 动量指标
-        df['momentum'] = talib.MOM(df['close'], timeperiod=10)
+        df['momentum'] = self.indicator(talib.MOM, df['close'], timeperiod=10)
         
         return df
 
@@ -117,6 +145,72 @@ class EnhancedHybridStrategy(BaseStrategy):
         # 确保仓位在允许范围内
         return min(max(position_size, self.min_position_size), self.max_position_size)
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('MACD', fastperiod=self.fast_period, slowperiod=self.slow_period,
+                           signalperiod=self.signal_period),
+            talib_lookback('RSI', timeperiod=self.rsi_period),
+            talib_lookback('SMA', timeperiod=self.ma_short),
+            talib_lookback('EMA', timeperiod=self.medium_period),
+            talib_lookback('SMA', timeperiod=self.ma_long),
+            talib_lookback('BBANDS', timeperiod=self.bb_period),
+            talib_lookback('SMA', timeperiod=20),
+            talib_lookback('ATR', timeperiod=self.atr_period),
+            talib_lookback('ADX', timeperiod=14),
+            talib_lookback('MOM', timeperiod=10),
+        ]
+
+    @staticmethod
+    def condition_mask(df, side, name, threshold=None):
+        """
+        向量化计算单个投票条件（与generate_signal中的逐行判断一致）
+
+        Args:
+            df (pd.DataFrame): calculate_signals的输出
+            side (str): 'buy' 或 'sell'
+            name (str): 条件名称（'macd' / 'rsi' / 'ma' / 'bb'）
+            threshold (float): 带阈值条件的阈值（见CONDITION_PARAMS）
+
+        Returns:
+            np.ndarray: 布尔数组，首行及指标无效处为False
+        """
+        def column(key):
+            return df[key].to_numpy(dtype=float)
+
+        shifted = BaseStrategy.shifted
+        with np.errstate(invalid='ignore'):
+            if name == 'macd':
+                hist, macd, signal = column('macd_hist'), column('macd'), column('macd_signal')
+                prev_hist, prev_macd, prev_signal = shifted(hist), shifted(macd), shifted(signal)
+                if side == 'buy':
+                    return ((prev_hist < 0) & (hist > 0)) | ((macd > signal) & (prev_macd <= prev_signal))
+                return ((prev_hist > 0) & (hist < 0)) | ((macd < signal) & (prev_macd >= prev_signal))
+            if name == 'rsi':
+                rsi = column('rsi')
+                if side == 'buy':
+                    return (rsi < threshold) & (rsi > shifted(rsi))
+                return (rsi > threshold) & (rsi < shifted(rsi))
+            if name == 'ma':
+                close, short, long = column('close'), column('ma_short'), column('ma_long')
+                prev_short, prev_long = shifted(short), shifted(long)
+                if side == 'buy':
+                    return ((close > short) & (short > long)) | ((short > long) & (prev_short <= prev_long))
+                return ((close < short) & (short < long)) | ((short < long) & (prev_short >= prev_long))
+            if name == 'bb':
+                if side == 'buy':
+                    return column('close') < column('bb_lower') * threshold
+                return column('close') > column('bb_upper') * threshold
+        raise ValueError(f"未知的投票条件: {name}")
+
+    @staticmethod
+    def volume_mask(df, ratio=None):
+        """成交量确认：量比高于ratio，ratio为None时全部为True"""
+        if ratio is None:
+            return np.ones(len(df), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            return df['volume_ratio'].to_numpy(dtype=float) > ratio
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -133,10 +227,10 @@ class EnhancedHybridStrategy(BaseStrategy):
                  (row['ma_short'] > row['ma_long'] and prev_row['ma_short'] <= prev_row['ma_long'])
         
         # 4. 布林带支撑
-        bb_buy = row['close'] < (row['bb_lower'] * 1.02)  # 允许价格略高于下轨
+        bb_buy = row['close'] < (row['bb_lower'] * self.bb_buy_band)  # 允许价格略高于下轨
         
         # 5. 成交量确认
-        volume_confirm = row['volume_ratio'] > 0.8  # 降低成交量要求
+        volume_confirm = self.volume_confirm_ratio is None or row['volume_ratio'] > self.volume_confirm_ratio
         
         # 卖出条件：
         # 1. MACD死叉或柱状图转负
@@ -151,87 +245,26 @@ class EnhancedHybridStrategy(BaseStrategy):
                   (row['ma_short'] < row['ma_long'] and prev_row['ma_short'] >= prev_row['ma_long'])
         
         # 4. 布林带压力
-        bb_sell = row['close'] > (row['bb_upper'] * 0.98)  # 允许价格略低于上轨
+        bb_sell = row['close'] > (row['bb_upper'] * self.bb_sell_band)  # 允许价格略低于上轨
         
         if self.position <= 0:
-            # 买入信号需要满足至少2个条件（原为3个）
-            conditions = [macd_buy, rsi_buy, ma_buy, bb_buy]
-            if sum(conditions) >= 2 and volume_confirm:
+            # 买入信号需要满足至少buy_votes个条件（默认2个，原为3个）
+            buy = {'macd': macd_buy, 'rsi': rsi_buy, 'ma': ma_buy, 'bb': bb_buy}
+            if sum(buy[name] for name in self.buy_conditions) >= self.buy_votes and volume_confirm:
                 signal = 'BUY'
         else:
-            # 动态止损价格计算
-            if hasattr(self, 'highest_price'):
-                trailing_stop_price = self.highest_price * (1 - self.trailing_stop)
-            else:
-                trailing_stop_price = self.entry_price * (1 - self.stop_loss)
-            
-            # 更新最高价
-            if row['close'] > getattr(self, 'highest_price', 0):
-                self.highest_price = row['close']
-            
-            # 止损条件判断
-            stop_loss_triggered = (row['close'] < trailing_stop_price)
+            # 止损、追踪止损与止盈判断
+            risk_exit = self.risk.check(row['close'], self.entry_price)
             
-            # 止盈条件判断
-            take_profit = ((row['close'] - self.entry_price) / self.entry_price > self.profit_target)
-            
-            # 卖出信号需要满足至少2个条件（原为3个）或触发止损/止盈
-            conditions = [macd_sell, rsi_sell, ma_sell, bb_sell]
-            if sum(conditions) >= 2 or stop_loss_triggered or take_profit:
+            # 卖出信号需要满足至少sell_votes个条件（默认2个，原为3个）或触发止损/止盈
+            sell = {'macd': macd_sell, 'rsi': rsi_sell, 'ma': ma_sell, 'bb': bb_sell}
+            if sum(sell[name] for name in self.sell_conditions) >= self.sell_votes or risk_exit:
                 signal = 'SELL'
-                if hasattr(self, 'highest_price'):
-                    delattr(self, 'highest_price')
+                self.risk.reset()
         
         return signal
 
-    def execute_trade(self, date, price, signal, volume):
-        """重写执行交易方法，加入动态仓位管理"""
-        if signal == 'BUY' and self.position <= 0:
-            position_size = self.calculate_position_size(self._current_row)
-            available_capital = self.capital
-            max_shares = int((available_capital * position_size) / price)
-            shares = min(max_shares, int(volume * 0.1))
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    self.max_profit = 0
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            self.max_profit = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按动态仓位比例计算买入股数"""
+        position_size = self.calculate_position_size(self._current_row)
+        return int((self.capital * position_size) / price)
@@ -2,50 +2,56 @@ import talib
 import numpy as np
 import pandas as pd
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback, change_lookback
+from config.config import EVENT_DRIVEN_CONFIG, EVENT_DRIVEN_SEARCH_SPACE
 
 class EventDrivenStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = EVENT_DRIVEN_SEARCH_SPACE
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("事件驱动策略", initial_capital, commission_rate)
+        config = self.resolve_config(EVENT_DRIVEN_CONFIG, params)
         # 参数设置
-        self.volume_surge_threshold = 3.0  # 成交量突增阈值
-        self.price_change_threshold = 0.05  # 价格变动阈值
-        self.ma_period = 20
-        self.volatility_period = 20
-        self.rsi_period = 14
-        self.rsi_oversold = 30
-        self.rsi_overbought = 70
-        self.stop_loss = 0.03
-        self.profit_target = 0.05
+        self.volume_surge_threshold = config['volume_surge_threshold']
+        self.price_change_threshold = config['price_change_threshold']
+        self.ma_period = config['ma_period']
+        self.volatility_period = config['volatility_period']
+        self.volatility_baseline_window = config['volatility_baseline_window']
+        self.rsi_period = config['rsi_period']
+        self.rsi_oversold = config['rsi_oversold']
+        self.rsi_overbought = config['rsi_overbought']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target, inclusive=True)
+        self.volume_limit = config['volume_limit']
         self._current_row = None
 
-    def set_current_row(self, row):
-        """设置当前行数据"""
-        self._current_row = row
-
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算价格和成交量的移动平均
-        df['volume_ma'] = talib.SMA(df['volume'], timeperiod=self.ma_period)
-        df['price_ma'] = talib.SMA(df['close'], timeperiod=self.ma_period)
+        df['volume_ma'] = self.indicator(talib.SMA, df['volume'], timeperiod=self.ma_period)
+        df['price_ma'] = self.indicator(talib.SMA, df['close'], timeperiod=self.ma_period)
         
         # 计算成交量比率和价格变动
         df['volume_ratio'] = df['volume'] / df['volume_ma']
         df['price_change'] = df['close'].pct_change()
         
         # 计算波动率
-        df['volatility'] = talib.STDDEV(df['close'], timeperiod=self.volatility_period) / df['price_ma']
+        df['volatility'] = self.indicator(talib.STDDEV, df['close'], timeperiod=self.volatility_period) / df['price_ma']
+        df['volatility_baseline'] = self.baseline(df['volatility'], self.volatility_baseline_window)
         
         # 计算RSI
-        df['rsi'] = talib.RSI(df['close'], timeperiod=self.rsi_period)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=self.rsi_period)
         
         # 计算MACD
-        df['macd'], df['macd_signal'], df['macd_hist'] = talib.MACD(
+        df['macd'], df['macd_signal'], df['macd_hist'] = self.indicator(talib.MACD,
             df['close'], fastperiod=12, slowperiod=26, signalperiod=9)
         
         # 计算布林带
-        df['bb_middle'], df['bb_upper'], df['bb_lower'] = talib.BBANDS(
+        df['bb_middle'], df['bb_upper'], df['bb_lower'] = self.indicator(talib.BBANDS,
             df['close'], timeperiod=20, nbdevup=2, nbdevdn=2)
         
         # 识别价格突破
@@ -53,6 +59,17 @@ class EventDrivenStrategy(BaseStrategy):
         
         return df
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('SMA', timeperiod=self.ma_period),
+            change_lookback(),
+            talib_lookback('STDDEV', timeperiod=self.volatility_period),
+            talib_lookback('RSI', timeperiod=self.rsi_period),
+            talib_lookback('MACD', fastperiod=12, slowperiod=26, signalperiod=9),
+            talib_lookback('BBANDS', timeperiod=20),
+        ]
+
     def generate_signal(self, row, prev_row):
         """生成交易信号"""
         # 检查是否有足够的数据来计算指标
@@ -68,8 +85,7 @@ class EventDrivenStrategy(BaseStrategy):
         
         # 检查是否需要止损或止盈
         if self.position > 0:
-            profit_pct = (current_price - self.entry_price) / self.entry_price
-            if profit_pct <= -self.stop_loss or profit_pct >= self.profit_target:
+            if self.risk.check(current_price, self.entry_price):
                 return 'SELL'
         
         # 生成交易信号
@@ -88,57 +104,11 @@ class EventDrivenStrategy(BaseStrategy):
             return 'BUY'
         elif ((volume_surge and price_change < 0) or \
              rsi > self.rsi_overbought or \
-             (self.position > 0 and volatility > row['volatility'].mean() * 1.2)):  # 降低波动率阈值
+             (self.position > 0 and volatility > row['volatility_baseline'] * 1.2)):  # 波动率高于基准的1.2倍
             return 'SELL'
         
         return 'HOLD'
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数
-            available_capital = self.capital
-            max_shares = int(available_capital / (price * (1 + self.commission_rate)))
-            shares = min(max_shares, int(volume * 0.1))  # 限制单次交易量
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按全部可用资金（预留手续费）计算买入股数"""
+        return int(self.capital / (price * (1 + self.commission_rate)))
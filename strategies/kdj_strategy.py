@@ -1,14 +1,22 @@
 import talib
 from strategies.base_strategy import BaseStrategy
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback, rolling_lookback
+from config.config import KDJ_CONFIG, KDJ_SEARCH_SPACE
 
 class KDJStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = KDJ_SEARCH_SPACE
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("KDJ策略", initial_capital, commission_rate)
-        self.k_period = 5
-        self.stop_loss = 0.015
-        self.profit_target = 0.025
-        self.volume_ma_period = 5
-        self.trend_period = 10
+        config = self.resolve_config(KDJ_CONFIG, params)
+        self.k_period = config['k_period']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target)
+        self.volume_ma_period = config['volume_ma_period']
+        self.trend_period = config['trend_period']
 
     def calculate_signals(self, data):
         high_list = data['high'].rolling(self.k_period).max()
@@ -19,15 +27,59 @@ class KDJStrategy(BaseStrategy):
         data['d'] = data['k'].rolling(2).mean()
         data['j'] = 3 * data['k'] - 2 * data['d']
         
-        data['volume_ma'] = talib.SMA(data['volume'], self.volume_ma_period)
+        data['volume_ma'] = self.indicator(talib.SMA, data['volume'], self.volume_ma_period)
         data['volume_ratio'] = data['volume'] / data['volume_ma']
-        data['trend_ma'] = talib.EMA(data['close'], self.trend_period)
-        data['rsi'] = talib.RSI(data['close'], timeperiod=10)
-        data['adx'] = talib.ADX(data['high'], data['low'], data['close'], timeperiod=10)
-        data['macd'], data['macd_signal'], data['macd_hist'] = talib.MACD(
+        data['trend_ma'] = self.indicator(talib.EMA, data['close'], self.trend_period)
+        data['rsi'] = self.indicator(talib.RSI, data['close'], timeperiod=10)
+        data['adx'] = self.indicator(talib.ADX, data['high'], data['low'], data['close'], timeperiod=10)
+        data['macd'], data['macd_signal'], data['macd_hist'] = self.indicator(talib.MACD,
             data['close'], fastperiod=12, slowperiod=26, signalperiod=9)
         return data
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            # RSV再经两次2日平滑得到K、D
+            rolling_lookback(self.k_period) + rolling_lookback(2) + rolling_lookback(2),
+            talib_lookback('SMA', timeperiod=self.volume_ma_period),
+            talib_lookback('EMA', timeperiod=self.trend_period),
+            talib_lookback('RSI', timeperiod=10),
+            talib_lookback('ADX', timeperiod=10),
+            talib_lookback('MACD', fastperiod=12, slowperiod=26, signalperiod=9),
+        ]
+
+    def compute_raw_signals(self, df):
+        """向量化买卖条件，与空仓时的generate_signal结果一致"""
+        k = df['k'].to_numpy()
+        d = df['d'].to_numpy()
+        j = df['j'].to_numpy()
+        prev_k, prev_d, prev_j = self.shifted(k), self.shifted(d), self.shifted(j)
+        close = df['close'].to_numpy()
+        trend_ma = df['trend_ma'].to_numpy()
+        volume_ratio = df['volume_ratio'].to_numpy()
+        hist = df['macd_hist'].to_numpy()
+        prev_hist = self.shifted(hist)
+        
+        k_cross_buy = (prev_k < prev_d) & (k > d)
+        j_cross_buy = (prev_j < prev_k) & (j > k) & (j < 20)
+        buy = ((k_cross_buy | j_cross_buy) &
+               (k < 40) &
+               (close > trend_ma * 0.98) &
+               (volume_ratio > 1.1) &
+               (df['adx'].to_numpy() > 15) &
+               (hist > prev_hist))
+        
+        k_cross_sell = (prev_k > prev_d) & (k < d)
+        j_cross_sell = (prev_j > prev_k) & (j < k) & (j > 80)
+        sell = ((k_cross_sell | j_cross_sell) &
+                (k > 60) &
+                (close < trend_ma) &
+                (volume_ratio > 1.1) &
+                (hist < prev_hist))
+        
+        # 卖出条件后判断，同时成立时以卖出为准
+        return buy & ~sell, sell
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -50,17 +102,8 @@ class KDJStrategy(BaseStrategy):
             row['macd_hist'] < prev_row['macd_hist']):
             signal = 'SELL'
             
-        if self.position > 0:
-            current_profit = (row['close'] - self.entry_price) / self.entry_price
-            
-            if current_profit > 0.02:
-                stop_loss = max(self.stop_loss, current_profit - 0.015)
-            else:
-                stop_loss = self.stop_loss
-                
-            if current_profit < -stop_loss:
-                signal = 'SELL'
-            elif current_profit > self.profit_target:
-                signal = 'SELL'
+        # 止损止盈
+        if self.position > 0 and self.risk.check(row['close'], self.entry_price):
+            signal = 'SELL'
                 
         return signal 
\ No newline at end of file
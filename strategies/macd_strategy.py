@@ -1,27 +1,65 @@
 import talib
 from strategies.base_strategy import BaseStrategy
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback
+from config.config import MACD_CONFIG, MACD_SEARCH_SPACE, MACD_SEARCH_CONSTRAINT
 
 class MACDStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = MACD_SEARCH_SPACE
+    search_constraint = MACD_SEARCH_CONSTRAINT
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("MACD策略", initial_capital, commission_rate)
-        self.fast = 6
-        self.slow = 13
-        self.signal = 5
-        self.stop_loss = 0.015
-        self.profit_target = 0.025
-        self.volume_ma_period = 5
+        config = self.resolve_config(MACD_CONFIG, params)
+        self.fast = config['fast']
+        self.slow = config['slow']
+        self.signal = config['signal']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target)
+        self.volume_ma_period = config['volume_ma_period']
 
     def calculate_signals(self, data):
-        data['macd'], data['macd_signal'], data['macd_hist'] = talib.MACD(
+        data['macd'], data['macd_signal'], data['macd_hist'] = self.indicator(talib.MACD,
             data['close'], fastperiod=self.fast, slowperiod=self.slow, signalperiod=self.signal)
-        data['volume_ma'] = talib.SMA(data['volume'], self.volume_ma_period)
+        data['volume_ma'] = self.indicator(talib.SMA, data['volume'], self.volume_ma_period)
         data['volume_ratio'] = data['volume'] / data['volume_ma']
-        data['rsi'] = talib.RSI(data['close'], timeperiod=10)
-        data['adx'] = talib.ADX(data['high'], data['low'], data['close'], timeperiod=10)
-        data['ema5'] = talib.EMA(data['close'], timeperiod=5)
-        data['ema10'] = talib.EMA(data['close'], timeperiod=10)
+        data['rsi'] = self.indicator(talib.RSI, data['close'], timeperiod=10)
+        data['adx'] = self.indicator(talib.ADX, data['high'], data['low'], data['close'], timeperiod=10)
+        data['ema5'] = self.indicator(talib.EMA, data['close'], timeperiod=5)
+        data['ema10'] = self.indicator(talib.EMA, data['close'], timeperiod=10)
         return data
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('MACD', fastperiod=self.fast, slowperiod=self.slow, signalperiod=self.signal),
+            talib_lookback('SMA', timeperiod=self.volume_ma_period),
+            talib_lookback('RSI', timeperiod=10),
+            talib_lookback('ADX', timeperiod=10),
+            talib_lookback('EMA', timeperiod=10),
+        ]
+
+    def compute_raw_signals(self, df):
+        """向量化买卖条件，与空仓时的generate_signal结果一致"""
+        hist = df['macd_hist'].to_numpy()
+        prev_hist = self.shifted(hist)
+        volume_ratio = df['volume_ratio'].to_numpy()
+        rsi = df['rsi'].to_numpy()
+        ema5 = df['ema5'].to_numpy()
+        ema10 = df['ema10'].to_numpy()
+        
+        macd_buy = ((prev_hist < 0) & (hist > 0)) | (hist > prev_hist * 1.05)
+        buy = (macd_buy & (volume_ratio > 1.1) & (rsi < 65) &
+               (df['adx'].to_numpy() > 15) & (ema5 > ema10))
+        
+        macd_sell = ((prev_hist > 0) & (hist < 0)) | (hist < prev_hist * 0.95)
+        sell = macd_sell & (volume_ratio > 1.1) & (rsi > 35) & (ema5 < ema10)
+        
+        # 卖出条件后判断，同时成立时以卖出为准
+        return buy & ~sell, sell
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -44,17 +82,8 @@ class MACDStrategy(BaseStrategy):
         if macd_sell and volume_sell and rsi_sell and trend_sell:
             signal = 'SELL'
             
-        if self.position > 0:
-            current_profit = (row['close'] - self.entry_price) / self.entry_price
-            
-            if current_profit > 0.02:
-                stop_loss = max(self.stop_loss, current_profit - 0.015)
-            else:
-                stop_loss = self.stop_loss
-                
-            if current_profit < -stop_loss:
-                signal = 'SELL'
-            elif current_profit > self.profit_target:
-                signal = 'SELL'
+        # 止损止盈
+        if self.position > 0 and self.risk.check(row['close'], self.entry_price):
+            signal = 'SELL'
                 
         return signal 
\ No newline at end of file
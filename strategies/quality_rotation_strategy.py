@@ -2,71 +2,207 @@ import talib
 import numpy as np
 import pandas as pd
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from strategies.risk_overlay import RiskOverlay
+from backtest.portfolio import PortfolioBacktester
+from indicators.lookback import talib_lookback, rolling_lookback, change_lookback
+from indicators.panel_indicators import PanelIndicators
+from config.config import QUALITY_ROTATION_CONFIG, QUALITY_ROTATION_SEARCH_SPACE
 
 class QualityRotationStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = QUALITY_ROTATION_SEARCH_SPACE
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("质量轮动策略", initial_capital, commission_rate)
+        config = self.resolve_config(QUALITY_ROTATION_CONFIG, params)
         # 参数设置
-        self.ma_period = 20
-        self.momentum_period = 60
-        self.volatility_period = 20
-        self.quality_threshold = 0.7  # 质量分数阈值
-        self.momentum_threshold = 0.02  # 动量阈值
-        self.stop_loss = 0.03
-        self.profit_target = 0.05
+        self.ma_period = config['ma_period']
+        self.momentum_period = config['momentum_period']
+        self.volatility_period = config['volatility_period']
+        self.quality_threshold = config['quality_threshold']
+        self.momentum_threshold = config['momentum_threshold']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target, inclusive=True)
+        self.volume_limit = config['volume_limit']
         self._current_row = None
-
-    def set_current_row(self, row):
-        """设置当前行数据"""
-        self._current_row = row
+        
+        # 横截面轮动参数（run_rotation使用）
+        self.top_n = config['top_n']
+        self.rebalance_period = config['rebalance_period']
+        self.max_turnover = config['max_turnover']
 
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算移动平均
-        df['ma'] = talib.SMA(df['close'], timeperiod=self.ma_period)
+        df['ma'] = self.indicator(talib.SMA, df['close'], timeperiod=self.ma_period)
         
         # 计算动量指标
         df['momentum'] = df['close'].pct_change(self.momentum_period)
-        df['momentum_ma'] = talib.SMA(df['momentum'], timeperiod=self.ma_period)
+        df['momentum_ma'] = self.indicator(talib.SMA, df['momentum'], timeperiod=self.ma_period)
         
         # 计算波动率
-        df['volatility'] = talib.STDDEV(df['close'], timeperiod=self.volatility_period) / df['ma']
+        df['volatility'] = self.indicator(talib.STDDEV, df['close'], timeperiod=self.volatility_period) / df['ma']
         
         # 计算ROC（变动率）
-        df['roc'] = talib.ROC(df['close'], timeperiod=self.momentum_period)
+        df['roc'] = self.indicator(talib.ROC, df['close'], timeperiod=self.momentum_period)
         
         # 计算RSI
-        df['rsi'] = talib.RSI(df['close'], timeperiod=14)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=14)
         
         # 计算质量分数
         df['quality_score'] = self._calculate_quality_score(df)
         
         # 计算趋势强度
-        df['adx'] = talib.ADX(df['high'], df['low'], df['close'], timeperiod=14)
+        df['adx'] = self.indicator(talib.ADX, df['high'], df['low'], df['close'], timeperiod=14)
         
         return df
 
     def _calculate_quality_score(self, df):
         """计算质量分数"""
+        volatility_max = df['volatility'].rolling(window=self.volatility_period).max()
+        return self._combine_quality_score(df['close'], df['ma'], df['momentum'],
+                                           df['volatility'], volatility_max, df['rsi'])
+
+    @staticmethod
+    def _combine_quality_score(close, ma, momentum, volatility, volatility_max, rsi):
+        """由各分项指标合成质量分数，输入可以是Series或(T, N)数组"""
         # 1. 趋势质量
-        trend_quality = (df['close'] > df['ma']).astype(float)
+        trend_quality = (close > ma).astype(float)
         
         # 2. 动量质量
-        momentum_quality = (df['momentum'] > 0).astype(float)
+        momentum_quality = (momentum > 0).astype(float)
         
         # 3. 波动率质量（波动率越低越好）
-        volatility_quality = 1 - (df['volatility'] / df['volatility'].rolling(window=self.volatility_period).max())
+        volatility_quality = 1 - (volatility / volatility_max)
         
         # 4. RSI质量（避免过度超买超卖）
-        rsi_quality = 1 - abs(df['rsi'] - 50) / 50
+        rsi_quality = 1 - abs(rsi - 50) / 50
         
         # 综合质量分数
         quality_score = (trend_quality + momentum_quality + volatility_quality + rsi_quality) / 4
         
         return quality_score
 
+    def panel_quality_scores(self, panel):
+        """
+        对面板中全部股票向量化计算质量分数
+
+        Args:
+            panel (StockPanel): 日期 × 股票的行情面板
+
+        Returns:
+            tuple: (质量分数, 可入选标记)，均为 (T, N) 数组；可入选要求得分高于阈值、
+                   动量高于动量阈值且价格在均线上方（与单股票模式的买入条件一致，不含ADX过滤）
+        """
+        close = np.asarray(panel['close'], dtype=np.float64)
+        ma = PanelIndicators.sma(close, self.ma_period)
+        
+        momentum = np.full(close.shape, np.nan)
+        momentum[self.momentum_period:] = close[self.momentum_period:] / close[:-self.momentum_period] - 1
+        
+        volatility = PanelIndicators.rolling_std(close, self.volatility_period) / ma
+        volatility_max = PanelIndicators.rolling_max(volatility, self.volatility_period)
+        rsi = PanelIndicators.rsi(close, 14)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = self._combine_quality_score(close, ma, momentum, volatility, volatility_max, rsi)
+            eligible = ((scores > self.quality_threshold) &
+                        (momentum > self.momentum_threshold) &
+                        (close > ma))
+        return scores, eligible
+
+    def _select_holdings(self, held, scores, eligible, tradable):
+        """
+        单个调仓日的选股：目标为可入选股票中得分最高的top_n只，
+        受max_turnover限制时优先卖出得分最低（或已不可入选）的持仓
+
+        Returns:
+            np.ndarray: 调仓后的持仓标记
+        """
+        ranked = np.where(eligible, scores, -np.inf)
+        candidates = np.flatnonzero(eligible & tradable)
+        if len(candidates) > self.top_n:
+            top = candidates[np.argpartition(-ranked[candidates], self.top_n - 1)[:self.top_n]]
+        else:
+            top = candidates
+        target = np.zeros(len(held), dtype=bool)
+        target[top] = True
+        
+        to_sell = np.flatnonzero(held & ~target & tradable)
+        if self.max_turnover is not None and held.any():
+            limit = max(1, int(round(self.max_turnover * self.top_n)))
+            if len(to_sell) > limit:
+                to_sell = to_sell[np.argsort(ranked[to_sell], kind='stable')[:limit]]
+        
+        new_held = held.copy()
+        new_held[to_sell] = False
+        slots = self.top_n - int(new_held.sum())
+        to_buy = np.flatnonzero(target & ~held)
+        if slots <= 0:
+            return new_held
+        if len(to_buy) > slots:
+            to_buy = to_buy[np.argsort(-ranked[to_buy], kind='stable')[:slots]]
+        new_held[to_buy] = True
+        return new_held
+
+    def run_rotation(self, panel, start_index=None):
+        """
+        横截面轮动回测：每rebalance_period个交易日对全部股票打分，
+        等权持有得分最高的top_n只（每只目标仓位为总权益的1/top_n），
+        两次调仓之间持股不变。成交与估值由PortfolioBacktester批量完成。
+
+        Args:
+            panel (StockPanel): 日期 × 股票的行情面板
+            start_index (int): 首个调仓日的位置，默认为指标预热完成处
+
+        Returns:
+            dict: dates（交易日）、equity（逐日权益）、rebalance_index（调仓日位置）、
+                  holdings（各调仓日后的持仓标记，(R, N)）、positions（各调仓日后的持股数，(R, N)）、
+                  turnover（各调仓日成交额/权益）、commission（手续费合计）
+        """
+        close = np.asarray(panel['close'], dtype=np.float64)
+        volume = np.asarray(panel['volume'], dtype=np.float64) if 'volume' in panel else None
+        scores, eligible = self.panel_quality_scores(panel)
+        tradable = ~np.isnan(close)
+        
+        if start_index is None:
+            start_index = self.warmup_period
+        rebalance_index = np.arange(start_index, close.shape[0], self.rebalance_period)
+        
+        def target_weights(k, t, positions):
+            held = self._select_holdings(positions > 0, scores[t], eligible[t], tradable[t])
+            return np.where(held, 1.0 / self.top_n, 0.0)
+        
+        result = PortfolioBacktester.run(close, rebalance_index, target_weights,
+                                         self.initial_capital, self.commission_rate,
+                                         volume, self.volume_limit)
+        self.equity_curve = result['equity']
+        return {
+            'dates': panel.dates,
+            'equity': result['equity'],
+            'rebalance_index': rebalance_index,
+            'holdings': result['positions'] > 0,
+            'positions': result['positions'],
+            'turnover': result['turnover'],
+            'commission': result['commission'],
+        }
+
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        volatility = max(talib_lookback('STDDEV', timeperiod=self.volatility_period),
+                         talib_lookback('SMA', timeperiod=self.ma_period))
+        return [
+            talib_lookback('SMA', timeperiod=self.ma_period),
+            change_lookback(self.momentum_period) + talib_lookback('SMA', timeperiod=self.ma_period),
+            # 质量分数中波动率还要取滚动最大值
+            volatility + rolling_lookback(self.volatility_period),
+            talib_lookback('ROC', timeperiod=self.momentum_period),
+            talib_lookback('RSI', timeperiod=14),
+            talib_lookback('ADX', timeperiod=14),
+        ]
+
     def generate_signal(self, row, prev_row):
         """生成交易信号"""
         # 检查是否有足够的数据来计算指标
@@ -80,8 +216,7 @@ class QualityRotationStrategy(BaseStrategy):
         
         # 检查是否需要止损或止盈
         if self.position > 0:
-            profit_pct = (current_price - self.entry_price) / self.entry_price
-            if profit_pct <= -self.stop_loss or profit_pct >= self.profit_target:
+            if self.risk.check(current_price, self.entry_price):
                 return 'SELL'
         
         # 生成交易信号
@@ -97,52 +232,6 @@ class QualityRotationStrategy(BaseStrategy):
         
         return 'HOLD'
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数
-            available_capital = self.capital
-            max_shares = int(available_capital / (price * (1 + self.commission_rate)))
-            shares = min(max_shares, int(volume * 0.1))  # 限制单次交易量
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按全部可用资金（预留手续费）计算买入股数"""
+        return int(self.capital / (price * (1 + self.commission_rate)))
@@ -0,0 +1,76 @@
+import importlib
+
+# 策略注册表：名称 -> (模块路径, 类名)，按回测报告中的默认顺序排列。
+# 只记录位置而不导入模块，选中某个策略时才导入对应模块。
+_REGISTRY = {}
+
+
+def register(name, module, class_name):
+    """
+    注册策略
+
+    Args:
+        name (str): 策略名称（命令行中使用，如 'macd'）
+        module (str): 策略类所在模块（如 'strategies.macd_strategy'）
+        class_name (str): 策略类名
+    """
+    _REGISTRY[name] = (module, class_name)
+
+
+register('enhanced_hybrid', 'strategies.enhanced_hybrid_strategy', 'EnhancedHybridStrategy')
+register('macd', 'strategies.macd_strategy', 'MACDStrategy')
+register('kdj', 'strategies.kdj_strategy', 'KDJStrategy')
+register('bollinger', 'strategies.bollinger_strategy', 'BollingerStrategy')
+register('dual_ma_volume', 'strategies.dual_ma_volume_strategy', 'DualMAVolumeStrategy')
+register('mean_reversion', 'strategies.mean_reversion_strategy', 'MeanReversionStrategy')
+register('trend_following', 'strategies.trend_following_strategy', 'TrendFollowingStrategy')
+register('volume_based', 'strategies.volume_based_strategy', 'VolumeBasedStrategy')
+register('statistical_arbitrage', 'strategies.statistical_arbitrage_strategy', 'StatisticalArbitrageStrategy')
+register('event_driven', 'strategies.event_driven_strategy', 'EventDrivenStrategy')
+register('quality_rotation', 'strategies.quality_rotation_strategy', 'QualityRotationStrategy')
+register('risk_parity', 'strategies.risk_parity_strategy', 'RiskParityStrategy')
+register('dca', 'strategies.dca_strategy', 'DCAStrategy')
+register('swing', 'strategies.swing_strategy', 'SwingStrategy')
+register('breakout', 'strategies.breakout_strategy', 'BreakoutStrategy')
+
+
+def available():
+    """全部已注册的策略名称（按注册顺序）"""
+    return list(_REGISTRY)
+
+
+def resolve(name):
+    """
+    将策略名称或类名解析为注册名称
+
+    Raises:
+        ValueError: 未注册的策略
+    """
+    if name in _REGISTRY:
+        return name
+    for key, (_, class_name) in _REGISTRY.items():
+        if class_name == name:
+            return key
+    raise ValueError(f"未知的策略: {name}（可选: {', '.join(_REGISTRY)}）")
+
+
+def load(name):
+    """导入并返回策略类（首次选中时才导入模块）"""
+    module, class_name = _REGISTRY[resolve(name)]
+    return getattr(importlib.import_module(module), class_name)
+
+
+def select(include=None, exclude=None):
+    """
+    按名称选择策略
+
+    Args:
+        include (list): 要运行的策略名称，None表示全部
+        exclude (list): 要排除的策略名称
+
+    Returns:
+        list: 注册名称列表（保持注册顺序）
+    """
+    chosen = set(resolve(name) for name in include) if include else set(_REGISTRY)
+    chosen -= set(resolve(name) for name in (exclude or []))
+    return [name for name in _REGISTRY if name in chosen]
@@ -0,0 +1,268 @@
+import numpy as np
+
+# 退出原因编码（scan返回的数组使用）
+EXIT_NONE = 0
+EXIT_SIGNAL = 1
+EXIT_STOP_LOSS = 2
+EXIT_TRAILING_STOP = 3
+EXIT_PROFIT_TARGET = 4
+EXIT_END = 5
+
+EXIT_REASONS = {
+    EXIT_SIGNAL: 'signal',
+    EXIT_STOP_LOSS: 'stop_loss',
+    EXIT_TRAILING_STOP: 'trailing_stop',
+    EXIT_PROFIT_TARGET: 'profit_target',
+    EXIT_END: 'end',
+}
+
+
+class RiskOverlay:
+    """统一的止损、止盈与追踪止损规则
+
+    策略只需声明参数，逐K线判断使用 check，整段价格序列的批量评估使用 scan，
+    多组候选信号一起评估使用 scan_batch。
+
+    规则（以入场价 entry 计）：
+    - 止损：价格低于 entry * (1 - stop_loss)
+    - 止盈：收益率 (价格 - entry) / entry 高于 profit_target
+    - 追踪止损：持仓期出现过最高价 highest 后，止损价改为 highest * (1 - trailing_stop)；
+      highest 只包含此前的K线，当根K线的价格在判断之后才计入
+    - trail_from_entry 为True时 highest 从入场价起算，否则首根K线仍按固定止损判断
+    - inclusive 为True时触及阈值即触发（<= / >=），否则需越过阈值（< / >）
+    - intrabar 为True且提供了最高价/最低价时，止损按最低价、止盈与最高价追踪按最高价判断，
+      同一根K线两者同时满足时按止损处理
+    """
+
+    def __init__(self, stop_loss=None, profit_target=None, trailing_stop=None,
+                 trail_from_entry=False, inclusive=False, intrabar=False):
+        self.stop_loss = stop_loss
+        self.profit_target = profit_target
+        self.trailing_stop = trailing_stop
+        self.trail_from_entry = trail_from_entry
+        self.inclusive = inclusive
+        self.intrabar = intrabar
+        self.reset()
+
+    def reset(self):
+        """清除持仓状态（平仓后调用）"""
+        self.active = False
+        self.highest_price = None
+
+    def start(self, entry_price):
+        """开始跟踪一笔新持仓"""
+        self.active = True
+        self.highest_price = entry_price if (self.trailing_stop is not None and self.trail_from_entry) else None
+
+    def _below(self, price, level):
+        return price <= level if self.inclusive else price < level
+
+    def _above(self, value, level):
+        return value >= level if self.inclusive else value > level
+
+    def check(self, close, entry_price, high=None, low=None):
+        """
+        逐K线判断持仓是否触发风控退出（首次调用时自动开始跟踪）
+
+        Args:
+            close (float): 当根K线收盘价
+            entry_price (float): 持仓入场价
+            high (float): 当根K线最高价（intrabar模式使用）
+            low (float): 当根K线最低价（intrabar模式使用）
+
+        Returns:
+            str: 触发的退出原因（'stop_loss' / 'trailing_stop' / 'profit_target'），未触发返回None
+        """
+        if not self.active:
+            self.start(entry_price)
+
+        up = high if (self.intrabar and high is not None) else close
+        down = low if (self.intrabar and low is not None) else close
+
+        reason = None
+        if self.highest_price is not None:
+            if self._below(down, self.highest_price * (1 - self.trailing_stop)):
+                reason = 'trailing_stop'
+        elif self.stop_loss is not None and self._below(down, entry_price * (1 - self.stop_loss)):
+            reason = 'stop_loss'
+
+        if self.trailing_stop is not None and up > (self.highest_price or 0):
+            self.highest_price = up
+
+        if reason is None and self.profit_target is not None and \
+           self._above((up - entry_price) / entry_price, self.profit_target):
+            reason = 'profit_target'
+        return reason
+
+    def exit_codes(self, entry_price, close, high=None, low=None):
+        """
+        向量化计算一笔持仓在后续各K线上的风控触发情况
+
+        Args:
+            entry_price (float): 入场价
+            close (np.ndarray): 入场后各K线收盘价（不含入场当根）
+            high, low (np.ndarray): 对应的最高价/最低价（intrabar模式使用）
+
+        Returns:
+            np.ndarray: 各K线的退出原因编码，未触发为EXIT_NONE
+        """
+        close = np.asarray(close, dtype=float)
+        up = np.asarray(high, dtype=float) if (self.intrabar and high is not None) else close
+        down = np.asarray(low, dtype=float) if (self.intrabar and low is not None) else close
+        codes = np.zeros(len(close), dtype=np.int8)
+        if len(close) == 0:
+            return codes
+
+        with np.errstate(invalid='ignore'):
+            stop_level = np.full(len(close), np.nan)
+            trailing = np.zeros(len(close), dtype=bool)
+            if self.stop_loss is not None:
+                stop_level[:] = entry_price * (1 - self.stop_loss)
+            if self.trailing_stop is not None:
+                # 此前K线的最高价（不含当根）
+                highest = np.empty(len(close))
+                highest[0] = np.nan
+                highest[1:] = np.fmax.accumulate(up[:-1])
+                if self.trail_from_entry:
+                    highest = np.fmax(highest, entry_price)
+                trailing = ~np.isnan(highest)
+                stop_level = np.where(trailing, highest * (1 - self.trailing_stop), stop_level)
+
+            stop_hit = self._below(down, stop_level)
+            codes[stop_hit] = EXIT_STOP_LOSS
+            codes[stop_hit & trailing] = EXIT_TRAILING_STOP
+            if self.profit_target is not None:
+                target_hit = self._above((up - entry_price) / entry_price, self.profit_target)
+                codes[target_hit & ~stop_hit] = EXIT_PROFIT_TARGET
+        return codes
+
+    def scan(self, entries, exits, close, high=None, low=None, start=0):
+        """
+        按入场/出场信号与风控规则模拟单一多头持仓的完整路径
+
+        空仓时在entries为True的K线以收盘价入场；持仓后从下一根K线起，
+        风控触发或exits为True时离场，离场当根不再入场。最后一根K线仍持仓则强制平仓。
+        每笔持仓的风控判断整段向量化，循环只按交易次数进行。
+
+        Args:
+            entries (np.ndarray): 入场信号布尔数组
+            exits (np.ndarray): 策略自身的出场信号布尔数组
+            close (np.ndarray): 收盘价
+            high, low (np.ndarray): 最高价/最低价（intrabar模式使用）
+            start (int): 开始评估的K线位置
+
+        Returns:
+            tuple: (入场位置, 离场位置, 离场原因编码) 三个等长数组
+        """
+        entries = np.asarray(entries, dtype=bool)
+        exits = np.asarray(exits, dtype=bool)
+        close = np.asarray(close, dtype=float)
+        high = None if high is None else np.asarray(high, dtype=float)
+        low = None if low is None else np.asarray(low, dtype=float)
+        n = len(close)
+
+        candidates = np.flatnonzero(entries[:n])
+        entry_idx, exit_idx, reasons = [], [], []
+        t = start
+        while t < n:
+            k = np.searchsorted(candidates, t)
+            if k >= len(candidates):
+                break
+            e = int(candidates[k])
+            if e >= n - 1:
+                break
+
+            seg = slice(e + 1, n)
+            codes = self.exit_codes(close[e], close[seg],
+                                    None if high is None else high[seg],
+                                    None if low is None else low[seg])
+            codes = np.where((codes == EXIT_NONE) & exits[seg], EXIT_SIGNAL, codes)
+            hit = np.flatnonzero(codes)
+            if len(hit):
+                x, reason = e + 1 + int(hit[0]), int(codes[hit[0]])
+            else:
+                x, reason = n - 1, EXIT_END
+
+            entry_idx.append(e)
+            exit_idx.append(x)
+            reasons.append(reason)
+            t = x + 1
+
+        return (np.asarray(entry_idx, dtype=np.int64),
+                np.asarray(exit_idx, dtype=np.int64),
+                np.asarray(reasons, dtype=np.int8))
+
+    def scan_batch(self, entries, exits, close, stop_loss=None, profit_target=None, trailing_stop=None,
+                   high=None, low=None, start=0):
+        """
+        多组信号（及各自的风控参数）同时按scan的规则模拟，返回各组的交易次数与复利净值
+
+        逐K线循环一次，各组的持仓状态以数组并行更新，适合数千组候选规则一起评估。
+        各组风控参数为None时沿用本实例的参数，数组中的NaN表示该组不启用对应规则；
+        inclusive、intrabar、trail_from_entry沿用本实例设置。
+
+        Args:
+            entries, exits (np.ndarray): (组数, K线数) 的入场/出场信号布尔数组
+            close (np.ndarray): 收盘价
+            stop_loss, profit_target, trailing_stop (np.ndarray): 各组的风控参数
+            high, low (np.ndarray): 最高价/最低价（intrabar模式使用）
+            start (int): 开始评估的K线位置
+
+        Returns:
+            tuple: (各组交易次数, 各组按收盘价成交的复利净值 ∏ 离场价/入场价)
+        """
+        entries = np.asarray(entries, dtype=bool)
+        exits = np.asarray(exits, dtype=bool)
+        close = np.asarray(close, dtype=float)
+        up = np.asarray(high, dtype=float) if (self.intrabar and high is not None) else close
+        down = np.asarray(low, dtype=float) if (self.intrabar and low is not None) else close
+        n_groups, n = entries.shape
+
+        def per_group(values, default):
+            if values is None:
+                values = np.nan if default is None else default
+            return np.broadcast_to(np.asarray(values, dtype=float), (n_groups,))
+
+        stop_loss = per_group(stop_loss, self.stop_loss)
+        profit_target = per_group(profit_target, self.profit_target)
+        trailing_stop = per_group(trailing_stop, self.trailing_stop)
+        has_trailing = ~np.isnan(trailing_stop)
+
+        # 按K线取各组信号时访问连续内存
+        entries = np.ascontiguousarray(entries.T)
+        exits = np.ascontiguousarray(exits.T)
+        holding = np.zeros(n_groups, dtype=bool)
+        entry_price = np.zeros(n_groups)
+        highest = np.full(n_groups, np.nan)
+        trades = np.zeros(n_groups, dtype=np.int64)
+        growth = np.ones(n_groups)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for t in range(start, n):
+                exiting = np.zeros(n_groups, dtype=bool)
+                if holding.any():
+                    level = np.where(np.isnan(highest), entry_price * (1 - stop_loss),
+                                     highest * (1 - trailing_stop))
+                    stop_hit = self._below(down[t], level)
+                    highest = np.where(has_trailing, np.fmax(highest, up[t]), np.nan)
+                    target_hit = self._above((up[t] - entry_price) / entry_price, profit_target)
+                    exiting = holding & (stop_hit | target_hit | exits[t] | (t == n - 1))
+                    growth[exiting] *= close[t] / entry_price[exiting]
+                    trades += exiting
+                    holding &= ~exiting
+
+                if t < n - 1:
+                    entering = entries[t] & ~holding & ~exiting
+                    holding |= entering
+                    entry_price = np.where(entering, close[t], entry_price)
+                    highest = np.where(entering, entry_price if self.trail_from_entry else np.nan, highest)
+                    highest = np.where(has_trailing, highest, np.nan)
+        return trades, growth
+
+    @staticmethod
+    def holding_mask(entry_idx, exit_idx, n):
+        """由scan结果生成逐日持仓标记（入场当根至离场前一根为True）"""
+        delta = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(delta, entry_idx, 1)
+        np.add.at(delta, exit_idx, -1)
+        return np.cumsum(delta[:n]) > 0
@@ -2,33 +2,96 @@ import talib
 import numpy as np
 import pandas as pd
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from strategies.risk_overlay import RiskOverlay
+from backtest.portfolio import PortfolioBacktester
+from indicators.lookback import talib_lookback
+from indicators.covariance import EWMACovariance, RollingCovariance, shrink_covariance
+from config.config import RISK_PARITY_CONFIG, RISK_PARITY_SEARCH_SPACE
+
+
+def equal_risk_contribution(cov, budgets=None, x0=None, tol=1e-8, max_iter=1000):
+    """
+    等风险贡献（风险预算）权重，循环坐标下降求解
+
+    求解 min 0.5 * y'Σy - Σ b_i * ln(y_i)，归一化 w = y / sum(y) 后
+    各资产的风险贡献 w_i * (Σw)_i 与预算 b 成比例。每次坐标更新有闭式解，
+    并同步修正 Σy，一轮开销为 O(N^2)。传入上一期权重 x0 热启动时通常几轮即收敛。
+
+    Args:
+        cov (np.ndarray): 协方差矩阵 (N, N)，对角元须为正
+        budgets (np.ndarray): 风险预算，默认等权
+        x0 (np.ndarray): 初始权重（热启动），默认按波动率倒数
+        tol (float): 相对变化收敛阈值
+        max_iter (int): 最大迭代轮数
+
+    Returns:
+        tuple: (权重, 迭代轮数)
+    """
+    cov = np.ascontiguousarray(cov, dtype=np.float64)
+    n = cov.shape[0]
+    if n == 0:
+        return np.zeros(0), 0
+    b = np.full(n, 1.0 / n) if budgets is None else np.asarray(budgets, dtype=np.float64) / np.sum(budgets)
+    var = np.diag(cov).copy()
+    
+    if x0 is None or np.any(~np.isfinite(x0)) or np.all(np.asarray(x0) <= 0):
+        y = 1.0 / np.sqrt(var)
+    else:
+        y = np.where(np.asarray(x0) > 0, x0, 1.0 / np.sqrt(var)).astype(np.float64)
+    # 缩放到最优解的量级（最优时 y'Σy = sum(b) = 1）
+    y /= np.sqrt(y @ cov @ y)
+    sigma_y = cov @ y
+    
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        max_change = 0.0
+        for i in range(n):
+            c = sigma_y[i] - var[i] * y[i]
+            new = (-c + np.sqrt(c * c + 4.0 * var[i] * b[i])) / (2.0 * var[i])
+            delta = new - y[i]
+            if delta != 0.0:
+                sigma_y += delta * cov[i]
+                y[i] = new
+                max_change = max(max_change, abs(delta) / new)
+        if max_change < tol:
+            break
+    return y / y.sum(), iterations
+
 
 class RiskParityStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = RISK_PARITY_SEARCH_SPACE
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("风险平价策略", initial_capital, commission_rate)
+        config = self.resolve_config(RISK_PARITY_CONFIG, params)
         # 参数设置
-        self.volatility_period = 20
-        self.ma_period = 20
-        self.risk_target = 0.15  # 目标年化波动率
-        self.max_leverage = 2.0  # 最大杠杆倍数
-        self.min_position = 0.1  # 最小仓位比例
-        self.stop_loss = 0.03
-        self.profit_target = 0.05
+        self.volatility_period = config['volatility_period']
+        self.ma_period = config['ma_period']
+        self.risk_target = config['risk_target']
+        self.max_leverage = config['max_leverage']
+        self.min_position = config['min_position']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target, inclusive=True)
+        self.volume_limit = config['volume_limit']
         self._current_row = None
-
-    def set_current_row(self, row):
-        """设置当前行数据"""
-        self._current_row = row
+        
+        # 多资产风险平价参数（run_portfolio使用）
+        self.portfolio_rebalance_period = config['portfolio_rebalance_period']
+        self.cov_method = config['cov_method']
+        self.ewma_lambda = config['ewma_lambda']
+        self.cov_window = config['cov_window']
+        self.shrinkage = config['shrinkage']
 
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算移动平均
-        df['ma'] = talib.SMA(df['close'], timeperiod=self.ma_period)
+        df['ma'] = self.indicator(talib.SMA, df['close'], timeperiod=self.ma_period)
         
         # 计算波动率
-        df['volatility'] = talib.STDDEV(df['close'], timeperiod=self.volatility_period) / df['close']
+        df['volatility'] = self.indicator(talib.STDDEV, df['close'], timeperiod=self.volatility_period) / df['close']
         df['annualized_vol'] = df['volatility'] * np.sqrt(252)  # 年化波动率
         
         # 计算动态风险调整因子
@@ -39,10 +102,10 @@ class RiskParityStrategy(BaseStrategy):
         df['trend'] = np.where(df['close'] > df['ma'], 1, -1)
         
         # 计算RSI
-        df['rsi'] = talib.RSI(df['close'], timeperiod=14)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=14)
         
         # 计算ATR
-        df['atr'] = talib.ATR(df['high'], df['low'], df['close'], timeperiod=14)
+        df['atr'] = self.indicator(talib.ATR, df['high'], df['low'], df['close'], timeperiod=14)
         
         # 计算动态止损水平
         df['stop_level'] = df['close'] - 2 * df['atr']
@@ -70,6 +133,93 @@ class RiskParityStrategy(BaseStrategy):
         
         return target_position
 
+    def run_portfolio(self, panel, start_index=None):
+        """
+        多资产风险平价回测：协方差矩阵逐根K线增量更新，每portfolio_rebalance_period个
+        交易日按等风险贡献权重调仓（以上一期权重热启动求解），组合年化波动率高于
+        risk_target时按比例降低总仓位、其余持有现金。
+
+        收益率相对最近一个有效收盘价计算，复牌当根包含停牌期间的涨跌；未上市、停牌的
+        K线不计入协方差。资产累计有效收益率达到cov_window个后才参与配置。
+
+        Args:
+            panel (StockPanel): 日期 × 资产的行情面板（如行业ETF、指数成分股）
+            start_index (int): 首个调仓日的位置，默认为cov_window
+
+        Returns:
+            dict: dates（交易日）、equity（逐日权益）、rebalance_index（调仓日位置）、
+                  weights（各调仓日的目标权重，(R, N)）、positions（各调仓日后的持股数，(R, N)）、
+                  turnover（各调仓日成交额/权益）、commission（手续费合计）、
+                  iterations（各调仓日求解器迭代轮数）
+        """
+        close = np.asarray(panel['close'], dtype=np.float64)
+        volume = np.asarray(panel['volume'], dtype=np.float64) if 'volume' in panel else None
+        n_days, n_assets = close.shape
+        tradable = ~np.isnan(close)
+        
+        # 相对最近有效收盘价的收益率，停牌及未上市处为NaN
+        last_valid = np.maximum.accumulate(np.where(tradable, np.arange(n_days)[:, None], -1), axis=0)
+        last_close = np.where(last_valid >= 0, close[np.maximum(last_valid, 0), np.arange(n_assets)], np.nan)
+        returns = np.full(close.shape, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns[1:] = close[1:] / last_close[:-1] - 1
+        
+        if self.cov_method == 'ewma':
+            estimator = EWMACovariance(n_assets, self.ewma_lambda)
+        elif self.cov_method == 'rolling':
+            estimator = RollingCovariance(n_assets, self.cov_window)
+        else:
+            raise ValueError(f"未知的协方差估计方法: {self.cov_method}")
+        
+        if start_index is None:
+            start_index = self.cov_window
+        rebalance_index = np.arange(start_index, n_days, self.portfolio_rebalance_period)
+        iterations = np.zeros(len(rebalance_index), dtype=np.int64)
+        state = {'next_bar': 1, 'weights': np.zeros(n_assets)}
+        
+        def target_weights(k, t, positions):
+            # 增量推进协方差估计至当前K线
+            for bar in range(state['next_bar'], t + 1):
+                estimator.update(returns[bar])
+            state['next_bar'] = t + 1
+            
+            cov = shrink_covariance(estimator.covariance(), self.shrinkage)
+            active = np.flatnonzero(tradable[t] & (estimator.counts >= self.cov_window) & (np.diag(cov) > 0))
+            weights = np.zeros(n_assets)
+            if len(active):
+                sub = cov[np.ix_(active, active)]
+                weights[active], iterations[k] = equal_risk_contribution(sub, x0=state['weights'][active])
+                # 组合波动率超出目标时降低总仓位
+                annual_vol = np.sqrt(weights[active] @ sub @ weights[active] * 252)
+                if annual_vol > self.risk_target:
+                    weights *= self.risk_target / annual_vol
+            state['weights'] = weights
+            return weights
+        
+        result = PortfolioBacktester.run(close, rebalance_index, target_weights,
+                                         self.initial_capital, self.commission_rate,
+                                         volume, self.volume_limit)
+        self.equity_curve = result['equity']
+        return {
+            'dates': panel.dates,
+            'equity': result['equity'],
+            'rebalance_index': rebalance_index,
+            'weights': result['weights'],
+            'positions': result['positions'],
+            'turnover': result['turnover'],
+            'commission': result['commission'],
+            'iterations': iterations,
+        }
+
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('SMA', timeperiod=self.ma_period),
+            talib_lookback('STDDEV', timeperiod=self.volatility_period),
+            talib_lookback('RSI', timeperiod=14),
+            talib_lookback('ATR', timeperiod=14),
+        ]
+
     def generate_signal(self, row, prev_row):
         """生成交易信号"""
         # 检查是否有足够的数据来计算指标
@@ -81,8 +231,7 @@ class RiskParityStrategy(BaseStrategy):
         
         # 检查是否需要止损或止盈
         if self.position > 0:
-            profit_pct = (current_price - self.entry_price) / self.entry_price
-            if profit_pct <= -self.stop_loss or profit_pct >= self.profit_target:
+            if self.risk.check(current_price, self.entry_price):
                 return 'SELL'
             # 检查动态止损
             if current_price < row['stop_level']:
@@ -97,53 +246,8 @@ class RiskParityStrategy(BaseStrategy):
         
         return 'HOLD'
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数
-            target_position = self._calculate_position_size(self._current_row)
-            target_value = self.capital * abs(target_position)
-            max_shares = int(target_value / (price * (1 + self.commission_rate)))
-            shares = min(max_shares, int(volume * 0.1))  # 限制单次交易量
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按风险平价目标仓位计算买入股数（预留手续费）"""
+        target_position = self._calculate_position_size(self._current_row)
+        target_value = self.capital * abs(target_position)
+        return int(target_value / (price * (1 + self.commission_rate)))
@@ -1,32 +1,184 @@
+import os
 import talib
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback, rolling_lookback, change_lookback
+from config.config import STATISTICAL_ARBITRAGE_CONFIG, STATISTICAL_ARBITRAGE_SEARCH_SPACE
+
+
+def rolling_autocorr(close, window):
+    """滚动窗口内价格的一阶自相关系数"""
+    return close.rolling(window=window).apply(lambda x: x.autocorr(), raw=False)
+
+
+def rolling_percentile(close, window):
+    """当前价格在滚动窗口内的历史分位数"""
+    return close.rolling(window=window).apply(
+        lambda x: pd.Series(x).rank().iloc[-1] / len(x))
+
+
+def correlated_pairs(log_close, min_corr=0.8, max_pairs=None, min_overlap=60):
+    """
+    相关性预筛选：由日对数收益率一次性计算全部股票两两相关系数矩阵
+
+    缺失收益率（未上市、停牌）按0处理并从有效样本计数中扣除，
+    两只股票共同有效的交易日少于min_overlap时不参与配对。
+
+    Args:
+        log_close (np.ndarray): 对数收盘价 (T, N)
+        min_corr (float): 相关系数下限
+        max_pairs (int): 最多保留的配对数（按相关系数从高到低），None表示不限制
+        min_overlap (int): 最少共同有效交易日数
+
+    Returns:
+        tuple: (配对 (P, 2) 的列位置数组, 对应的相关系数)
+    """
+    returns = np.diff(log_close, axis=0)
+    valid = ~np.isnan(returns)
+    returns = np.where(valid, returns, 0.0)
+    counts = valid.sum(axis=0)
+    mean = returns.sum(axis=0) / np.maximum(counts, 1)
+    centered = np.where(valid, returns - mean, 0.0)
+    scale = np.sqrt((centered ** 2).sum(axis=0))
+    z = np.divide(centered, scale, out=np.zeros_like(centered), where=scale > 0)
+    
+    corr = z.T @ z
+    overlap = valid.T.astype(np.float32) @ valid.astype(np.float32)
+    rows, cols = np.triu_indices(corr.shape[0], k=1)
+    values = corr[rows, cols]
+    keep = (values >= min_corr) & (overlap[rows, cols] >= min_overlap)
+    rows, cols, values = rows[keep], cols[keep], values[keep]
+    
+    if max_pairs is not None and len(values) > max_pairs:
+        top = np.argpartition(-values, max_pairs - 1)[:max_pairs]
+        rows, cols, values = rows[top], cols[top], values[top]
+    order = np.argsort(-values, kind='stable')
+    return np.column_stack([rows[order], cols[order]]), values[order]
+
+
+def engle_granger(y, x, adf_lags=1):
+    """
+    Engle-Granger两步法协整检验
+
+    先以OLS回归 y = alpha + beta * x 得到价差残差，再对残差做ADF检验：
+    Δe_t = gamma * e_{t-1} + Σ phi_k * Δe_{t-k} + ε，gamma的t值即检验统计量，
+    均值回复半衰期为 -ln2 / ln(1 + gamma)。
+
+    Args:
+        y, x (np.ndarray): 两只股票的对数价格，NaN处不参与计算
+        adf_lags (int): ADF检验的差分滞后阶数
+
+    Returns:
+        tuple: (beta, alpha, ADF统计量, 半衰期)，样本不足时为NaN
+    """
+    valid = ~(np.isnan(y) | np.isnan(x))
+    y, x = y[valid], x[valid]
+    n = len(y)
+    if n < 30 + adf_lags:
+        return np.nan, np.nan, np.nan, np.nan
+    
+    design = np.column_stack([np.ones(n), x])
+    (alpha, beta), *_ = np.linalg.lstsq(design, y, rcond=None)
+    resid = y - alpha - beta * x
+    
+    diff = np.diff(resid)
+    target = diff[adf_lags:]
+    regressors = [resid[adf_lags:-1]] + [diff[adf_lags - k:-k] for k in range(1, adf_lags + 1)]
+    design = np.column_stack(regressors)
+    coef, *_ = np.linalg.lstsq(design, target, rcond=None)
+    dof = len(target) - design.shape[1]
+    sigma2 = np.sum((target - design @ coef) ** 2) / dof
+    gram_inv = np.linalg.pinv(design.T @ design)
+    gamma = coef[0]
+    se = np.sqrt(sigma2 * gram_inv[0, 0])
+    adf_stat = gamma / se if se > 0 else np.nan
+    half_life = -np.log(2) / np.log1p(gamma) if -1 < gamma < 0 else np.inf
+    return beta, alpha, adf_stat, half_life
+
+
+def _engle_granger_chunk(columns, pairs, adf_lags):
+    """进程池任务：columns只包含本批配对用到的股票列，pairs为其中的列位置"""
+    return np.array([engle_granger(columns[:, i], columns[:, j], adf_lags) for i, j in pairs])
+
+
+def cointegration_tests(log_close, pairs, adf_lags=1, n_jobs=None, chunk_size=256):
+    """
+    批量协整检验，配对分批后分发到进程池并行计算
+
+    每批只向子进程传递该批用到的股票列，避免重复序列化整个面板。
+
+    Args:
+        log_close (np.ndarray): 对数收盘价 (T, N)
+        pairs (np.ndarray): 配对列位置 (P, 2)
+        adf_lags (int): ADF检验的差分滞后阶数
+        n_jobs (int): 进程数，None为CPU核数，1为在当前进程顺序计算
+        chunk_size (int): 每批配对数
+
+    Returns:
+        np.ndarray: (P, 4)，各列依次为 beta、alpha、ADF统计量、半衰期
+    """
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    if len(pairs) == 0:
+        return np.empty((0, 4))
+    tasks = []
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        used, local = np.unique(chunk, return_inverse=True)
+        tasks.append((np.ascontiguousarray(log_close[:, used]), local.reshape(-1, 2), adf_lags))
+    
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(tasks) == 1:
+        results = [_engle_granger_chunk(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+            results = list(pool.map(_engle_granger_chunk, *zip(*tasks)))
+    return np.vstack(results)
+
 
 class StatisticalArbitrageStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = STATISTICAL_ARBITRAGE_SEARCH_SPACE
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("统计套利策略", initial_capital, commission_rate)
+        config = self.resolve_config(STATISTICAL_ARBITRAGE_CONFIG, params)
         # 参数设置
-        self.lookback_period = 60  # 回看期
-        self.zscore_threshold = 2.0  # z-score阈值
-        self.ma_period = 20
-        self.std_period = 20
-        self.correlation_period = 60
-        self.stop_loss = 0.03
-        self.profit_target = 0.05
+        self.lookback_period = config['lookback_period']
+        self.zscore_threshold = config['zscore_threshold']
+        self.ma_period = config['ma_period']
+        self.std_period = config['std_period']
+        self.correlation_period = config['correlation_period']
+        self.volatility_baseline_window = config['volatility_baseline_window']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target, inclusive=True)
+        self.volume_limit = config['volume_limit']
         self._current_row = None
-
-    def set_current_row(self, row):
-        """设置当前行数据"""
-        self._current_row = row
+        
+        # 配对交易参数（screen_pairs / run_pairs使用）
+        self.pair_min_corr = config['pair_min_corr']
+        self.pair_max_candidates = config['pair_max_candidates']
+        self.pair_adf_lags = config['pair_adf_lags']
+        self.pair_adf_critical = config['pair_adf_critical']
+        self.pair_half_life_range = config['pair_half_life_range']
+        self.pair_max_selected = config['pair_max_selected']
+        self.pair_formation_period = config['pair_formation_period']
+        self.pair_zscore_window = config['pair_zscore_window']
+        self.pair_zscore_min_fraction = config['pair_zscore_min_fraction']
+        self.pair_entry_z = config['pair_entry_z']
+        self.pair_exit_z = config['pair_exit_z']
+        self.pair_stop_z = config['pair_stop_z']
+        self.pair_n_jobs = config['pair_n_jobs']
 
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算移动平均和标准差
-        df['ma'] = talib.SMA(df['close'], timeperiod=self.ma_period)
-        df['std'] = talib.STDDEV(df['close'], timeperiod=self.std_period)
+        df['ma'] = self.indicator(talib.SMA, df['close'], timeperiod=self.ma_period)
+        df['std'] = self.indicator(talib.STDDEV, df['close'], timeperiod=self.std_period)
         
         # 计算z-score
         df['zscore'] = (df['close'] - df['ma']) / df['std']
@@ -36,17 +188,26 @@ class StatisticalArbitrageStrategy(BaseStrategy):
         
         # 计算波动率
         df['volatility'] = df['std'] / df['ma']
+        df['volatility_baseline'] = self.baseline(df['volatility'], self.volatility_baseline_window)
         
         # 计算自相关系数
-        df['autocorr'] = df['close'].rolling(window=self.correlation_period).apply(
-            lambda x: x.autocorr(), raw=False)
+        df['autocorr'] = self.indicator(rolling_autocorr, df['close'], self.correlation_period)
         
         # 计算历史分位数
-        df['percentile'] = df['close'].rolling(window=self.lookback_period).apply(
-            lambda x: pd.Series(x).rank().iloc[-1] / len(x))
+        df['percentile'] = self.indicator(rolling_percentile, df['close'], self.lookback_period)
         
         return df
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('SMA', timeperiod=self.ma_period),
+            talib_lookback('STDDEV', timeperiod=self.std_period),
+            change_lookback(self.lookback_period),
+            rolling_lookback(self.correlation_period),
+            rolling_lookback(self.lookback_period),
+        ]
+
     def generate_signal(self, row, prev_row):
         """生成交易信号"""
         # 检查是否有足够的数据来计算指标
@@ -62,13 +223,12 @@ class StatisticalArbitrageStrategy(BaseStrategy):
         
         # 检查是否需要止损或止盈
         if self.position > 0:
-            profit_pct = (current_price - self.entry_price) / self.entry_price
-            if profit_pct <= -self.stop_loss or profit_pct >= self.profit_target:
+            if self.risk.check(current_price, self.entry_price):
                 return 'SELL'
         
         # 生成交易信号
         if zscore < -self.zscore_threshold and \
-           (momentum < 0 or volatility < row['volatility'].mean()) and \
+           (momentum < 0 or volatility < row['volatility_baseline']) and \
            (autocorr > 0 or percentile < 0.3):  # 放宽条件
             return 'BUY'
         elif zscore > self.zscore_threshold or \
@@ -77,52 +237,155 @@ class StatisticalArbitrageStrategy(BaseStrategy):
         
         return 'HOLD'
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数
-            available_capital = self.capital
-            max_shares = int(available_capital / (price * (1 + self.commission_rate)))
-            shares = min(max_shares, int(volume * 0.1))  # 限制单次交易量
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按全部可用资金（预留手续费）计算买入股数"""
+        return int(self.capital / (price * (1 + self.commission_rate)))
+
+    def screen_pairs(self, panel, end_index=None):
+        """
+        在股票池中筛选协整配对
+
+        先由相关系数矩阵向量化预筛选，再对候选配对并行做Engle-Granger检验，
+        保留ADF统计量低于临界值且半衰期在合理范围内的配对（按ADF统计量从小到大）。
+        设置了 BaseStrategy.feature_cache 时，检验结果按“价格数据 + 候选配对 + 参数”缓存，
+        同一股票池重复筛选时直接读取。
+
+        Args:
+            panel (StockPanel): 日期 × 股票的行情面板
+            end_index (int): 只使用此位置之前的数据（形成期），默认全部
+
+        Returns:
+            pd.DataFrame: stock_y、stock_x、y、x（列位置）、correlation、beta、alpha、adf_stat、half_life
+        """
+        close = np.asarray(panel['close'], dtype=np.float64)[:end_index]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            log_close = np.log(np.where(close > 0, close, np.nan))
+        
+        pairs, corr = correlated_pairs(log_close, self.pair_min_corr, self.pair_max_candidates,
+                                       min_overlap=self.pair_formation_period // 2)
+        
+        cache = self.feature_cache
+        key = None
+        stats = None
+        if cache is not None:
+            key = cache.make_key(cointegration_tests, (log_close, pairs), {'adf_lags': self.pair_adf_lags})
+            stored = cache.load(key)
+            if stored is not None:
+                cache.hits += 1
+                stats = stored['stats']
+        if stats is None:
+            stats = cointegration_tests(log_close, pairs, self.pair_adf_lags, self.pair_n_jobs)
+            if cache is not None:
+                cache.misses += 1
+                cache.store(key, {'stats': stats})
+        
+        result = pd.DataFrame({
+            'y': pairs[:, 0] if len(pairs) else np.empty(0, dtype=np.int64),
+            'x': pairs[:, 1] if len(pairs) else np.empty(0, dtype=np.int64),
+            'correlation': corr,
+            'beta': stats[:, 0],
+            'alpha': stats[:, 1],
+            'adf_stat': stats[:, 2],
+            'half_life': stats[:, 3],
+        })
+        low, high = self.pair_half_life_range
+        selected = result[(result['adf_stat'] < self.pair_adf_critical) &
+                          result['half_life'].between(low, high) & (result['beta'] > 0)]
+        selected = selected.sort_values('adf_stat', kind='stable').head(self.pair_max_selected)
+        codes = np.asarray(panel.codes, dtype=object)
+        selected.insert(0, 'stock_x', codes[selected['x'].to_numpy()])
+        selected.insert(0, 'stock_y', codes[selected['y'].to_numpy()])
+        return selected.reset_index(drop=True)
+
+    def run_pairs(self, panel, pairs=None, formation_period=None):
+        """
+        配对交易回测：价差z-score超过pair_entry_z时做空价差（z>0，卖y买x）或做多价差（z<0），
+        回归至pair_exit_z以内或偏离超过pair_stop_z时平仓；止损后需z重新穿越开仓阈值才再次开仓。
+
+        价差为 ln(y) - beta * ln(x)，每个配对的两条腿按 1 : beta 的市值配比、总敞口归一，
+        各配对等额分配资金，手续费按两条腿的成交额计算。全部配对的持仓状态整段向量化求解。
+        任一条腿停牌时无法交易，持仓保持不变；停牌的腿按最近有效收盘价估值，
+        复牌当根的收益率相对停牌前的收盘价计算，停牌期间的价差盈亏不会丢失。
+        z-score的滚动均值与标准差只取窗口内的有效价差，有效值不少于窗口的
+        pair_zscore_min_fraction时即可计算，复牌后无需等待整个窗口；z无法计算时沿用原持仓，
+        开仓穿越以前一个有效z为参照。
+
+        Args:
+            panel (StockPanel): 日期 × 股票的行情面板
+            pairs (pd.DataFrame): screen_pairs的结果，默认用形成期数据筛选
+            formation_period (int): 形成期长度，默认pair_formation_period；形成期内不交易
+
+        Returns:
+            dict: dates、equity（逐日权益）、pairs（配对表）、zscore（(T, P)）、
+                  positions（(T, P)，1为做多价差、-1为做空价差）、pair_returns（各配对逐日收益，(T, P)）、
+                  trades（开平仓次数）、commission（手续费合计）
+        """
+        if formation_period is None:
+            formation_period = self.pair_formation_period
+        if pairs is None:
+            pairs = self.screen_pairs(panel, end_index=formation_period)
+        
+        close = np.asarray(panel['close'], dtype=np.float64)
+        n_days = close.shape[0]
+        y_idx = pairs['y'].to_numpy(dtype=np.int64)
+        x_idx = pairs['x'].to_numpy(dtype=np.int64)
+        beta = pairs['beta'].to_numpy(dtype=np.float64)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            log_close = np.log(np.where(close > 0, close, np.nan))
+            spread = pd.DataFrame(log_close[:, y_idx] - beta * log_close[:, x_idx])
+            # 停牌日价差为NaN，滚动统计只计入有效值
+            min_periods = max(2, int(np.ceil(self.pair_zscore_window * self.pair_zscore_min_fraction)))
+            rolling = spread.rolling(self.pair_zscore_window, min_periods=min_periods)
+            zscore = ((spread - rolling.mean()) / rolling.std()).to_numpy()
+        
+            # 开仓只在z由阈值内穿越至阈值外时触发，平仓与止损优先
+            prev = pd.DataFrame(zscore).ffill().shift(1).to_numpy()
+            short_entry = (zscore > self.pair_entry_z) & ~(prev > self.pair_entry_z)
+            long_entry = (zscore < -self.pair_entry_z) & ~(prev < -self.pair_entry_z)
+            flat = (np.abs(zscore) < self.pair_exit_z) | (np.abs(zscore) > self.pair_stop_z)
+        
+        state = np.full(zscore.shape, np.nan)
+        state[short_entry] = -1.0
+        state[long_entry] = 1.0
+        state[flat] = 0.0
+        # z无法计算（如停牌）时不产生信号；停牌当根不能成交，沿用前一根的持仓
+        suspended = np.isnan(close[:, y_idx]) | np.isnan(close[:, x_idx])
+        state[suspended] = np.nan
+        state[:formation_period] = 0.0
+        positions = pd.DataFrame(state).ffill().fillna(0.0).to_numpy(copy=True)
+        positions[-1] = 0.0  # 最后一根K线强制平仓
+        
+        # 相对最近有效收盘价的收益率，停牌当根价格不变（收益率为0）
+        valid = ~np.isnan(close)
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(n_days)[:, None], -1), axis=0)
+        last_close = np.where(last_valid >= 0, close[np.maximum(last_valid, 0), np.arange(close.shape[1])], np.nan)
+        returns = np.zeros(close.shape)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns[1:] = close[1:] / last_close[:-1] - 1
+        returns = np.nan_to_num(returns)
+        gross = 1 + np.abs(beta)
+        spread_returns = (returns[:, y_idx] - beta * returns[:, x_idx]) / gross
+        
+        held = np.zeros(positions.shape)
+        held[1:] = positions[:-1]
+        changes = np.abs(np.diff(positions, axis=0, prepend=0.0))
+        costs = changes * self.commission_rate
+        pair_returns = held * spread_returns - costs
+        
+        portfolio_returns = pair_returns.mean(axis=1) if len(beta) else np.zeros(n_days)
+        equity = self.initial_capital * np.cumprod(1 + portfolio_returns)
+        self.equity_curve = equity
+        
+        prev_equity = np.concatenate([[self.initial_capital], equity[:-1]])
+        commission = float(prev_equity @ costs.mean(axis=1)) if len(beta) else 0.0
+        return {
+            'dates': panel.dates,
+            'equity': equity,
+            'pairs': pairs,
+            'zscore': zscore,
+            'positions': positions,
+            'pair_returns': pair_returns,
+            'trades': int(np.count_nonzero(changes)),
+            'commission': commission,
+        }
@@ -1,49 +1,56 @@
 import talib
 import numpy as np
-import pandas as pd
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback, rolling_lookback
+from config.config import SWING_CONFIG, SWING_SEARCH_SPACE, SWING_SEARCH_CONSTRAINT
 
 class SwingStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = SWING_SEARCH_SPACE
+    search_constraint = SWING_SEARCH_CONSTRAINT
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("波段策略", initial_capital, commission_rate)
+        config = self.resolve_config(SWING_CONFIG, params)
         # 技术指标参数
-        self.fast_period = 5
-        self.slow_period = 10
-        self.signal_period = 9
-        self.rsi_period = 14
-        self.bb_period = 20
-        self.atr_period = 14
+        self.fast_period = config['fast_period']
+        self.slow_period = config['slow_period']
+        self.signal_period = config['signal_period']
+        self.rsi_period = config['rsi_period']
+        self.bb_period = config['bb_period']
+        self.atr_period = config['atr_period']
         
         # 波段交易参数
-        self.oversold_threshold = 30
-        self.overbought_threshold = 70
-        self.bb_dev = 2.0
-        self.volume_ma_period = 20
+        self.oversold_threshold = config['oversold_threshold']
+        self.overbought_threshold = config['overbought_threshold']
+        self.bb_dev = config['bb_dev']
+        self.volume_ma_period = config['volume_ma_period']
         
         # 止损止盈参数
-        self.stop_loss = 0.03
-        self.profit_target = 0.05
-        self.trailing_stop = 0.02
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.trailing_stop = config['trailing_stop']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target, self.trailing_stop, trail_from_entry=True)
 
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算MACD
-        df['macd'], df['macd_signal'], df['macd_hist'] = talib.MACD(
+        df['macd'], df['macd_signal'], df['macd_hist'] = self.indicator(talib.MACD,
             df['close'], fastperiod=self.fast_period, 
             slowperiod=self.slow_period, signalperiod=self.signal_period)
         
         # 计算RSI
-        df['rsi'] = talib.RSI(df['close'], timeperiod=self.rsi_period)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=self.rsi_period)
         
         # 计算布林带
-        df['bb_middle'], df['bb_upper'], df['bb_lower'] = talib.BBANDS(
+        df['bb_middle'], df['bb_upper'], df['bb_lower'] = self.indicator(talib.BBANDS,
             df['close'], timeperiod=self.bb_period, 
             nbdevup=self.bb_dev, nbdevdn=self.bb_dev)
         
         # 计算ATR
-        df['atr'] = talib.ATR(df['high'], df['low'], df['close'], 
+        df['atr'] = self.indicator(talib.ATR, df['high'], df['low'], df['close'], 
                              timeperiod=self.atr_period)
         
         # 计算KDJ
@@ -55,16 +62,31 @@ class SwingStrategy(BaseStrategy):
         df['j'] = 3 * df['k'] - 2 * df['d']
         
         # 计算成交量指标
-        df['volume_ma'] = talib.SMA(df['volume'], self.volume_ma_period)
+        df['volume_ma'] = self.indicator(talib.SMA, df['volume'], self.volume_ma_period)
         df['volume_ratio'] = df['volume'] / df['volume_ma']
         
         # 计算趋势强度
-        df['adx'] = talib.ADX(df['high'], df['low'], df['close'], timeperiod=14)
-        df['di_plus'] = talib.PLUS_DI(df['high'], df['low'], df['close'], timeperiod=14)
-        df['di_minus'] = talib.MINUS_DI(df['high'], df['low'], df['close'], timeperiod=14)
+        df['adx'] = self.indicator(talib.ADX, df['high'], df['low'], df['close'], timeperiod=14)
+        df['di_plus'] = self.indicator(talib.PLUS_DI, df['high'], df['low'], df['close'], timeperiod=14)
+        df['di_minus'] = self.indicator(talib.MINUS_DI, df['high'], df['low'], df['close'], timeperiod=14)
         
         return df
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('MACD', fastperiod=self.fast_period, slowperiod=self.slow_period,
+                           signalperiod=self.signal_period),
+            talib_lookback('RSI', timeperiod=self.rsi_period),
+            talib_lookback('BBANDS', timeperiod=self.bb_period),
+            talib_lookback('ATR', timeperiod=self.atr_period),
+            rolling_lookback(9) + rolling_lookback(3) + rolling_lookback(3),
+            talib_lookback('SMA', timeperiod=self.volume_ma_period),
+            talib_lookback('ADX', timeperiod=14),
+            talib_lookback('PLUS_DI', timeperiod=14),
+            talib_lookback('MINUS_DI', timeperiod=14),
+        ]
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -104,91 +126,19 @@ class SwingStrategy(BaseStrategy):
             if sum(conditions) >= 3:
                 signal = 'BUY'
         else:
-            # 动态止损价格计算
-            if hasattr(self, 'highest_price'):
-                trailing_stop_price = self.highest_price * (1 - self.trailing_stop)
-            else:
-                trailing_stop_price = self.entry_price * (1 - self.stop_loss)
-            
-            # 更新最高价
-            if row['close'] > getattr(self, 'highest_price', 0):
-                self.highest_price = row['close']
-            
-            # 止损条件判断
-            stop_loss_triggered = (row['close'] < trailing_stop_price)
-            
-            # 止盈条件判断
-            take_profit = ((row['close'] - self.entry_price) / self.entry_price > self.profit_target)
+            # 止损、追踪止损与止盈判断
+            risk_exit = self.risk.check(row['close'], self.entry_price)
             
             # 卖出信号需要满足至少3个条件或触发止损/止盈
             conditions = [rsi_sell, bb_sell, macd_sell, kdj_sell, volume_sell, trend_sell]
-            if sum(conditions) >= 3 or stop_loss_triggered or take_profit:
+            if sum(conditions) >= 3 or risk_exit:
                 signal = 'SELL'
-                if hasattr(self, 'highest_price'):
-                    delattr(self, 'highest_price')
+                self.risk.reset()
         
         return signal
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数（考虑ATR进行风险控制）
-            temp_df = pd.DataFrame({
-                'high': [price] * 15,  # 使用15个相同的价格点来确保ATR能够计算
-                'low': [price] * 15,
-                'close': [price] * 15,
-                'volume': [volume] * 15,
-                'date': [date] * 15
-            })
-            atr = talib.ATR(temp_df['high'], temp_df['low'], temp_df['close'], timeperiod=self.atr_period).iloc[-1]
-            
-            if pd.isna(atr):  # 如果ATR仍然是NaN，使用价格的一个小比例作为替代
-                atr = price * 0.002  # 使用0.2%作为默认波动率
-            
-            risk_per_share = atr * 2  # 使用2倍ATR作为每股风险
-            position_size = min(0.02 * self.capital / risk_per_share,  # 最多风险2%资金
-                              0.2 * self.capital / price)  # 最多使用20%资金
-            
-            shares = int(position_size)
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    self.highest_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按当前K线预先计算的ATR控制风险：2倍ATR止损最多亏2%资金，最多使用20%资金"""
+        atr = self._current_row['atr'] if self._current_row is not None else None
+        return self.risk_position_size(price, atr, risk_pct=0.02, atr_multiple=2.0,
+                                       max_capital_pct=0.2)
@@ -2,37 +2,73 @@ import talib
 import numpy as np
 import pandas as pd
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from indicators.lookback import talib_lookback
+from config.config import TREND_FOLLOWING_CONFIG, TREND_FOLLOWING_SEARCH_SPACE, TREND_FOLLOWING_SEARCH_CONSTRAINT
 
 class TrendFollowingStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = TREND_FOLLOWING_SEARCH_SPACE
+    search_constraint = TREND_FOLLOWING_SEARCH_CONSTRAINT
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("趋势跟踪策略", initial_capital, commission_rate)
-        self.short_period = 10
-        self.long_period = 30
-        self.atr_period = 14
-        self.stop_multiple = 2.5
+        config = self.resolve_config(TREND_FOLLOWING_CONFIG, params)
+        self.short_period = config['short_period']
+        self.long_period = config['long_period']
+        self.atr_period = config['atr_period']
+        self.stop_multiple = config['stop_multiple']
+        self.volume_limit = config['volume_limit']
         self._current_row = None
 
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算多个时间周期的趋势指标
-        df['ema_short'] = talib.EMA(df['close'], self.short_period)
-        df['ema_long'] = talib.EMA(df['close'], self.long_period)
+        df['ema_short'] = self.indicator(talib.EMA, df['close'], self.short_period)
+        df['ema_long'] = self.indicator(talib.EMA, df['close'], self.long_period)
         
         # 计算ATR用于止损
-        df['atr'] = talib.ATR(df['high'], df['low'], df['close'], self.atr_period)
+        df['atr'] = self.indicator(talib.ATR, df['high'], df['low'], df['close'], self.atr_period)
         
         # 计算MACD
-        df['macd'], df['signal'], df['hist'] = talib.MACD(df['close'], fastperiod=12, slowperiod=26, signalperiod=9)
+        df['macd'], df['signal'], df['hist'] = self.indicator(talib.MACD, df['close'], fastperiod=12, slowperiod=26, signalperiod=9)
         
         # 计算趋势强度
-        df['adx'] = talib.ADX(df['high'], df['low'], df['close'], timeperiod=14)
+        df['adx'] = self.indicator(talib.ADX, df['high'], df['low'], df['close'], timeperiod=14)
         
         # 计算RSI
-        df['rsi'] = talib.RSI(df['close'], timeperiod=14)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=14)
         return df
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('EMA', timeperiod=self.short_period),
+            talib_lookback('EMA', timeperiod=self.long_period),
+            talib_lookback('ATR', timeperiod=self.atr_period),
+            talib_lookback('MACD', fastperiod=12, slowperiod=26, signalperiod=9),
+            talib_lookback('ADX', timeperiod=14),
+            talib_lookback('RSI', timeperiod=14),
+        ]
+
+    def compute_raw_signals(self, df):
+        """向量化买卖条件，与空仓时的generate_signal结果一致"""
+        ema_short = df['ema_short'].to_numpy()
+        ema_long = df['ema_long'].to_numpy()
+        hist = df['hist'].to_numpy()
+        adx = df['adx'].to_numpy()
+        rsi = df['rsi'].to_numpy()
+        
+        trend_up = (ema_short > ema_long) & (hist > 0) & (adx > 20) & (rsi < 70)
+        trend_down = (ema_short < ema_long) & (hist < 0) & (adx > 20) & (rsi > 30)
+        
+        prev_short, prev_long = self.shifted(ema_short), self.shifted(ema_long)
+        buy = trend_up & (prev_short <= prev_long)
+        sell = trend_down & (prev_short >= prev_long)
+        
+        # 买入优先（generate_signal中卖出为elif分支）
+        return buy, sell & ~buy
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -60,52 +96,6 @@ class TrendFollowingStrategy(BaseStrategy):
                 
         return signal
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数
-            available_capital = self.capital
-            max_shares = int(available_capital / (price * (1 + self.commission_rate)))
-            shares = min(max_shares, int(volume * 0.1))  # 限制单次交易量
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按全部可用资金（预留手续费）计算买入股数"""
+        return int(self.capital / (price * (1 + self.commission_rate)))
@@ -2,38 +2,76 @@ import talib
 import numpy as np
 import pandas as pd
 from strategies.base_strategy import BaseStrategy
-from utils.utils import TradeLogger
+from strategies.risk_overlay import RiskOverlay
+from indicators.lookback import talib_lookback
+from config.config import VOLUME_BASED_CONFIG, VOLUME_BASED_SEARCH_SPACE
 
 class VolumeBasedStrategy(BaseStrategy):
-    def __init__(self, initial_capital, commission_rate):
+    # 参数寻优的默认搜索空间
+    search_space = VOLUME_BASED_SEARCH_SPACE
+
+    def __init__(self, initial_capital, commission_rate, **params):
         super().__init__("量价分析策略", initial_capital, commission_rate)
-        self.volume_ma_period = 10
-        self.price_ma_period = 5
-        self.volume_threshold = 1.3
-        self.stop_loss = 0.02
-        self.profit_target = 0.04
+        config = self.resolve_config(VOLUME_BASED_CONFIG, params)
+        self.volume_ma_period = config['volume_ma_period']
+        self.price_ma_period = config['price_ma_period']
+        self.volume_threshold = config['volume_threshold']
+        self.stop_loss = config['stop_loss']
+        self.profit_target = config['profit_target']
+        self.risk = RiskOverlay(self.stop_loss, self.profit_target)
+        self.volume_limit = config['volume_limit']
         self._current_row = None
 
     def calculate_signals(self, data):
         df = data.copy()
         
         # 计算成交量和价格的移动平均
-        df['volume_ma'] = talib.EMA(df['volume'], self.volume_ma_period)
-        df['price_ma'] = talib.EMA(df['close'], self.price_ma_period)
-        df['price_ma_slow'] = talib.EMA(df['close'], 20)
+        df['volume_ma'] = self.indicator(talib.EMA, df['volume'], self.volume_ma_period)
+        df['price_ma'] = self.indicator(talib.EMA, df['close'], self.price_ma_period)
+        df['price_ma_slow'] = self.indicator(talib.EMA, df['close'], 20)
         
         # 计算量比和趋势
         df['volume_ratio'] = df['volume'] / df['volume_ma']
-        df['momentum'] = talib.MOM(df['close'], timeperiod=10)
-        df['adx'] = talib.ADX(df['high'], df['low'], df['close'], timeperiod=14)
+        df['momentum'] = self.indicator(talib.MOM, df['close'], timeperiod=10)
+        df['adx'] = self.indicator(talib.ADX, df['high'], df['low'], df['close'], timeperiod=14)
         
         # 计算OBV和其他指标
-        df['obv'] = talib.OBV(df['close'], df['volume'])
-        df['obv_ma'] = talib.EMA(df['obv'], 20)
-        df['rsi'] = talib.RSI(df['close'], timeperiod=14)
+        df['obv'] = self.indicator(talib.OBV, df['close'], df['volume'])
+        df['obv_ma'] = self.indicator(talib.EMA, df['obv'], 20)
+        df['rsi'] = self.indicator(talib.RSI, df['close'], timeperiod=14)
         
         return df
 
+    def indicator_lookbacks(self):
+        """各指标的预热长度"""
+        return [
+            talib_lookback('EMA', timeperiod=self.volume_ma_period),
+            talib_lookback('EMA', timeperiod=self.price_ma_period),
+            talib_lookback('EMA', timeperiod=20),
+            talib_lookback('MOM', timeperiod=10),
+            talib_lookback('ADX', timeperiod=14),
+            talib_lookback('OBV') + talib_lookback('EMA', timeperiod=20),
+            talib_lookback('RSI', timeperiod=14),
+        ]
+
+    def compute_raw_signals(self, df):
+        """向量化买卖条件，与空仓时的generate_signal结果一致"""
+        close = df['close'].to_numpy()
+        price_ma = df['price_ma'].to_numpy()
+        momentum = df['momentum'].to_numpy()
+        rsi = df['rsi'].to_numpy()
+        
+        volume_surge = df['volume_ratio'].to_numpy() > self.volume_threshold
+        price_trend = (close > price_ma) & (price_ma > df['price_ma_slow'].to_numpy())
+        obv_confirm = df['obv'].to_numpy() > df['obv_ma'].to_numpy()
+        trend_confirm = (df['adx'].to_numpy() > 20) & (rsi < 70)
+        
+        buy = volume_surge & price_trend & obv_confirm & trend_confirm & (momentum > 0)
+        sell = volume_surge & (close < price_ma) & (momentum < 0) & (rsi > 30)
+        
+        # 买入优先（generate_signal中卖出为elif分支）
+        return buy, sell & ~buy
+
     def generate_signal(self, row, prev_row):
         signal = 'HOLD'
         
@@ -61,60 +99,11 @@ class VolumeBasedStrategy(BaseStrategy):
             signal = 'SELL'
             
         # 止损止盈
-        if self.position > 0:
-            if row['close'] < self.entry_price * (1 - self.stop_loss):
-                signal = 'SELL'
-            elif row['close'] > self.entry_price * (1 + self.profit_target):
-                signal = 'SELL'
+        if self.position > 0 and self.risk.check(row['close'], self.entry_price):
+            signal = 'SELL'
             
         return signal
 
-    def execute_trade(self, date, price, signal, volume):
-        """执行交易"""
-        if signal == 'BUY' and self.position <= 0:
-            # 计算可买入股数
-            available_capital = self.capital
-            max_shares = int(available_capital / (price * (1 + self.commission_rate)))
-            shares = min(max_shares, int(volume * 0.1))  # 限制单次交易量
-            
-            if shares > 0:
-                cost = shares * price
-                commission = cost * self.commission_rate
-                
-                if cost + commission <= self.capital:
-                    self.position = shares
-                    self.capital -= (cost + commission)
-                    self.entry_price = price
-                    
-                    trade = {
-                        'date': date,
-                        'type': '买入',
-                        'price': price,
-                        'shares': shares,
-                        'amount': cost,
-                        'commission': commission,
-                        'capital': self.capital
-                    }
-                    self.trades.append(trade)
-                    TradeLogger.print_trade(trade, self.name, self.position)
-                    
-        elif signal == 'SELL' and self.position > 0:
-            shares = self.position
-            revenue = shares * price
-            commission = revenue * self.commission_rate
-            
-            self.capital += (revenue - commission)
-            self.position = 0
-            self.entry_price = 0
-            
-            trade = {
-                'date': date,
-                'type': '卖出',
-                'price': price,
-                'shares': shares,
-                'amount': revenue,
-                'commission': commission,
-                'capital': self.capital
-            }
-            self.trades.append(trade)
-            TradeLogger.print_trade(trade, self.name, self.position) 
\ No newline at end of file
+    def order_shares(self, price, volume):
+        """按全部可用资金（预留手续费）计算买入股数"""
+        return int(self.capital / (price * (1 + self.commission_rate)))
@@ -0,0 +1,35 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# 测试从仓库根目录导入 strategies、indicators 等模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_synthetic_data(n, seed, drift=0.0005, volatility=0.02, cycle=None):
+    """对数正态随机游走的日线行情，cycle为周期（K线数）时叠加正弦波动以产生趋势反转"""
+    rng = np.random.default_rng(seed)
+    log_price = np.cumsum(rng.normal(drift, volatility, n))
+    if cycle:
+        log_price += 0.25 * np.sin(2 * np.pi * np.arange(n) / cycle)
+    close = 10 * np.exp(log_price)
+    high = close * (1 + np.abs(rng.normal(0, 0.01, n)))
+    low = close * (1 - np.abs(rng.normal(0, 0.01, n)))
+    volume = rng.lognormal(13, 0.5, n)
+    return pd.DataFrame({
+        'date': pd.bdate_range('2020-01-01', periods=n).strftime('%Y-%m-%d'),
+        'open': close * (1 + rng.normal(0, 0.005, n)),
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': volume,
+        'amount': volume * close,
+    })
+
+
+@pytest.fixture
+def synthetic_data():
+    """合成行情生成函数 make_synthetic_data"""
+    return make_synthetic_data
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from data.panel import StockPanel
+from strategies.statistical_arbitrage_strategy import StatisticalArbitrageStrategy
+
+FORMATION = 400
+
+
+def cointegrated_close(n, seed):
+    """x为随机游走，y = x + 均值回复的价差（AR(1)），返回 (T, 2) 收盘价"""
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.normal(0, 0.01, n))
+    spread = np.zeros(n)
+    for t in range(1, n):
+        spread[t] = 0.85 * spread[t - 1] + rng.normal(0, 0.012)
+    return np.exp(np.column_stack([x + spread, x])) * 10
+
+
+def run_pairs(close):
+    strategy = StatisticalArbitrageStrategy(1000000, 0.0003)
+    panel = StockPanel(np.arange(len(close)), ['y', 'x'], {'close': close})
+    pairs = pd.DataFrame({'y': [0], 'x': [1], 'beta': [1.0]})
+    return strategy.run_pairs(panel, pairs, formation_period=FORMATION)
+
+
+def test_suspension_keeps_held_pair():
+    close = cointegrated_close(800, 5)
+    positions = run_pairs(close)['positions'][:, 0]
+
+    # 最长的一段持仓
+    start, length = 0, 0
+    t = FORMATION
+    while t < len(positions) - 1:
+        end = t
+        while end < len(positions) and positions[end] == positions[t]:
+            end += 1
+        if positions[t] != 0 and end - t > length:
+            start, length = t, end - t
+        t = end
+    assert length >= 8
+
+    # 持仓期间y停牌3根K线
+    suspended = close.copy()
+    suspended[start + 2:start + 5, 0] = np.nan
+    result = run_pairs(suspended)
+    held = result['positions'][:, 0]
+
+    np.testing.assert_array_equal(held[:start], positions[:start])
+    # 停牌期间与复牌当根仍持有原方向，复牌当根z可计算
+    assert (held[start:start + 6] == positions[start]).all()
+    assert np.isfinite(result['zscore'][start + 5, 0])
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from strategies import registry
+
+# 提供向量化信号（compute_raw_signals）的策略
+RAW_SIGNAL_STRATEGIES = ['macd', 'kdj', 'bollinger', 'dual_ma_volume', 'trend_following', 'volume_based']
+
+
+SERIES = [
+    (600, 0, 0.0005, 0.02, None),
+    (800, 1, 0.002, 0.015, None),
+    (800, 2, -0.002, 0.015, None),
+    (500, 3, 0.0, 0.04, None),
+    (800, 7, 0.0, 0.01, 60),
+    (800, 8, 0.0, 0.01, 120),
+]
+
+
+@pytest.mark.parametrize('name', RAW_SIGNAL_STRATEGIES)
+@pytest.mark.parametrize('n,seed,drift,volatility,cycle', SERIES)
+def test_raw_signals_match_generate_signal(synthetic_data, name, n, seed, drift, volatility, cycle):
+    strategy = registry.load(name)(1000000, 0.0003)
+    df = strategy.calculate_signals(synthetic_data(n, seed, drift, volatility, cycle))
+    entry, exit_ = strategy.compute_raw_signals(df)
+
+    # 逐行generate_signal（空仓状态）作为基准
+    reference = np.array(['HOLD'] + [strategy.generate_signal(df.iloc[i], df.iloc[i - 1])
+                                      for i in range(1, len(df))])
+    assert len(entry) == len(exit_) == len(df)
+    np.testing.assert_array_equal(np.asarray(entry, dtype=bool)[1:], reference[1:] == 'BUY')
+    np.testing.assert_array_equal(np.asarray(exit_, dtype=bool)[1:], reference[1:] == 'SELL')
+    assert not (np.asarray(entry, dtype=bool) & np.asarray(exit_, dtype=bool)).any()
+    assert len(strategy.check_raw_signals(df)) == 0
@@ -0,0 +1,37 @@
+import contextlib
+import io
+import numpy as np
+import pytest
+from main import run_strategy
+from strategies import registry
+from backtest.scenarios import ScenarioBacktester
+
+# 设置了成交量上限（volume_limit）的策略
+VOLUME_LIMITED_STRATEGIES = ['trend_following', 'mean_reversion', 'volume_based', 'statistical_arbitrage',
+                             'dual_ma_volume', 'breakout']
+
+CAPITALS = [100000, 300000, 1000000, 3000000]
+
+
+def _backtest(strategy_cls, capital, data):
+    strategy = strategy_cls(capital, 0.0003)
+    strategy.verbose = False
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_strategy(strategy, None, None, None, data.copy())
+    return strategy
+
+
+@pytest.mark.parametrize('name', VOLUME_LIMITED_STRATEGIES)
+def test_replay_matches_full_runs_with_volume_cap(synthetic_data, name):
+    data = synthetic_data(900, 7, 0.0, 0.01, 60)
+    # 缩小成交量，使基准资金下的买入被成交量上限截断，而较小资金下不受限
+    data['volume'] = data['volume'] / 3
+    strategy_cls = registry.load(name)
+    base = _backtest(strategy_cls, 1000000, data)
+    columns = base.trades.columns
+    assert (columns['requested'] > columns['shares']).any()
+
+    summary = ScenarioBacktester.run(base, data, capitals=CAPITALS)['summary']
+    expected = [_backtest(strategy_cls, capital, data).calculate_performance()['profit_rate']
+                for capital in CAPITALS]
+    np.testing.assert_allclose(summary['profit_rate'].to_numpy(), expected, atol=0.01)
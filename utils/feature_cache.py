@@ -0,0 +1,179 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+import uuid
+import numpy as np
+import pandas as pd
+
+
+class FeatureCache:
+    """指标列的磁盘缓存
+
+    以“输入数据指纹 + 指标函数 + 参数”的哈希为键，每个条目保存为一个
+    .npz 文件，其中每个输出列单独存放为一个数组（列式存储）。
+    行情追加或修订后输入指纹随之变化，旧条目不会再被命中，
+    并在总大小超过预算时按最近最少使用（LRU）顺序淘汰。
+    """
+
+    SUFFIX = '.npz'
+
+    def __init__(self, cache_dir='.feature_cache', max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(value):
+        """计算输入数据的指纹：数组按dtype、形状和原始字节哈希，其他值按repr"""
+        digest = hashlib.sha1()
+        if isinstance(value, (pd.Series, pd.DataFrame)):
+            value = value.to_numpy()
+        if isinstance(value, np.ndarray):
+            arr = np.ascontiguousarray(value)
+            if arr.dtype == object:
+                arr = arr.astype(str)
+            digest.update(str(arr.dtype).encode())
+            digest.update(str(arr.shape).encode())
+            digest.update(arr.tobytes())
+        else:
+            digest.update(repr(value).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def function_id(func):
+        """指标函数标识：模块名+函数名，并附带源码或所属库版本，修改实现后自动失效"""
+        module = getattr(func, '__module__', None) or ''
+        name = getattr(func, '__qualname__', None) or getattr(func, '__name__', repr(func))
+        try:
+            version = hashlib.sha1(inspect.getsource(func).encode()).hexdigest()
+        except (TypeError, OSError):
+            root = sys.modules.get(module.split('.')[0]) if module else None
+            version = getattr(root, '__version__', '')
+        return f"{module}.{name}@{version}"
+
+    def make_key(self, func, inputs, params):
+        """由指标函数、输入和参数生成缓存键"""
+        spec = {
+            'func': self.function_id(func),
+            'inputs': [self.fingerprint(value) for value in inputs],
+            'params': {name: repr(params[name]) for name in sorted(params)},
+        }
+        return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def load(self, key):
+        """读取缓存条目，返回 {列名: 数组}；未命中返回None"""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                arrays = {name: stored[name] for name in stored.files}
+        except (OSError, ValueError):
+            return None
+        # 更新访问时间，供LRU淘汰使用
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def store(self, key, arrays):
+        """写入缓存条目（先写临时文件再原子替换），随后按预算淘汰"""
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.tmp{self.SUFFIX}")
+        try:
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"写入特征缓存失败: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """总大小超过预算时，按最近访问时间从旧到新删除条目"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.SUFFIX) or name.startswith('.'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """清空缓存目录中的全部条目"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.SUFFIX):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _result_arrays(result):
+        outputs = result if isinstance(result, tuple) else (result,)
+        arrays = {f'out{i}': np.asarray(output) for i, output in enumerate(outputs)}
+        arrays['n_outputs'] = np.array(len(outputs) if isinstance(result, tuple) else 0)
+        return arrays
+
+    def seed(self, func, inputs, params, result):
+        """
+        预先写入 func(*inputs, **params) 的结果（如由指标族一次算出的多个周期），
+        之后相同调用的get_or_compute直接命中；条目已存在时不覆盖
+
+        Returns:
+            bool: 是否写入了新条目
+        """
+        key = self.make_key(func, inputs, params)
+        if os.path.exists(self._path(key)):
+            return False
+        self.store(key, self._result_arrays(result))
+        return True
+
+    def get_or_compute(self, func, *inputs, **params):
+        """
+        读取或计算指标
+
+        Args:
+            func: 指标函数（如 talib.ADX）
+            *inputs: 传给指标函数的位置参数（行情序列及周期等）
+            **params: 传给指标函数的关键字参数
+
+        Returns:
+            与 func(*inputs, **params) 相同结构的结果；输入为Series时输出同样按其索引返回Series
+        """
+        key = self.make_key(func, inputs, params)
+        arrays = self.load(key)
+        if arrays is None:
+            self.misses += 1
+            result = func(*inputs, **params)
+            self.store(key, self._result_arrays(result))
+            return result
+
+        self.hits += 1
+        n_outputs = int(arrays['n_outputs'])
+        index = inputs[0].index if inputs and isinstance(inputs[0], pd.Series) else None
+
+        def wrap(values):
+            return pd.Series(values, index=index) if index is not None else values
+
+        if n_outputs == 0:
+            return wrap(arrays['out0'])
+        return tuple(wrap(arrays[f'out{i}']) for i in range(n_outputs))
@@ -0,0 +1,92 @@
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+
+
+def cast_frame(df, dtype):
+    """将DataFrame中的浮点列统一转换为指定精度（非浮点列保持不变）"""
+    float_cols = [col for col in df.columns if pd.api.types.is_float_dtype(df[col])]
+    if float_cols:
+        df[float_cols] = df[float_cols].astype(dtype)
+    return df
+
+
+def compare_precision(strategy_cls, data, initial_capital=1000000, commission_rate=0.0003,
+                      runner=None, capital_tolerance=1e-3):
+    """
+    单精度模式精度校验：分别以float64和float32运行同一策略并比较结果
+
+    Args:
+        strategy_cls: 策略类
+        data (pd.DataFrame): 行情数据
+        initial_capital (float): 初始资金
+        commission_rate (float): 手续费率
+        runner: 回测函数，默认使用 main.run_strategy
+        capital_tolerance (float): 最终资金允许的相对误差
+
+    Returns:
+        dict: 偏差报告，passed为True表示信号与交易时点完全一致且资金误差在容许范围内
+    """
+    if runner is None:
+        from main import run_strategy as runner
+
+    runs = {}
+    for dtype in (np.float64, np.float32):
+        strategy = strategy_cls(initial_capital=initial_capital, commission_rate=commission_rate)
+        with contextlib.redirect_stdout(io.StringIO()):
+            runner(strategy, None, None, None, data.copy(), dtype=dtype)
+        runs[dtype] = strategy
+
+    full, single = runs[np.float64], runs[np.float32]
+    dates = np.asarray(data['date'])
+
+    # 逐日信号比较
+    mismatch = np.flatnonzero(full.signal_history != single.signal_history)
+
+    # 逐笔交易比较：日期和方向须一致；股数可能因价格舍入相差少量，单独统计
+    trades_full = list(zip(full.trades.date_labels(), full.trades.column('side')))
+    trades_single = list(zip(single.trades.date_labels(), single.trades.column('side')))
+    first_trade_diff = None
+    for i, (a, b) in enumerate(zip(trades_full, trades_single)):
+        if a != b:
+            first_trade_diff = i
+            break
+    if first_trade_diff is None and len(trades_full) != len(trades_single):
+        first_trade_diff = min(len(trades_full), len(trades_single))
+    n_common = min(len(full.trades), len(single.trades))
+    share_diffs = np.abs(full.trades.column('shares')[:n_common] - single.trades.column('shares')[:n_common])
+
+    capital_diff = abs(single.capital - full.capital) / full.initial_capital
+    equity_full = full.equity_curve.astype(np.float64)
+    equity_single = single.equity_curve.astype(np.float64)
+    equity_diff = float(np.max(np.abs(equity_single - equity_full) / equity_full)) if len(equity_full) else 0.0
+
+    return {
+        'strategy': full.name,
+        'signal_mismatches': int(len(mismatch)),
+        'first_signal_mismatch': str(dates[mismatch[0]]) if len(mismatch) else None,
+        'trades_float64': len(trades_full),
+        'trades_float32': len(trades_single),
+        'first_trade_mismatch': first_trade_diff,
+        'max_share_diff': int(share_diffs.max()) if n_common else 0,
+        'capital_float64': full.capital,
+        'capital_float32': single.capital,
+        'capital_rel_diff': capital_diff,
+        'equity_max_rel_diff': equity_diff,
+        'passed': len(mismatch) == 0 and first_trade_diff is None and capital_diff <= capital_tolerance,
+    }
+
+
+def print_precision_report(report):
+    """打印单精度校验报告"""
+    status = '通过' if report['passed'] else '存在偏差'
+    print(f"\n{report['strategy']}: {status}")
+    print(f"信号不一致天数: {report['signal_mismatches']}"
+          + (f"（首次: {report['first_signal_mismatch']}）" if report['first_signal_mismatch'] else ''))
+    print(f"交易笔数: float64={report['trades_float64']}  float32={report['trades_float32']}"
+          + (f"（第{report['first_trade_mismatch'] + 1}笔开始不同）" if report['first_trade_mismatch'] is not None else ''))
+    print(f"单笔成交股数最大差异: {report['max_share_diff']}股")
+    print(f"最终资金: float64=¥{report['capital_float64']:,.2f}  float32=¥{report['capital_float32']:,.2f}"
+          f"  相对误差: {report['capital_rel_diff']:.2e}")
+    print(f"权益曲线最大相对误差: {report['equity_max_rel_diff']:.2e}")
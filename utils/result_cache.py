@@ -0,0 +1,180 @@
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import types
+import numpy as np
+import talib
+from backtest.ledger import TradeLedger
+from utils.feature_cache import FeatureCache
+
+
+class ResultCache(FeatureCache):
+    """回测结果的磁盘缓存（按内容寻址）
+
+    键为以下内容的哈希：输入行情、策略代码指纹、策略参数、初始资金、手续费率、
+    回测开始日期、数值精度和回测引擎代码。命中时直接恢复成交记录、逐日权益、
+    逐日信号、期末资金持仓和绩效指标，无需重新计算指标与逐K线回测。
+
+    策略代码指纹包含策略类继承链上各模块的源码（含模块内的辅助函数）、这些模块
+    直接或间接引用的项目内模块、下单、记账、风控、指标等引擎模块的源码、回测函数
+    的源码以及TA-Lib版本，修改任一处后旧条目不再命中。
+    条目的存储格式与容量淘汰（LRU）沿用FeatureCache。
+    """
+
+    # 影响回测结果的引擎模块，源码计入代码指纹
+    ENGINE_MODULES = ('backtest.broker', 'backtest.ledger', 'strategies.risk_overlay',
+                      'strategies.base_strategy', 'indicators.lookback', 'indicators.panel_indicators',
+                      'indicators.covariance', 'utils.precision')
+
+    # 项目根目录，其下的模块视为项目内模块
+    PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # 随结果保存的策略状态与数值型绩效指标
+    STATE_FIELDS = ('capital', 'position', 'entry_price')
+    METRIC_FIELDS = ('total_trades', 'win_rate', 'avg_profit', 'total_profit', 'profit_rate', 'max_drawdown')
+
+    def __init__(self, cache_dir='.result_cache', max_bytes=512 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def _module_source(name):
+        try:
+            module = importlib.import_module(name)
+            return inspect.getsource(module)
+        except (ImportError, TypeError, OSError):
+            return ''
+
+    @classmethod
+    def _is_project_module(cls, name):
+        module = sys.modules.get(name)
+        path = getattr(module, '__file__', None)
+        return path is not None and os.path.abspath(path).startswith(cls.PROJECT_ROOT + os.sep)
+
+    @classmethod
+    def project_imports(cls, names):
+        """给定模块及其直接或间接引用（import的模块、类与函数）的全部项目内模块名"""
+        found = {}
+        pending = [name for name in names if cls._is_project_module(name)]
+        while pending:
+            name = pending.pop()
+            if name in found:
+                continue
+            found[name] = True
+            for value in vars(sys.modules[name]).values():
+                if isinstance(value, types.ModuleType):
+                    imported = value.__name__
+                else:
+                    imported = getattr(value, '__module__', None)
+                if isinstance(imported, str) and imported not in found and cls._is_project_module(imported):
+                    pending.append(imported)
+        return sorted(found)
+
+    @staticmethod
+    def runner_functions(runner):
+        """回测函数及其直接调用的同模块函数（如run_strategy调用的run_bars）"""
+        scope = getattr(runner, '__globals__', {})
+        names = getattr(getattr(runner, '__code__', None), 'co_names', ())
+        called = [scope[name] for name in names
+                  if callable(scope.get(name)) and getattr(scope[name], '__module__', None) == runner.__module__]
+        return list(dict.fromkeys([runner] + called))
+
+    @classmethod
+    def code_fingerprint(cls, strategy_cls, runners=()):
+        """策略类继承链上各模块及其引用的项目内模块、引擎模块、回测函数的源码与TA-Lib版本的哈希"""
+        digest = hashlib.sha1()
+        modules = [klass.__module__ for klass in strategy_cls.__mro__ if klass is not object]
+        for name in dict.fromkeys(cls.project_imports(modules) + list(cls.ENGINE_MODULES)):
+            digest.update(name.encode())
+            digest.update(cls._module_source(name).encode())
+        for runner in runners:
+            digest.update(cls.function_id(runner).encode())
+        digest.update(f"talib@{talib.__version__}".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def strategy_params(strategy):
+        """策略实例上的标量参数（公开属性中的数值、字符串、布尔值、None与元组）"""
+        scalar = (int, float, str, bool, type(None), tuple, np.number)
+        return {name: repr(value) for name, value in sorted(vars(strategy).items())
+                if not name.startswith('_') and isinstance(value, scalar)}
+
+    def make_result_key(self, data, strategy, start_date=None, dtype=np.float64, runners=()):
+        """
+        生成回测结果的缓存键
+
+        Args:
+            data (pd.DataFrame): 输入行情（含预热K线）
+            strategy: 尚未运行的策略实例
+            start_date (str): 回测开始日期
+            dtype: 数值精度
+            runners: 回测函数（如run_strategy与逐K线的run_bars），其源码计入键
+        """
+        spec = {
+            'data': self.fingerprint(data),
+            'columns': list(map(str, data.columns)),
+            'strategy': f"{type(strategy).__module__}.{type(strategy).__qualname__}",
+            'code': self.code_fingerprint(type(strategy), runners),
+            'params': self.strategy_params(strategy),
+            'start_date': str(start_date),
+            'dtype': str(np.dtype(dtype)),
+        }
+        return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+    def store_result(self, key, strategy):
+        """保存已完成回测的策略结果"""
+        performance = strategy.calculate_performance()
+        arrays = {f'trade_{name}': values for name, values in strategy.trades.columns.items()}
+        arrays['trade_dates'] = np.asarray(strategy.trades.dates, dtype=str)
+        arrays['equity_curve'] = np.asarray(strategy.equity_curve)
+        arrays['signal_history'] = np.asarray(strategy.signal_history)
+        arrays['state'] = np.array([getattr(strategy, name) for name in self.STATE_FIELDS], dtype=np.float64)
+        arrays['metrics'] = np.array([performance[name] for name in self.METRIC_FIELDS], dtype=np.float64)
+        arrays['drawdown'] = np.array([str(strategy.drawdown_start or ''), str(strategy.drawdown_end or '')])
+        self.store(key, arrays)
+
+    def load_result(self, key):
+        """
+        读取回测结果
+
+        Returns:
+            dict: trades（TradeLedger）、equity_curve、signal_history、state（期末资金/持仓/成本价）、
+                  metrics（绩效指标）、drawdown（最大回撤起止日期）；未命中返回None
+        """
+        arrays = self.load(key)
+        if arrays is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        columns = {name: arrays[f'trade_{name}'] for name, _ in TradeLedger.FIELDS if f'trade_{name}' in arrays}
+        drawdown_start, drawdown_end = (str(value) or None for value in arrays['drawdown'])
+        return {
+            'trades': TradeLedger.from_columns(columns, list(arrays['trade_dates'])),
+            'equity_curve': arrays['equity_curve'],
+            'signal_history': arrays['signal_history'],
+            'state': dict(zip(self.STATE_FIELDS, arrays['state'].tolist())),
+            'metrics': dict(zip(self.METRIC_FIELDS, arrays['metrics'].tolist())),
+            'drawdown': (drawdown_start, drawdown_end),
+        }
+
+    def restore(self, key, strategy):
+        """
+        命中时把缓存的回测结果恢复到策略实例上
+
+        Returns:
+            bool: 是否命中
+        """
+        result = self.load_result(key)
+        if result is None:
+            return False
+        strategy.trades = result['trades']
+        strategy.equity_curve = result['equity_curve']
+        strategy.signal_history = result['signal_history']
+        state = result['state']
+        strategy.capital = state['capital']
+        strategy.position = int(state['position'])
+        strategy.entry_price = state['entry_price']
+        strategy.drawdown_start, strategy.drawdown_end = result['drawdown']
+        return True
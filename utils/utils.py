@@ -171,15 +171,10 @@ class ExcelExporter:
                 # 3. 为每个策略创建交易记录sheet
                 for strategy in strategies:
                     if strategy.trades:
-                        trades_df = pd.DataFrame(strategy.trades)
+                        trades_df = strategy.trades.to_frame()
                         
-                        # 添加成本价列
-                        trades_df['成本价'] = None
-                        buy_price = None
-                        for i in range(len(trades_df)):
-                            if trades_df.iloc[i]['type'] == '买入':
-                                buy_price = trades_df.iloc[i]['price']
-                            trades_df.iloc[i, trades_df.columns.get_loc('成本价')] = buy_price
+                        # 添加成本价列（最近一次买入价）
+                        trades_df['成本价'] = trades_df['price'].where(trades_df['type'] == '买入').ffill()
                         
                         # 修改列名为中文
                         trades_df.columns = [